@@ -0,0 +1,307 @@
+# benchmarks/audio_fitting.py
+"""
+Benchmark of the voiceover duration-fitting path: the resample (and
+fine-tune) in ai_service._save_tts_audio, followed by the re-check and
+re-resample in video_service._load_scene_audio.
+
+Synthetic 24 kHz mono PCM (a speech-like tone with a syllable envelope)
+of several lengths is fitted to targets at several speed ratios
+(original duration / target duration). For each case it reports wall
+time per step, peak memory (Python heap, numpy buffers included), the
+duration error of the written WAV and of the clip the renderer ends up
+with, and the number of ffmpeg subprocesses spawned.
+
+    python -m benchmarks.audio_fitting                    # compare with the baseline
+    python -m benchmarks.audio_fitting --save-baseline    # record a new baseline
+    python -m benchmarks.audio_fitting --length 30 --ratio 1.2 --rounds 5 --json audio.json
+
+Ratio 1 exercises the no-resample branch; cases that also needed the
+re-resample in _load_scene_audio are marked "fine-tuned". Exits with status 1 when a case gets slower or uses more memory than the
+baseline by more than the threshold, spawns more ffmpeg processes, or lands
+further from its target duration.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+from benchmarks.video_effects import load_baseline, machine_differences, machine_info, save_baseline
+
+SAMPLE_RATE = 24000
+LENGTHS = (2.0, 6.0, 15.0, 30.0)
+RATIOS = (0.6, 0.8, 0.95, 1.0, 1.2, 1.6)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "audio_fitting.json")
+# Duration errors below this are noise (a fraction of one sample at 24 kHz is ~0.04ms)
+ERROR_TOLERANCE_MS = 1.0
+
+
+def _services():
+    """
+    Imports ai_service and video_service. config.py insists on provider
+    keys, which this benchmark never uses, so placeholders are set when they
+    are missing.
+    """
+    os.environ.setdefault("GOOGLE_API_KEYS", "benchmark")
+    os.environ.setdefault("PEXELS_API_KEYS", "benchmark")
+    os.environ.setdefault("TASK_STORE_BACKEND", "memory")
+    from services import ai_service, video_service
+    return ai_service, video_service
+
+
+def synthetic_pcm(seconds: float, seed: int = 0) -> bytes:
+    """
+    Generates speech-like 16-bit mono PCM at 24 kHz: a 140 Hz voice with
+    harmonics, amplitude-modulated at syllable rate, plus a little noise.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 6))
+    syllables = 0.5 * (1 + np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi)))
+    signal = voice * syllables + 0.02 * rng.standard_normal(len(t))
+    signal = signal / np.max(np.abs(signal)) * 0.6
+    return (signal * 32767).astype("<i2").tobytes()
+
+
+def wav_duration(path: str) -> float:
+    with wave.open(path, "rb") as wf:
+        return wf.getnframes() / wf.getframerate()
+
+
+class SubprocessCounter:
+    """
+    Counts processes started through subprocess.Popen (which MoviePy uses
+    for every ffmpeg reader, writer and probe) while active.
+    """
+    def __init__(self):
+        self.commands = []
+        self.original = None
+
+    def __enter__(self):
+        counter = self
+        self.original = original = subprocess.Popen
+
+        class CountingPopen(original):
+            def __init__(self, args, *rest, **kwargs):
+                command = args[0] if isinstance(args, (list, tuple)) else str(args).split()[0]
+                counter.commands.append(os.path.basename(str(command)))
+                super().__init__(args, *rest, **kwargs)
+
+        subprocess.Popen = CountingPopen
+        return self
+
+    def __exit__(self, *exc_info):
+        subprocess.Popen = self.original
+
+    @property
+    def ffmpeg(self) -> int:
+        return sum(1 for command in self.commands if "ffmpeg" in command or "ffprobe" in command)
+
+
+def fit_once(ai_service, video_service, pcm: bytes, target: float, work_dir: str, name: str) -> dict:
+    """
+    Runs the duration-fitting path once, as generate_audio and then
+    _build_scene_clip do for one scene.
+
+    Returns:
+        Timings, achieved durations and the ffmpeg process count.
+    """
+    output_path = os.path.join(work_dir, f"{name}.wav")
+    log = io.StringIO()
+    with SubprocessCounter() as counter, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        start = time.perf_counter()
+        ai_service._save_tts_audio(pcm, output_path, target)
+        saved = time.perf_counter()
+        clip = video_service._load_scene_audio(output_path, target)
+        # The renderer reads the whole track when it encodes; do the same here
+        clip.to_soundarray(fps=clip.fps)
+        loaded = time.perf_counter()
+        loaded_duration = clip.duration
+        clip.close()
+    saved_duration = wav_duration(output_path)
+    os.remove(output_path)
+    return {
+        "save_seconds": saved - start,
+        "load_seconds": loaded - saved,
+        "saved_error_ms": abs(saved_duration - target) * 1000,
+        "loaded_error_ms": abs(loaded_duration - target) * 1000,
+        "ffmpeg_processes": counter.ffmpeg,
+        "fine_tuned": "Fine-tuned audio to match target" in log.getvalue(),
+    }
+
+
+def run_case(ai_service, video_service, length: float, ratio: float, rounds: int, work_dir: str, seed: int) -> dict:
+    """
+    Times one length/ratio case over `rounds` runs, then measures peak
+    memory in one extra run (tracemalloc slows allocation-heavy code down,
+    so it is kept out of the timed runs).
+    """
+    pcm = synthetic_pcm(length, seed)
+    target = length / ratio
+    name = f"{length:g}s_{ratio:g}x"
+    runs = [fit_once(ai_service, video_service, pcm, target, work_dir, name) for _ in range(rounds)]
+
+    tracemalloc.start()
+    try:
+        fit_once(ai_service, video_service, pcm, target, work_dir, name)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    last = runs[-1]
+    return {
+        "length_seconds": length,
+        "target_seconds": round(target, 4),
+        "save_seconds": round(statistics.median(run["save_seconds"] for run in runs), 4),
+        "load_seconds": round(statistics.median(run["load_seconds"] for run in runs), 4),
+        "total_seconds": round(statistics.median(run["save_seconds"] + run["load_seconds"] for run in runs), 4),
+        "peak_mb": round(peak / 1024 / 1024, 2),
+        "saved_error_ms": round(last["saved_error_ms"], 3),
+        "loaded_error_ms": round(last["loaded_error_ms"], 3),
+        "ffmpeg_processes": last["ffmpeg_processes"],
+        "fine_tuned": last["fine_tuned"],
+    }
+
+
+def run(args) -> dict:
+    ai_service, video_service = _services()
+    work_dir = tempfile.mkdtemp(prefix="audio_fitting_")
+    results = {}
+    print(f"  {'case':<12}{'save s':>9}{'load s':>9}{'peak MB':>9}{'wav err':>9}{'clip err':>9}{'ffmpeg':>8}")
+    try:
+        # Untimed warm-up: the first run pays for imports (scipy) and ffmpeg's page cache
+        fit_once(ai_service, video_service, synthetic_pcm(2.0, args.seed), 2.5, work_dir, "warmup")
+        for length in args.lengths:
+            for ratio in args.ratios:
+                key = f"{length:g}s@{ratio:g}x"
+                try:
+                    result = results[key] = run_case(ai_service, video_service, length, ratio, args.rounds, work_dir, args.seed)
+                except Exception as e:
+                    # e.g. MoviePy can't read back WAVs of a second or less; report it, keep going
+                    results[key] = {"error": f"{type(e).__name__}: {e}"}
+                    print(f"  {key:<12}❌ {results[key]['error']}")
+                    continue
+                notes = " fine-tuned" if result["fine_tuned"] else ""
+                print(f"  {key:<12}{result['save_seconds']:>9.3f}{result['load_seconds']:>9.3f}"
+                      f"{result['peak_mb']:>9.1f}{result['saved_error_ms']:>9.1f}{result['loaded_error_ms']:>9.1f}{result['ffmpeg_processes']:>8}{notes}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "machine": machine_info(),
+        "settings": {"rounds": args.rounds, "seed": args.seed, "sample_rate": SAMPLE_RATE},
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compares each case with the baseline.
+
+    Args:
+        threshold: Allowed increase of wall time and peak memory as a
+            fraction. Duration error and ffmpeg processes are deterministic
+            and may not increase at all.
+
+    Returns:
+        Rows of (key, changes, problems): changes maps metric -> (before, now),
+        problems lists the metrics that regressed. changes is None for new
+        and failed cases.
+    """
+    rows = []
+    for key, result in report["results"].items():
+        previous = baseline["results"].get(key)
+        if "error" in result:
+            rows.append((key, None, ["error"]))
+            continue
+        if previous is None or "error" in previous:
+            rows.append((key, None, []))
+            continue
+        changes = {metric: (previous[metric], result[metric])
+                   for metric in ("total_seconds", "peak_mb", "loaded_error_ms", "ffmpeg_processes")}
+        problems = []
+        for metric in ("total_seconds", "peak_mb"):
+            before, now = changes[metric]
+            if now > before * (1 + threshold):
+                problems.append(metric)
+        if changes["loaded_error_ms"][1] > changes["loaded_error_ms"][0] + ERROR_TOLERANCE_MS:
+            problems.append("loaded_error_ms")
+        if changes["ffmpeg_processes"][1] > changes["ffmpeg_processes"][0]:
+            problems.append("ffmpeg_processes")
+        rows.append((key, changes, problems))
+    return rows
+
+
+def print_comparison(rows: list, threshold: float):
+    print()
+    print(f"📊 Compared with baseline (threshold {threshold:.0%} for time and memory)")
+    print(f"  {'case':<12}{'total s':>18}{'peak MB':>18}{'err ms':>18}{'ffmpeg':>10}")
+    for key, changes, problems in rows:
+        if changes is None:
+            print(f"  {key:<12}  {'❌ error' if problems else '🆕 new'}")
+            continue
+        cells = []
+        for metric, width, fmt in (("total_seconds", 18, ".3f"), ("peak_mb", 18, ".1f"),
+                                   ("loaded_error_ms", 18, ".1f"), ("ffmpeg_processes", 10, "d")):
+            before, now = changes[metric]
+            cells.append(f"{format(before, fmt)}→{format(now, fmt)}".rjust(width))
+        status = f"❌ {', '.join(problems)}" if problems else "✅"
+        print(f"  {key:<12}{''.join(cells)}  {status}")
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark of the voiceover duration-fitting path.")
+    parser.add_argument("--length", dest="lengths", type=float, action="append", help=f"PCM length in seconds (repeatable, default: {', '.join(f'{v:g}' for v in LENGTHS)})")
+    parser.add_argument("--ratio", dest="ratios", type=float, action="append", help=f"Original/target duration (repeatable, default: {', '.join(f'{v:g}' for v in RATIOS)})")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed runs per case; the median counts (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic PCM")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help=f"Baseline JSON (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed time/memory increase before failing (default: 0.2)")
+    parser.add_argument("--save-baseline", action="store_true", help="Record the results as the new baseline")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+    args.lengths = args.lengths or list(LENGTHS)
+    args.ratios = args.ratios or list(RATIOS)
+
+    print(f"🧪 Fitting {len(args.lengths) * len(args.ratios)} cases, {args.rounds} runs each")
+    report = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Results written to {args.json}")
+
+    baseline = load_baseline(args.baseline)
+    if args.save_baseline:
+        save_baseline(args.baseline, report, baseline)
+        print(f"💾 Baseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"⚠️  No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    differences = machine_differences(report["machine"], baseline["machine"])
+    if differences:
+        print(f"⚠️  Baseline was recorded with a different {', '.join(differences)}; comparisons may not be meaningful")
+
+    rows = compare(report, baseline, args.threshold)
+    print_comparison(rows, args.threshold)
+    regressed = [key for key, _, problems in rows if problems]
+    if regressed:
+        print(f"❌ {len(regressed)} case(s) regressed: {', '.join(regressed)}")
+        return 1
+    print("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,532 @@
+# benchmarks/fake_providers.py
+"""
+Local stand-ins for the providers the render pipeline talks to: Pexels
+(search + video downloads), Freesound (search + previews), Gemini (script
+and TTS generateContent) and Veo (predictLongRunning + fetchPredictOperation).
+
+Each provider is a small threaded HTTP server on 127.0.0.1 that serves
+canned JSON and synthetic media generated once with the bundled ffmpeg.
+Every API call can be delayed (latency + jitter) and answered with a 429
+at a configurable rate, so the pipeline's retry, key rotation and
+coalescing paths run the way they do against the real services.
+"""
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+# Gemini TTS returns 16-bit mono PCM at this rate (see ai_service.save_pcm_to_wav)
+TTS_SAMPLE_RATE = 24000
+# Voiceover density the script prompt asks for, and the speaking rate of the synthetic TTS
+SCRIPT_WORDS_PER_SECOND = 2.0
+TTS_WORDS_PER_SECOND = 2.6
+
+
+class ProviderProfile:
+    """
+    How a fake provider behaves: per-request latency (seconds, plus up to
+    `jitter` seconds at random), the fraction of API calls answered with
+    429, and the Retry-After sent with them. Media downloads are not
+    rate-limited, but can be throttled to `bandwidth_mbps` (0 = unlimited).
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 retry_after: float = 1.0, bandwidth_mbps: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.bandwidth_mbps = bandwidth_mbps
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class MediaLibrary:
+    """
+    Synthetic media served by the fakes: stock clips per orientation, Veo
+    clips and a music preview. Generated once per settings and reused from
+    `directory` by later runs.
+    """
+    def __init__(self, directory: str = None, stock_seconds: int = 10, stock_height: int = 1080, veo_seconds: int = 8):
+        settings = f"{stock_seconds}s-{stock_height}p-veo{veo_seconds}s"
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "neogen_benchmark_media", settings)
+        self.stock_seconds = stock_seconds
+        self.stock_height = stock_height
+        self.veo_seconds = veo_seconds
+        self.files = {}  # name -> path
+
+    def build(self) -> "MediaLibrary":
+        import imageio_ffmpeg
+
+        ffmpeg = imageio_ffmpeg.get_ffmpeg_exe()
+        os.makedirs(self.directory, exist_ok=True)
+        long_side = self.stock_height * 16 // 9
+        videos = {
+            "stock_landscape.mp4": (long_side, self.stock_height, self.stock_seconds),
+            "stock_portrait.mp4": (self.stock_height, long_side, self.stock_seconds),
+            # Veo renders 720p
+            "veo_landscape.mp4": (1280, 720, self.veo_seconds),
+            "veo_portrait.mp4": (720, 1280, self.veo_seconds),
+        }
+        for name, (width, height, seconds) in videos.items():
+            self._make(ffmpeg, name, [
+                "-f", "lavfi", "-i", f"testsrc2=s={width}x{height}:r=30:d={seconds}",
+                "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            ])
+        self._make(ffmpeg, "music.mp3", [
+            "-f", "lavfi", "-i", "sine=frequency=220:duration=45",
+            "-f", "lavfi", "-i", "sine=frequency=330:duration=45",
+            "-filter_complex", "amix=inputs=2", "-c:a", "libmp3lame", "-b:a", "128k",
+        ])
+        return self
+
+    def path(self, name: str) -> str | None:
+        return self.files.get(name)
+
+    def _make(self, ffmpeg: str, name: str, args: list):
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            partial_path = f"{path}.partial{os.path.splitext(name)[1]}"
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", *args, partial_path], check=True)
+            os.replace(partial_path, path)
+        self.files[name] = path
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+    def do_GET(self):
+        self.server.provider.handle(self, "GET")
+
+    def do_HEAD(self):
+        self.server.provider.handle(self, "HEAD")
+
+    def do_POST(self):
+        self.server.provider.handle(self, "POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeProvider:
+    """
+    Base class of the fakes: runs the HTTP server, applies the profile
+    (latency, 429 injection) to API routes, serves /media/<name> from the
+    MediaLibrary with Range support, and counts what it served.
+    """
+    name = "provider"
+
+    def __init__(self, media: MediaLibrary, profile: ProviderProfile = None, seed: int = None):
+        self.media = media
+        self.profile = profile or ProviderProfile()
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "media_requests": 0, "media_bytes": 0}
+        self.stats_lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeProvider":
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.provider = self
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"fake-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def route(self, method: str, path: str, query: dict, body: dict):
+        """
+        Handles an API call. Returns (status, payload dict) or None for 404.
+        """
+        return None
+
+    # --- Request handling ---
+
+    def handle(self, handler: BaseHTTPRequestHandler, method: str):
+        parts = urlsplit(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        raw_body = handler.rfile.read(length) if length else b""
+
+        if parts.path.startswith("/media/"):
+            self._serve_media(handler, method, os.path.basename(parts.path))
+            return
+
+        self._count("requests")
+        self._sleep(self.profile.latency + self._uniform(0, self.profile.jitter))
+        if self._uniform(0, 1) < self.profile.error_rate:
+            self._count("throttled")
+            self._send_json(handler, 429, {"error": {"code": 429, "message": "Resource has been exhausted (injected)."}},
+                            {"Retry-After": f"{self.profile.retry_after:g}"})
+            return
+
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+        except ValueError:
+            self._send_json(handler, 400, {"error": {"code": 400, "message": "Invalid JSON body."}})
+            return
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        result = self.route(method, parts.path, query, body)
+        if result is None:
+            self._send_json(handler, 404, {"error": {"code": 404, "message": f"No route for {method} {parts.path}"}})
+            return
+        status, payload = result
+        self._send_json(handler, status, payload)
+
+    def _serve_media(self, handler, method: str, name: str):
+        path = self.media.path(name)
+        if path is None:
+            self._send_json(handler, 404, {"error": "not found"})
+            return
+        size = os.path.getsize(path)
+        start, end, status = 0, size - 1, 200
+        match = re.match(r"bytes=(\d*)-(\d*)$", handler.headers.get("Range", ""))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))
+            status = 206
+        headers = {
+            "Content-Type": "video/mp4" if name.endswith(".mp4") else "audio/mpeg",
+            "Content-Length": str(end - start + 1),
+            "Accept-Ranges": "bytes",
+            "ETag": f'"{name}-{size}"',
+        }
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        handler.send_response(status)
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        self._count("media_requests")
+        if method == "HEAD":
+            return
+
+        chunk_size = 256 * 1024
+        bytes_per_second = self.profile.bandwidth_mbps * 1_000_000 / 8
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                try:
+                    handler.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                remaining -= len(chunk)
+                self._count("media_bytes", len(chunk))
+                if bytes_per_second:
+                    time.sleep(len(chunk) / bytes_per_second)
+
+    def _send_json(self, handler, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        if handler.command != "HEAD":
+            handler.wfile.write(data)
+
+    def _count(self, stat: str, amount: int = 1):
+        with self.stats_lock:
+            self.stats[stat] += amount
+
+    def _uniform(self, low: float, high: float) -> float:
+        with self.random_lock:
+            return self.random.uniform(low, high)
+
+    @staticmethod
+    def _sleep(seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class FakePexels(FakeProvider):
+    """
+    GET /videos/search -> three videos, each with one rendition in the requested orientation.
+    """
+    name = "pexels"
+
+    def route(self, method, path, query, body):
+        if method != "GET" or path != "/videos/search":
+            return None
+        portrait = query.get("orientation") == "portrait"
+        long_side = self.media.stock_height * 16 // 9
+        width, height = (self.media.stock_height, long_side) if portrait else (long_side, self.media.stock_height)
+        name = "stock_portrait.mp4" if portrait else "stock_landscape.mp4"
+        seed = int(hashlib.md5(query.get("query", "").encode()).hexdigest()[:8], 16)
+        videos = [
+            {
+                "id": seed + index,
+                "width": width,
+                "height": height,
+                "duration": self.media.stock_seconds,
+                "video_files": [{
+                    "id": (seed + index) * 10,
+                    "quality": "hd",
+                    "file_type": "video/mp4",
+                    "width": width,
+                    "height": height,
+                    "fps": 30,
+                    "link": f"{self.url}/media/{name}",
+                }],
+            }
+            for index in range(3)
+        ]
+        return 200, {"page": 1, "per_page": len(videos), "total_results": len(videos), "videos": videos}
+
+
+class FakeFreesound(FakeProvider):
+    """
+    GET /apiv2/search/text/ -> three tracks sharing the synthetic preview.
+    Track ids are salted per server, so each run starts with a cold music cache.
+    """
+    name = "freesound"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.salt = uuid.uuid4().hex
+
+    def route(self, method, path, query, body):
+        if method != "GET" or path != "/apiv2/search/text/":
+            return None
+        seed = int(hashlib.md5(f"{self.salt}:{query.get('query', '')}".encode()).hexdigest()[:8], 16)
+        results = [
+            {
+                "id": seed + index,
+                "name": f"Benchmark track {index + 1}",
+                "username": "benchmark",
+                "duration": 45.0,
+                "previews": {"preview-hq-mp3": f"{self.url}/media/music.mp3"},
+            }
+            for index in range(3)
+        ]
+        return 200, {"count": len(results), "results": results}
+
+
+class FakeGemini(FakeProvider):
+    """
+    POST /v1beta/models/<model>:generateContent. Audio requests (TTS) get
+    synthetic PCM sized to the text; everything else gets a canned script
+    that honours the requested duration, with `ai_scenes` Veo scenes.
+    """
+    name = "gemini"
+
+    def __init__(self, *args, ai_scenes: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ai_scenes = ai_scenes
+
+    def route(self, method, path, query, body):
+        if method != "POST" or not path.endswith(":generateContent"):
+            return None
+        text = " ".join(
+            part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+        )
+        modalities = (body.get("generationConfig") or {}).get("responseModalities") or []
+        if "AUDIO" in modalities:
+            part = {"inlineData": {"mimeType": f"audio/L16;codec=pcm;rate={TTS_SAMPLE_RATE}", "data": self._speech(text)}}
+        else:
+            part = {"text": json.dumps(self._script(text))}
+        return 200, {"candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP"}]}
+
+    def _script(self, prompt: str) -> dict:
+        match = re.search(r"EXACTLY (\d+) seconds", prompt)
+        total = int(match.group(1)) if match else 20
+        topic_match = re.search(r'prompt: "(.*?)"', prompt)
+        topic = topic_match.group(1) if topic_match else "benchmark"
+
+        # Veo scenes are 5s (their 4-6s window); stock scenes split the rest into 2-6s pieces
+        ai_scenes = min(self.ai_scenes, total // 5)
+        stock_total = total - 5 * ai_scenes
+        if stock_total < 2 and ai_scenes and stock_total <= ai_scenes:
+            # Too little left for a stock scene; stretch the Veo scenes instead
+            durations = [5.0 + stock_total / ai_scenes] * ai_scenes
+        else:
+            stock_count = math.ceil(stock_total / 4)
+            durations = [5.0] * ai_scenes + [round(stock_total / stock_count, 2)] * stock_count
+        scenes = []
+        for index, duration in enumerate(durations):
+            words = max(3, int(duration * SCRIPT_WORDS_PER_SECOND))
+            scenes.append({
+                "scene_number": index + 1,
+                "media_source": "ai_generated" if index < ai_scenes else "stock",
+                "visual_prompt": f"{topic} shot {index + 1}",
+                "voiceover_text": " ".join(["benchmark"] * words),
+                "duration_seconds": duration,
+            })
+        return {"title": f"Benchmark: {topic}", "background_music_keywords": ["upbeat", "corporate"], "scenes": scenes}
+
+    @staticmethod
+    def _speech(text: str) -> str:
+        seconds = max(1.0, len(text.split()) / TTS_WORDS_PER_SECOND)
+        t = np.arange(int(seconds * TTS_SAMPLE_RATE)) / TTS_SAMPLE_RATE
+        pcm = (0.3 * np.sin(2 * np.pi * 180 * t) * 32767).astype("<i2")
+        return base64.b64encode(pcm.tobytes()).decode()
+
+
+class FakeVeo(FakeProvider):
+    """
+    Vertex AI Veo: predictLongRunning starts an operation that is done after
+    `generation_seconds`; fetchPredictOperation then returns a video link.
+    """
+    name = "veo"
+
+    def __init__(self, *args, generation_seconds: float = 20.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.generation_seconds = generation_seconds
+        self.operations = {}  # name -> (started_at, aspect_ratio)
+        self.lock = threading.Lock()
+
+    def route(self, method, path, query, body):
+        if method != "POST":
+            return None
+        if path.endswith(":predictLongRunning"):
+            # Operation names are resource paths without the API version, like Vertex's
+            model = path.rsplit(":", 1)[0].split("/v1/", 1)[-1]
+            operation = f"{model}/operations/{uuid.uuid4().hex}"
+            aspect_ratio = (body.get("parameters") or {}).get("aspectRatio", "16:9")
+            with self.lock:
+                self.operations[operation] = (time.monotonic(), aspect_ratio)
+            return 200, {"name": operation}
+        if path.endswith(":fetchPredictOperation"):
+            operation = body.get("operationName", "")
+            with self.lock:
+                started_at, aspect_ratio = self.operations.get(operation, (None, None))
+            if started_at is None:
+                return 404, {"error": {"code": 404, "message": f"Unknown operation {operation}"}}
+            if time.monotonic() - started_at < self.generation_seconds:
+                return 200, {"name": operation, "done": False}
+            name = "veo_portrait.mp4" if aspect_ratio == "9:16" else "veo_landscape.mp4"
+            return 200, {"name": operation, "done": True, "response": {"videos": [{"gcsUri": f"{self.url}/media/{name}", "mimeType": "video/mp4"}]}}
+        return None
+
+
+class FakeProviders:
+    """
+    All four fakes, started together:
+
+        with FakeProviders(profiles={"pexels": ProviderProfile(latency=0.3)}) as fakes:
+            os.environ.update(fakes.env())
+            install_gemini_shim(fakes.gemini.url)
+            ...
+    """
+    def __init__(self, profiles: dict = None, media: MediaLibrary = None, ai_scenes: int = 0,
+                 veo_seconds: float = 20.0, seed: int = 0):
+        profiles = profiles or {}
+        self.media = media or MediaLibrary()
+        self.pexels = FakePexels(self.media, profiles.get("pexels"), seed=seed)
+        self.freesound = FakeFreesound(self.media, profiles.get("freesound"), seed=seed + 1)
+        self.gemini = FakeGemini(self.media, profiles.get("gemini"), seed=seed + 2, ai_scenes=ai_scenes)
+        self.veo = FakeVeo(self.media, profiles.get("veo"), seed=seed + 3, generation_seconds=veo_seconds)
+        self.providers = [self.pexels, self.freesound, self.gemini, self.veo]
+
+    def start(self) -> "FakeProviders":
+        self.media.build()
+        for provider in self.providers:
+            provider.start()
+        return self
+
+    def stop(self):
+        for provider in self.providers:
+            provider.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def env(self) -> dict:
+        """
+        Environment that points the pipeline at the fakes (set it before importing config).
+        """
+        return {
+            "PEXELS_API_BASE_URL": self.pexels.url,
+            "FREESOUND_API_BASE_URL": self.freesound.url,
+            "VEO_API_BASE_URL": self.veo.url,
+            "VEO_PROJECT_ID": "benchmark",
+            # An access token, so no service account or ADC lookup happens
+            "VIDEO_GEN_API_KEYS": "ya29.benchmark",
+            "GOOGLE_API_KEYS": "bench-google-1,bench-google-2,bench-google-3,bench-google-4",
+            "GEMINI_3_PRO_KEY": "",
+            "PEXELS_API_KEYS": "bench-pexels-1,bench-pexels-2",
+            "FREESOUND_API_KEY": "bench-freesound",
+        }
+
+    def stats(self) -> dict:
+        return {provider.name: {**provider.stats, "profile": provider.profile.as_dict()} for provider in self.providers}
+
+
+# --- Gemini SDK shim ---
+
+def install_gemini_shim(base_url: str):
+    """
+    Points the Gemini generative clients at a FakeGemini. The SDK's clients
+    only speak gRPC to Google, so GenerativeServiceClient and its async
+    twin are replaced with minimal REST clients for the generateContent
+    calls ai_service makes. HTTP errors are raised as google.api_core
+    exceptions, like the SDK does.
+    """
+    from google.ai import generativelanguage as glm
+
+    class GenerativeServiceClient:
+        def __init__(self, client_options: dict = None, **kwargs):
+            self.api_key = (client_options or {}).get("api_key")
+
+        def _request(self, request) -> tuple:
+            url = f"{base_url}/v1beta/{request.model}:generateContent"
+            body = json.loads(type(request).to_json(request, use_integers_for_enums=False))
+            return url, {"key": self.api_key}, body
+
+        def generate_content(self, request):
+            import httpx
+
+            url, params, body = self._request(request)
+            return _gemini_response(httpx.post(url, params=params, json=body, timeout=120))
+
+    class GenerativeServiceAsyncClient(GenerativeServiceClient):
+        async def generate_content(self, request):
+            import httpx
+
+            url, params, body = self._request(request)
+            async with httpx.AsyncClient(timeout=120) as client:
+                return _gemini_response(await client.post(url, params=params, json=body))
+
+    glm.GenerativeServiceClient = GenerativeServiceClient
+    glm.GenerativeServiceAsyncClient = GenerativeServiceAsyncClient
+
+
+def _gemini_response(response):
+    from google.api_core import exceptions
+    from google.generativeai import protos
+
+    if response.status_code != 200:
+        raise exceptions.from_http_status(response.status_code, response.text)
+    return protos.GenerateContentResponse.from_json(response.text, ignore_unknown_fields=True)
@@ -0,0 +1,330 @@
+# benchmarks/run_pipeline.py
+"""
+Offline end-to-end benchmark of the render pipeline.
+
+Starts the local provider stand-ins (benchmarks/fake_providers.py), points
+the app at them, submits N tasks through the real API (in-process, with
+the real admission control, prefetching, rendering and encoding) and
+reports throughput, task turnaround, per-stage latency percentiles, CPU
+time and RSS of the process tree (ffmpeg included).
+
+    python -m benchmarks.run_pipeline --tasks 8 --length 12 --concurrency 2 \\
+        --latency all=0.2 --error-rate pexels=0.1 --ai-scenes 1 --json bench.json
+
+Provider options take PROVIDER=VALUE (pexels, freesound, gemini, veo or all)
+and can be repeated. Runs need no API keys or network access.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import threading
+import time
+
+from benchmarks.fake_providers import FakeProviders, MediaLibrary, ProviderProfile, install_gemini_shim
+
+PROVIDERS = ("pexels", "freesound", "gemini", "veo")
+
+
+def percentile(values: list, q: float) -> float | None:
+    """
+    Nearest-rank percentile (q in 0-100) of values, or None if empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values: list) -> dict:
+    return {
+        "count": len(values),
+        "p50": _round(percentile(values, 50)),
+        "p95": _round(percentile(values, 95)),
+        "max": _round(max(values) if values else None),
+    }
+
+
+def _round(value, digits: int = 3):
+    return round(value, digits) if value is not None else None
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Samples the RSS of this process and all its descendants (the ffmpeg
+    readers and writers) from /proc. Where /proc isn't available only the
+    peak RSS of this process (getrusage) is reported.
+    """
+    def __init__(self, interval: float = 0.25):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            rss = self._tree_rss(os.getpid())
+            if rss is not None:
+                self.samples.append(rss)
+
+    def stop(self) -> dict:
+        self.stopped.set()
+        self.join()
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        self_peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+        return {
+            "self_peak_mb": round(self_peak / 2**20, 1),
+            "tree_peak_mb": round(max(self.samples) / 2**20, 1) if self.samples else None,
+            "tree_mean_mb": round(sum(self.samples) / len(self.samples) / 2**20, 1) if self.samples else None,
+        }
+
+    def _tree_rss(self, root: int) -> int | None:
+        if not os.path.isdir("/proc"):
+            return None
+        children, rss = {}, {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # Fields after the parenthesised command: state, ppid, ..., rss (24th field overall)
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except (OSError, IndexError):
+                continue
+            pid = int(entry)
+            children.setdefault(int(fields[1]), []).append(pid)
+            rss[pid] = int(fields[21]) * self.page_size
+        total, pending = 0, [root]
+        while pending:
+            pid = pending.pop()
+            total += rss.get(pid, 0)
+            pending.extend(children.get(pid, []))
+        return total
+
+
+def parse_provider_options(options: list, name: str) -> dict:
+    """
+    ["all=0.2", "pexels=0.5"] -> {"pexels": 0.5, "freesound": 0.2, ...}
+    """
+    values = {}
+    for option in options or []:
+        provider, _, value = option.partition("=")
+        if provider not in PROVIDERS + ("all",) or not value:
+            raise SystemExit(f"--{name} expects PROVIDER=VALUE with PROVIDER in {PROVIDERS + ('all',)}, got {option!r}")
+        for target in (PROVIDERS if provider == "all" else (provider,)):
+            values[target] = float(value)
+    return values
+
+
+def build_profiles(args) -> dict:
+    latency = parse_provider_options(args.latency, "latency")
+    jitter = parse_provider_options(args.jitter, "jitter")
+    error_rate = parse_provider_options(args.error_rate, "error-rate")
+    bandwidth = parse_provider_options(args.bandwidth, "bandwidth")
+    return {
+        provider: ProviderProfile(
+            latency=latency.get(provider, 0.0),
+            jitter=jitter.get(provider, 0.0),
+            error_rate=error_rate.get(provider, 0.0),
+            retry_after=args.retry_after,
+            bandwidth_mbps=bandwidth.get(provider, 0.0),
+        )
+        for provider in PROVIDERS
+    }
+
+
+def configure_environment(fakes: FakeProviders, args):
+    """
+    Points the app at the fakes. Must run before config is imported.
+    """
+    os.environ.update(fakes.env())
+    os.environ["MAX_RUNNING_JOBS"] = str(args.concurrency)
+    os.environ["MAX_QUEUED_JOBS"] = str(max(args.tasks, 20))
+    os.environ["WARMUP_ON_STARTUP"] = "false" if args.no_warmup else "true"
+    # Don't pick up interrupted tasks of real runs in temp_files
+    os.environ["RESUME_ON_STARTUP"] = "false"
+    os.environ.setdefault("TASK_STORE_BACKEND", "memory")
+    # Injected 429s from the Gemini SDK carry no Retry-After, so keys sit out the default cooldown
+    os.environ.setdefault("KEY_COOLDOWN_SECONDS", str(args.retry_after))
+    install_gemini_shim(fakes.gemini.url)
+
+
+def run(args) -> dict:
+    fakes = FakeProviders(
+        profiles=build_profiles(args),
+        media=MediaLibrary(stock_height=args.stock_height),
+        ai_scenes=args.ai_scenes,
+        veo_seconds=args.veo_seconds,
+        seed=args.seed,
+    )
+    print("🧪 Preparing synthetic media and starting provider stand-ins...")
+    with fakes:
+        configure_environment(fakes, args)
+
+        from fastapi.testclient import TestClient
+        import main
+        from config import BASE_TEMP_DIR, stage_duration_seconds
+
+        # Keep every stage observation, not just histogram buckets, for exact percentiles
+        stage_samples = {}
+        observe = stage_duration_seconds.observe
+
+        def record(value, **labels):
+            stage_samples.setdefault(labels.get("stage"), []).append(value)
+            observe(value, **labels)
+
+        stage_duration_seconds.observe = record
+
+        orientations = ["horizontal", "vertical"] if args.orientation == "mixed" else [args.orientation]
+        submitted, finished = {}, {}
+        with TestClient(main.app) as client:
+            warmup_started_at = time.monotonic()
+            while not client.get("/worker").json()["accepting_jobs"]:
+                time.sleep(0.2)
+            warmup_seconds = time.monotonic() - warmup_started_at
+            print(f"🔥 Worker ready after {warmup_seconds:.1f}s; submitting {args.tasks} tasks")
+
+            cpu_before = _cpu_times()
+            sampler = ResourceSampler()
+            sampler.start()
+            started_at = time.monotonic()
+            for index in range(args.tasks):
+                response = client.post("/generate-video", json={
+                    "prompt": f"Benchmark product launch video #{index}",
+                    "video_length_seconds": args.length,
+                    "orientation": orientations[index % len(orientations)],
+                })
+                if response.status_code != 202:
+                    raise SystemExit(f"Submission {index} was not accepted: {response.status_code} {response.text}")
+                submitted[response.json()["task_id"]] = time.monotonic()
+
+            deadline = started_at + args.timeout
+            while len(finished) < len(submitted) and time.monotonic() < deadline:
+                for task_id in submitted:
+                    if task_id in finished:
+                        continue
+                    status = client.get(f"/status/{task_id}").json()
+                    if status["status"] in ("complete", "error", "cancelled"):
+                        finished[task_id] = (time.monotonic(), status["status"], status.get("message", ""))
+                time.sleep(0.2)
+            wall_seconds = time.monotonic() - started_at
+            resources = sampler.stop()
+            cpu = {key: round(value - cpu_before[key], 2) for key, value in _cpu_times().items()}
+
+            for task_id in submitted:
+                if task_id not in finished:
+                    client.delete(f"/tasks/{task_id}")
+
+        if not args.keep:
+            for task_id in submitted:
+                shutil.rmtree(os.path.join(BASE_TEMP_DIR, task_id), ignore_errors=True)
+
+    completed = [task_id for task_id, (_, status, _) in finished.items() if status == "complete"]
+    turnaround = [finished[task_id][0] - submitted[task_id] for task_id in completed]
+    errors = sorted({message for _, status, message in finished.values() if status != "complete"})
+    cpu_total = cpu["user"] + cpu["system"] + cpu["children_user"] + cpu["children_system"]
+    return {
+        "config": {
+            "tasks": args.tasks,
+            "length_seconds": args.length,
+            "orientation": args.orientation,
+            "ai_scenes": args.ai_scenes,
+            "concurrency": args.concurrency,
+            "stock_height": args.stock_height,
+            "veo_seconds": args.veo_seconds,
+            "warmup": not args.no_warmup,
+            "seed": args.seed,
+        },
+        "warmup_seconds": round(warmup_seconds, 2),
+        "wall_seconds": round(wall_seconds, 2),
+        "completed": len(completed),
+        "failed": len(finished) - len(completed),
+        "timed_out": len(submitted) - len(finished),
+        "errors": errors[:5],
+        "throughput": {
+            "tasks_per_minute": round(len(completed) * 60 / wall_seconds, 2),
+            "video_seconds_per_minute": round(len(completed) * args.length * 60 / wall_seconds, 2),
+        },
+        "turnaround_seconds": summarize(turnaround),
+        "stages": {stage: summarize(values) for stage, values in sorted(stage_samples.items())},
+        "cpu_seconds": {**cpu, "total": round(cpu_total, 2), "cores_busy": round(cpu_total / wall_seconds, 2)},
+        "memory": resources,
+        "providers": fakes.stats(),
+    }
+
+
+def _cpu_times() -> dict:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "user": own.ru_utime,
+        "system": own.ru_stime,
+        # ffmpeg processes, once they have exited
+        "children_user": children.ru_utime,
+        "children_system": children.ru_stime,
+    }
+
+
+def print_report(report: dict):
+    config = report["config"]
+    print()
+    print(f"📊 {config['tasks']} x {config['length_seconds']}s {config['orientation']} videos "
+          f"({config['ai_scenes']} Veo scenes each), {config['concurrency']} concurrent renders")
+    print(f"  completed {report['completed']}, failed {report['failed']}, timed out {report['timed_out']}")
+    for error in report["errors"]:
+        print(f"  ❌ {error}")
+    print(f"  wall {report['wall_seconds']}s (warm-up {report['warmup_seconds']}s before it)")
+    throughput = report["throughput"]
+    print(f"  throughput {throughput['tasks_per_minute']} tasks/min, {throughput['video_seconds_per_minute']} video-s/min")
+    turnaround = report["turnaround_seconds"]
+    print(f"  turnaround p50 {turnaround['p50']}s  p95 {turnaround['p95']}s  max {turnaround['max']}s")
+    print(f"  {'stage':<14}{'count':>7}{'p50 s':>10}{'p95 s':>10}{'max s':>10}")
+    for stage, stats in report["stages"].items():
+        print(f"  {stage:<14}{stats['count']:>7}{stats['p50']:>10}{stats['p95']:>10}{stats['max']:>10}")
+    cpu = report["cpu_seconds"]
+    print(f"  cpu {cpu['total']}s (api {cpu['user'] + cpu['system']:.2f}s, ffmpeg {cpu['children_user'] + cpu['children_system']:.2f}s), "
+          f"{cpu['cores_busy']} cores busy on average")
+    memory = report["memory"]
+    print(f"  rss peak {memory['tree_peak_mb']} MB (process tree), mean {memory['tree_mean_mb']} MB, api process peak {memory['self_peak_mb']} MB")
+    for name, stats in report["providers"].items():
+        print(f"  {name:<10} {stats['requests']} calls, {stats['throttled']} throttled, "
+              f"{stats['media_requests']} media requests ({stats['media_bytes'] / 2**20:.1f} MB)")
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the render pipeline.")
+    parser.add_argument("--tasks", type=int, default=4, help="Number of tasks to submit (default: 4)")
+    parser.add_argument("--length", type=int, default=12, help="video_length_seconds of each task (default: 12)")
+    parser.add_argument("--orientation", choices=("horizontal", "vertical", "mixed"), default="horizontal")
+    parser.add_argument("--ai-scenes", type=int, default=0, help="Veo scenes per script (default: 0)")
+    parser.add_argument("--concurrency", type=int, default=2, help="MAX_RUNNING_JOBS (default: 2)")
+    parser.add_argument("--latency", action="append", metavar="PROVIDER=SECONDS", help="Added latency per API call")
+    parser.add_argument("--jitter", action="append", metavar="PROVIDER=SECONDS", help="Random extra latency, up to this much")
+    parser.add_argument("--error-rate", action="append", metavar="PROVIDER=FRACTION", help="Fraction of API calls answered with 429")
+    parser.add_argument("--bandwidth", action="append", metavar="PROVIDER=MBPS", help="Media download bandwidth limit")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of injected 429s, seconds (default: 1)")
+    parser.add_argument("--veo-seconds", type=float, default=20.0, help="Time a Veo operation takes (default: 20)")
+    parser.add_argument("--stock-height", type=int, default=1080, help="Height of the synthetic stock clips (default: 1080)")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip the worker warm-up (measures cold starts)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency jitter and 429 injection")
+    parser.add_argument("--timeout", type=float, default=3600, help="Give up waiting after this many seconds")
+    parser.add_argument("--keep", action="store_true", help="Keep the task directories")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.json}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+# benchmarks/video_effects.py
+"""
+Micro-benchmarks for the per-frame cost of the effects and compositing in
+services/video_service.py, with JSON baselines and a regression gate.
+
+Each case renders frames from synthetic 1080p inputs (a flat ColorClip and
+a seeded noise clip, horizontal and vertical) through the same functions
+the render pipeline uses:
+
+    color_grading      apply_color_grading
+    zoom_in            zoom_in_effect (zoom_ratio=0.1, as in _build_scene_clip)
+    fit_to_canvas      _fit_video_to_scene, aspect-mismatch branch (crop + resize)
+    caption_clips      _make_caption_clip (TextClip creation, clips/s)
+    composite_overlay  CompositeVideoClip of a scene clip and its captions
+    full_scene         fit + grading + zoom + captions + composite, as one scene
+
+    python -m benchmarks.video_effects                       # compare with the baseline
+    python -m benchmarks.video_effects --save-baseline       # record a new baseline
+    python -m benchmarks.video_effects --case zoom_in --orientation vertical --threshold 0.15
+
+Exits with status 1 when a case is slower than its baseline by more than the
+threshold. Baselines are machine-specific: record them on the machine (or CI
+runner) that runs the comparison.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+CASES = ("color_grading", "zoom_in", "fit_to_canvas", "caption_clips", "composite_overlay", "full_scene")
+ORIENTATIONS = ("horizontal", "vertical")
+SOURCES = ("color", "noise")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "video_effects.json")
+BASELINE_VERSION = 1
+
+CAPTION_TEXT = (
+    "Scientists just discovered a hidden ocean beneath the ice and it could change "
+    "everything we know about where life can exist in our solar system"
+)
+
+
+def _video_service():
+    """
+    Imports services.video_service. config.py insists on provider keys, which
+    these benchmarks never use, so placeholders are set when they are missing.
+    """
+    os.environ.setdefault("GOOGLE_API_KEYS", "benchmark")
+    os.environ.setdefault("PEXELS_API_KEYS", "benchmark")
+    os.environ.setdefault("TASK_STORE_BACKEND", "memory")
+    from services import video_service
+    return video_service
+
+
+def _resolve_caption_font(video_service, font: str = None) -> str:
+    """
+    Returns the caption font the benchmark renders with: --font if given,
+    else the app's caption font, else Pillow's default font (None) when the
+    app's font isn't installed here. Patches video_service accordingly.
+    """
+    from PIL import ImageFont
+
+    candidate = font or video_service._caption_font()
+    try:
+        ImageFont.truetype(candidate, 80)
+    except OSError:
+        print(f"⚠️  Caption font '{candidate}' not found, using Pillow's default font")
+        candidate = None
+    video_service._caption_font = lambda: candidate
+    return candidate or "pillow-default"
+
+
+def make_source_clip(source: str, size: tuple, duration: float, fps: int = 30, seed: int = 0):
+    """
+    Builds a synthetic input clip.
+
+    Args:
+        source: "color" (a flat ColorClip) or "noise" (seeded random frames,
+            cycled so every frame differs from its neighbours).
+        size: (width, height) of the clip.
+
+    Returns:
+        A VideoClip of the given size and duration.
+    """
+    from moviepy import ColorClip, VideoClip
+
+    if source == "color":
+        # A ColorClip is an ImageClip, whose effects run once on the still image;
+        # serve its frame from a VideoClip so every effect runs per frame as on footage
+        frames = [ColorClip(size=size, color=(72, 118, 164)).get_frame(0)]
+    else:
+        rng = np.random.default_rng(seed)
+        width, height = size
+        frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(8)]
+
+    def frame_function(t):
+        return frames[int(t * fps) % len(frames)]
+
+    return VideoClip(frame_function, duration=duration).with_fps(fps)
+
+
+def _other_orientation(orientation: str) -> str:
+    return "vertical" if orientation == "horizontal" else "horizontal"
+
+
+def build_case(video_service, case: str, orientation: str, source: str, duration: float, seed: int):
+    """
+    Builds the clip graph for one frame-rendering case.
+
+    Returns:
+        The clip whose get_frame() is timed.
+    """
+    size = video_service._target_size(orientation)
+    target_width, _ = size
+
+    if case == "color_grading":
+        return video_service.apply_color_grading(make_source_clip(source, size, duration, seed=seed))
+    if case == "zoom_in":
+        return video_service.zoom_in_effect(make_source_clip(source, size, duration, seed=seed), zoom_ratio=0.1)
+
+    # Stock clips often come in the other orientation, which takes the crop + resize branch
+    mismatched_size = video_service._target_size(_other_orientation(orientation))
+    if case == "fit_to_canvas":
+        clip = make_source_clip(source, mismatched_size, duration, seed=seed)
+        return video_service._fit_video_to_scene(clip, duration, orientation)
+
+    # Caption chunk sizes are random; seed them so every run composites the same chunks
+    random.seed(seed)
+    captions = video_service._build_caption_clips(CAPTION_TEXT, duration, target_width)
+    if case == "composite_overlay":
+        from moviepy import CompositeVideoClip
+        return CompositeVideoClip([make_source_clip(source, size, duration, seed=seed)] + captions)
+    if case == "full_scene":
+        from moviepy import CompositeVideoClip
+        clip = make_source_clip(source, mismatched_size, duration, seed=seed)
+        clip = video_service._fit_video_to_scene(clip, duration, orientation)
+        clip = video_service.apply_color_grading(clip)
+        clip = video_service.zoom_in_effect(clip, zoom_ratio=0.1)
+        return CompositeVideoClip([clip] + captions)
+    raise ValueError(f"Unknown case: {case}")
+
+
+def time_frames(clip, frames: int, rounds: int) -> list:
+    """
+    Renders `frames` frames spread over the clip, `rounds` times, after one
+    untimed warm-up frame.
+
+    Returns:
+        Frames per second of each round.
+    """
+    times = [clip.duration * (i + 0.5) / frames for i in range(frames)]
+    clip.get_frame(times[0])
+    rates = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for t in times:
+            clip.get_frame(t)
+        rates.append(frames / (time.perf_counter() - start))
+    return rates
+
+
+def time_caption_clips(video_service, orientation: str, count: int, rounds: int) -> list:
+    """
+    Creates `count` caption TextClips per round.
+
+    Returns:
+        Clips per second of each round.
+    """
+    target_width, _ = video_service._target_size(orientation)
+    words = CAPTION_TEXT.split()
+    chunks = [" ".join(words[i:i + 3]) for i in range(0, len(words), 3)]
+    video_service._make_caption_clip(chunks[0], target_width)
+    rates = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(count):
+            video_service._make_caption_clip(chunks[i % len(chunks)], target_width)
+        rates.append(count / (time.perf_counter() - start))
+    return rates
+
+
+def machine_info() -> dict:
+    import moviepy
+
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "moviepy": moviepy.__version__,
+    }
+
+
+def run(args) -> dict:
+    """
+    Runs the selected cases.
+
+    Returns:
+        {"machine", "settings", "results": {"case/orientation/source": {...}}}
+    """
+    video_service = _video_service()
+    font = _resolve_caption_font(video_service, args.font)
+    results = {}
+
+    for case in args.cases:
+        for orientation in args.orientations:
+            # TextClip creation doesn't depend on the video source
+            sources = ("-",) if case == "caption_clips" else args.sources
+            for source in sources:
+                key = f"{case}/{orientation}/{source}"
+                if case == "caption_clips":
+                    rates = time_caption_clips(video_service, orientation, args.frames, args.rounds)
+                    unit = "clips/s"
+                else:
+                    clip = build_case(video_service, case, orientation, source, args.duration, args.seed)
+                    rates = time_frames(clip, args.frames, args.rounds)
+                    unit = "frames/s"
+                results[key] = {
+                    "rate": round(max(rates), 3),
+                    "median": round(statistics.median(rates), 3),
+                    "unit": unit,
+                }
+                print(f"  {key:<40}{results[key]['rate']:>10.2f} {unit}")
+
+    return {
+        "machine": machine_info(),
+        "settings": {
+            "frames": args.frames,
+            "rounds": args.rounds,
+            "duration": args.duration,
+            "seed": args.seed,
+            "caption_font": font,
+        },
+        "results": results,
+    }
+
+
+def load_baseline(path: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"Unsupported baseline version in {path}: {baseline.get('version')}")
+    return baseline
+
+
+def save_baseline(path: str, report: dict, previous: dict = None):
+    """
+    Writes the report as the baseline, keeping results of cases that weren't
+    run this time from the previous baseline.
+    """
+    results = dict(previous["results"]) if previous else {}
+    results.update(report["results"])
+    baseline = {
+        "version": BASELINE_VERSION,
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": report["machine"],
+        "settings": report["settings"],
+        "results": dict(sorted(results.items())),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compares each case's best rate with the baseline.
+
+    Args:
+        threshold: Allowed slowdown as a fraction (0.2 = 20% fewer frames/s).
+
+    Returns:
+        Rows of (key, baseline_rate, rate, change, status), status being
+        "regressed", "improved", "ok" or "new".
+    """
+    rows = []
+    for key, result in report["results"].items():
+        previous = baseline["results"].get(key)
+        if previous is None:
+            rows.append((key, None, result["rate"], None, "new"))
+            continue
+        change = result["rate"] / previous["rate"] - 1
+        if change < -threshold:
+            status = "regressed"
+        elif change > threshold:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((key, previous["rate"], result["rate"], change, status))
+    return rows
+
+
+def print_comparison(rows: list, threshold: float):
+    icons = {"regressed": "❌", "improved": "🚀", "ok": "✅", "new": "🆕"}
+    print()
+    print(f"📊 Compared with baseline (threshold {threshold:.0%})")
+    print(f"  {'case':<40}{'baseline':>10}{'now':>10}{'change':>9}")
+    for key, baseline_rate, rate, change, status in rows:
+        baseline_text = f"{baseline_rate:.2f}" if baseline_rate is not None else "-"
+        change_text = f"{change:+.0%}" if change is not None else "-"
+        print(f"  {key:<40}{baseline_text:>10}{rate:>10.2f}{change_text:>9}  {icons[status]} {status}")
+
+
+def machine_differences(machine: dict, baseline_machine: dict) -> list:
+    return [name for name, value in machine.items() if baseline_machine.get(name) != value]
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for video_service effects and compositing.")
+    parser.add_argument("--case", dest="cases", action="append", choices=CASES, help="Case to run (repeatable, default: all)")
+    parser.add_argument("--orientation", dest="orientations", action="append", choices=ORIENTATIONS, help="Default: both")
+    parser.add_argument("--source", dest="sources", action="append", choices=SOURCES, help="Default: both")
+    parser.add_argument("--frames", type=int, default=12, help="Frames (or caption clips) per round (default: 12)")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds per case; the best one counts (default: 3)")
+    parser.add_argument("--duration", type=float, default=4.0, help="Duration of the synthetic clips (default: 4)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the noise frames")
+    parser.add_argument("--font", help="Caption font (default: the app's caption font)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help=f"Baseline JSON (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before failing (default: 0.2)")
+    parser.add_argument("--save-baseline", action="store_true", help="Record the results as the new baseline")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+    args.cases = args.cases or list(CASES)
+    args.orientations = args.orientations or list(ORIENTATIONS)
+    args.sources = args.sources or list(SOURCES)
+
+    print(f"🧪 Timing {len(args.cases)} cases, {args.rounds} x {args.frames} frames each")
+    report = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Results written to {args.json}")
+
+    baseline = load_baseline(args.baseline)
+    if args.save_baseline:
+        save_baseline(args.baseline, report, baseline)
+        print(f"💾 Baseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"⚠️  No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    differences = machine_differences(report["machine"], baseline["machine"])
+    if differences:
+        print(f"⚠️  Baseline was recorded with a different {', '.join(differences)}; comparisons may not be meaningful")
+    if baseline.get("settings") != report["settings"]:
+        print("⚠️  Baseline was recorded with different settings")
+
+    rows = compare(report, baseline, args.threshold)
+    print_comparison(rows, args.threshold)
+    regressed = [row[0] for row in rows if row[4] == "regressed"]
+    if regressed:
+        print(f"❌ {len(regressed)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressed)}")
+        return 1
+    print("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
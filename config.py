@@ -2,10 +2,33 @@
 import os
 from dotenv import load_dotenv
 from utils.api_key_rotator import APIKeyRotator
+from utils.http_client import ProviderHTTPClient, RetryPolicy
+from utils.async_http_client import AsyncProviderHTTPClient
+from utils.download_manager import DownloadManager
+from utils.gcs_downloader import GCSDownloader
+from utils.single_flight import SingleFlight
+from utils.concurrency_limiter import LimiterRegistry
+from utils.progress import ProgressBroker
+from utils.file_delivery import ETagCache
+from utils.task_store import create_task_store
+from utils.storage_manager import StorageManager
+from utils.admission import AdmissionController, JobCostModel
+from utils.idempotency import IdempotencyIndex
+from utils.metrics import MetricsRegistry
+from utils.cancellation import CancellationRegistry
 
 # Load environment variables from .env file
 load_dotenv()
 
+# --- Key Health Settings ---
+# How long a key sits out after a 429 when the upstream doesn't send Retry-After
+KEY_COOLDOWN_SECONDS = float(os.getenv("KEY_COOLDOWN_SECONDS", "60"))
+# Optional directory to persist per-key cooldowns and usage across restarts
+KEY_STATE_DIR = os.getenv("KEY_STATE_DIR", "")
+
+def _key_state_path(name: str):
+    return os.path.join(KEY_STATE_DIR, f"{name}_keys.json") if KEY_STATE_DIR else None
+
 # --- Google Key Rotator (Unchanged) ---
 google_api_keys_str = os.getenv("GOOGLE_API_KEYS")
 if not google_api_keys_str:
@@ -14,9 +37,9 @@ GOOGLE_API_KEYS = google_api_keys_str.split(',')
 video_gen_api_keys_str = os.getenv("VIDEO_GEN_API_KEYS", "")
 # VIDEO_GEN_API_KEYS is optional - can use Application Default Credentials instead
 VIDEO_GEN_API_KEYS = video_gen_api_keys_str.split(',') if video_gen_api_keys_str else []
-google_key_rotator = APIKeyRotator(GOOGLE_API_KEYS)
+google_key_rotator = APIKeyRotator(GOOGLE_API_KEYS, default_cooldown=KEY_COOLDOWN_SECONDS, state_path=_key_state_path("google"))
 # Only create rotator if we have keys, otherwise it will use ADC
-video_gen_key_rotator = APIKeyRotator(VIDEO_GEN_API_KEYS) if VIDEO_GEN_API_KEYS else None
+video_gen_key_rotator = APIKeyRotator(VIDEO_GEN_API_KEYS, default_cooldown=KEY_COOLDOWN_SECONDS, state_path=_key_state_path("video_gen")) if VIDEO_GEN_API_KEYS else None
 
 # --- Gemini 3 Pro Key (for script generation) ---
 GEMINI_3_PRO_KEY = os.getenv("GEMINI_3_PRO_KEY", "")
@@ -27,7 +50,7 @@ pexels_api_keys_str = os.getenv("PEXELS_API_KEYS")
 if not pexels_api_keys_str:
     raise EnvironmentError("PEXELS_API_KEYS (plural) not set in .env file")
 PEXELS_API_KEYS = pexels_api_keys_str.split(',')
-pexels_key_rotator = APIKeyRotator(PEXELS_API_KEYS)
+pexels_key_rotator = APIKeyRotator(PEXELS_API_KEYS, default_cooldown=KEY_COOLDOWN_SECONDS, state_path=_key_state_path("pexels"))
 
 # --- Freesound API Key (NEW) ---
 FREESOUND_API_KEY = os.getenv("FREESOUND_API_KEY")
@@ -36,6 +59,234 @@ FREESOUND_API_KEY = os.getenv("FREESOUND_API_KEY")
 if not FREESOUND_API_KEY:
     print("⚠️  FREESOUND_API_KEY not set in .env file. Background music will be disabled.")
 
+# --- Provider HTTP Layer ---
+# One pooled keep-alive session per upstream host, shared by all service modules
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE_SECONDS = float(os.getenv("HTTP_BACKOFF_BASE_SECONDS", "0.5"))
+HTTP_BACKOFF_MAX_SECONDS = float(os.getenv("HTTP_BACKOFF_MAX_SECONDS", "30"))
+http_retry_policy = RetryPolicy(
+    max_retries=HTTP_MAX_RETRIES,
+    backoff_base=HTTP_BACKOFF_BASE_SECONDS,
+    backoff_max=HTTP_BACKOFF_MAX_SECONDS,
+)
+http_client = ProviderHTTPClient(pool_size=HTTP_POOL_SIZE, retry_policy=http_retry_policy)
+# asyncio counterpart used by the *_async service functions
+async_http_client = AsyncProviderHTTPClient(pool_size=HTTP_POOL_SIZE, retry_policy=http_retry_policy)
+
+# --- Download Manager ---
+# Parallel ranged downloads with resume for stock clips, Veo outputs and music previews
+DOWNLOAD_CONNECTIONS = int(os.getenv("DOWNLOAD_CONNECTIONS", "4"))
+DOWNLOAD_PART_SIZE_MB = int(os.getenv("DOWNLOAD_PART_SIZE_MB", "8"))
+DOWNLOAD_BUFFER_SIZE_KB = int(os.getenv("DOWNLOAD_BUFFER_SIZE_KB", "1024"))
+download_manager = DownloadManager(
+    http_client,
+    async_http_client=async_http_client,
+    connections=DOWNLOAD_CONNECTIONS,
+    part_size=DOWNLOAD_PART_SIZE_MB * 1024 * 1024,
+    buffer_size=DOWNLOAD_BUFFER_SIZE_KB * 1024,
+)
+
+# --- GCS Downloads (Veo outputs) ---
+# Parallel byte-range slices with CRC32C/MD5 verification and a cached client per credential.
+# GCS_STREAM_TO_DECODER=true hands a signed URL to the decoder instead of staging the file on disk.
+GCS_STREAM_TO_DECODER = os.getenv("GCS_STREAM_TO_DECODER", "false").lower() == "true"
+GCS_SIGNED_URL_TTL_SECONDS = int(os.getenv("GCS_SIGNED_URL_TTL_SECONDS", "3600"))
+gcs_downloader = GCSDownloader(
+    connections=DOWNLOAD_CONNECTIONS,
+    part_size=DOWNLOAD_PART_SIZE_MB * 1024 * 1024,
+    signed_url_ttl=GCS_SIGNED_URL_TTL_SECONDS,
+)
+
+# --- Adaptive Provider Concurrency ---
+# One AIMD limiter per upstream (gemini, pexels, freesound, vertex), shared by every task in this process
+PROVIDER_CONCURRENCY_INITIAL = int(os.getenv("PROVIDER_CONCURRENCY_INITIAL", "4"))
+PROVIDER_CONCURRENCY_MAX = int(os.getenv("PROVIDER_CONCURRENCY_MAX", "32"))
+provider_limiters = LimiterRegistry(
+    initial_limit=PROVIDER_CONCURRENCY_INITIAL,
+    max_limit=PROVIDER_CONCURRENCY_MAX,
+)
+
+# --- Hedged Stock Searches ---
+# If a Pexels search is slower than the delay or comes back empty, simplified
+# alternate queries (nouns only) are fired concurrently and the first hit wins.
+PEXELS_HEDGE_ENABLED = os.getenv("PEXELS_HEDGE_ENABLED", "true").lower() == "true"
+PEXELS_HEDGE_DELAY_SECONDS = float(os.getenv("PEXELS_HEDGE_DELAY_SECONDS", "2.0"))
+PEXELS_HEDGE_MAX_ALTERNATES = int(os.getenv("PEXELS_HEDGE_MAX_ALTERNATES", "3"))
+
+# --- Request Coalescing ---
+# Concurrent tasks asking for the same stock clip, music or voiceover share one upstream call
+single_flight = SingleFlight()
+
+# --- Progress Events ---
+# Structured per-task progress, pushed to /events/{task_id} (SSE) and /ws/{task_id} subscribers
+progress_broker = ProgressBroker()
+
+# --- Video Delivery ---
+# Strong content ETags for /download, and optional zero-copy delivery through nginx:
+# with DOWNLOAD_ACCEL_REDIRECT_PREFIX=/protected-videos the API only answers with an
+# X-Accel-Redirect header and nginx sendfile()s the file (Range included) from an internal location.
+DOWNLOAD_ACCEL_REDIRECT_PREFIX = os.getenv("DOWNLOAD_ACCEL_REDIRECT_PREFIX", "").rstrip("/")
+DOWNLOAD_CACHE_MAX_AGE_SECONDS = int(os.getenv("DOWNLOAD_CACHE_MAX_AGE_SECONDS", "3600"))
+etag_cache = ETagCache()
+
 # --- Base Temp Dir (Unchanged) ---
 BASE_TEMP_DIR = os.path.join(os.path.dirname(__file__), "temp_files")
-os.makedirs(BASE_TEMP_DIR, exist_ok=True)
\ No newline at end of file
+os.makedirs(BASE_TEMP_DIR, exist_ok=True)
+# --- Task Store ---
+# "memory" (default, per-process) or "sqlite" (WAL; persistent and shared by all workers on the host).
+# Finished tasks are purged TASK_TTL_SECONDS after they complete or fail.
+TASK_STORE_BACKEND = os.getenv("TASK_STORE_BACKEND", "memory")
+# Outside BASE_TEMP_DIR: nothing under the served task tree may hold other users' data
+TASK_STORE_PATH = os.getenv("TASK_STORE_PATH", os.path.join(os.path.dirname(__file__), "data", "tasks.db"))
+TASK_TTL_SECONDS = int(os.getenv("TASK_TTL_SECONDS", str(24 * 3600)))
+TASK_PURGE_INTERVAL_SECONDS = int(os.getenv("TASK_PURGE_INTERVAL_SECONDS", "300"))
+task_store = create_task_store(TASK_STORE_BACKEND, TASK_STORE_PATH, TASK_TTL_SECONDS)
+
+# --- Storage Lifecycle ---
+# Intermediates are deleted once a task's final video is written; finals are kept for
+# FINAL_VIDEO_RETENTION_SECONDS after their last use, and when BASE_TEMP_DIR grows past
+# STORAGE_QUOTA_GB the least recently used task directories and music tracks are evicted.
+FINAL_VIDEO_RETENTION_SECONDS = int(os.getenv("FINAL_VIDEO_RETENTION_SECONDS", str(24 * 3600)))
+STORAGE_QUOTA_GB = float(os.getenv("STORAGE_QUOTA_GB", "20"))  # 0 disables the quota
+STORAGE_SWEEP_INTERVAL_SECONDS = int(os.getenv("STORAGE_SWEEP_INTERVAL_SECONDS", "300"))
+KEEP_INTERMEDIATES = os.getenv("KEEP_INTERMEDIATES", "false").lower() == "true"
+MUSIC_CACHE_DIR = os.path.join(BASE_TEMP_DIR, "music_cache")
+storage_manager = StorageManager(
+    BASE_TEMP_DIR,
+    MUSIC_CACHE_DIR,
+    final_retention_seconds=FINAL_VIDEO_RETENTION_SECONDS,
+    quota_bytes=int(STORAGE_QUOTA_GB * 1024 ** 3),
+    grace_seconds=int(os.getenv("STORAGE_EVICTION_GRACE_SECONDS", "1800")),
+)
+
+# --- Admission Control ---
+# At most MAX_RUNNING_JOBS renders run at once and MAX_QUEUED_JOBS wait; beyond that
+# /generate-video answers 429 with a Retry-After computed from recent job durations.
+MAX_RUNNING_JOBS = int(os.getenv("MAX_RUNNING_JOBS", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "20"))
+ADMISSION_DEFAULT_JOB_SECONDS = float(os.getenv("ADMISSION_DEFAULT_JOB_SECONDS", "180"))
+# Waiting jobs start by priority class ("high", "normal", "low"), then shortest estimated
+# job first. Every PRIORITY_AGING_SECONDS of waiting promotes a job one class (0 disables).
+PRIORITY_AGING_SECONDS = float(os.getenv("PRIORITY_AGING_SECONDS", "300"))
+admission_controller = AdmissionController(
+    max_running=MAX_RUNNING_JOBS,
+    max_queued=MAX_QUEUED_JOBS,
+    default_job_seconds=ADMISSION_DEFAULT_JOB_SECONDS,
+    priority_aging_seconds=PRIORITY_AGING_SECONDS,
+)
+# Job cost estimates used for shortest-job-first ordering
+job_cost_model = JobCostModel(
+    base_seconds=float(os.getenv("JOB_COST_BASE_SECONDS", "20")),
+    seconds_per_video_second=float(os.getenv("JOB_COST_SECONDS_PER_VIDEO_SECOND", "4")),
+    vertical_factor=float(os.getenv("JOB_COST_VERTICAL_FACTOR", "1.15")),
+    seconds_per_ai_scene=float(os.getenv("JOB_COST_SECONDS_PER_AI_SCENE", "90")),
+    # The script prompt is currently stock-only
+    expected_ai_scenes=float(os.getenv("JOB_COST_EXPECTED_AI_SCENES", "0")),
+)
+
+# --- Idempotent Submissions ---
+# A repeated /generate-video returns the existing task instead of starting a new one:
+# by Idempotency-Key header for IDEMPOTENCY_KEY_TTL_SECONDS, or by identical request
+# content within IDEMPOTENCY_WINDOW_SECONDS (0 disables content dedupe).
+IDEMPOTENCY_WINDOW_SECONDS = int(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", "600"))
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+idempotency_index = IdempotencyIndex(
+    window_seconds=IDEMPOTENCY_WINDOW_SECONDS,
+    key_ttl_seconds=IDEMPOTENCY_KEY_TTL_SECONDS,
+)
+
+# --- Cancellation ---
+# DELETE /tasks/{task_id} cancels a task: a queued one is dropped, a running one stops
+# at its next check (between scenes, per download chunk, per Veo poll, per encoded frame).
+cancellation_registry = CancellationRegistry()
+
+# --- Checkpoints ---
+# Every task keeps a manifest.json in its directory (script + finished artifacts with
+# checksums). Tasks interrupted by a crash or restart are resumed when a worker starts,
+# and failed tasks can be resumed with POST /tasks/{task_id}/resume.
+RESUME_ON_STARTUP = os.getenv("RESUME_ON_STARTUP", "true").lower() == "true"
+
+# --- Worker Warm-up ---
+# The API imports the render stack lazily so it boots fast. On startup the render worker
+# warms up (MoviePy/ffmpeg, fonts, effects, provider connections) before starting jobs;
+# jobs submitted meanwhile are queued. GET /worker reports boot, warm-up and job latency.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+# --- Metrics ---
+# Exposed in the Prometheus text format on GET /metrics. Services update the counters
+# and histograms below as they work; the rest is read from its owner at scrape time.
+metrics = MetricsRegistry()
+tasks_submitted_total = metrics.counter("neogen_tasks_submitted_total", "Video tasks submitted, by outcome (accepted, duplicate, rejected)", ["outcome"])
+tasks_finished_total = metrics.counter("neogen_tasks_finished_total", "Video tasks finished, by final status", ["status"])
+task_duration_seconds = metrics.histogram(
+    "neogen_task_duration_seconds", "Time from a task starting to run until it finished", ["status"],
+    buckets=(10, 30, 60, 120, 180, 300, 600, 900, 1200, 1800, 3600),
+)
+stage_duration_seconds = metrics.histogram(
+    "neogen_stage_duration_seconds",
+    "Duration of pipeline stages (script, tts, stock_search, download, veo, music, scene_render, encode)",
+    ["stage"],
+)
+cache_requests_total = metrics.counter("neogen_cache_requests_total", "Cache and coalescing lookups, by cache and result (hit, miss)", ["cache", "result"])
+
+
+def _key_samples(field: str) -> list:
+    rotators = {"google": google_key_rotator, "video_gen": video_gen_key_rotator, "pexels": pexels_key_rotator}
+    # Labelled by hashed id: masked keys can collide (e.g. service-account paths all end in "json") and leak key material
+    return [
+        ({"provider": provider, "key_id": stat["key_id"]}, stat[field])
+        for provider, rotator in rotators.items() if rotator is not None
+        for stat in rotator.get_stats()
+    ]
+
+
+for _field, _kind, _help in (
+    ("requests", "counter", "Requests made with each API key"),
+    ("successes", "counter", "Successful requests per API key"),
+    ("errors", "counter", "Failed requests per API key"),
+    ("rate_limited", "counter", "Rate-limited (429) responses per API key"),
+    ("error_rate", "gauge", "Recent error rate per API key"),
+    ("cooldown_remaining", "gauge", "Seconds until a cooling-down API key is usable again"),
+):
+    metrics.callback(f"neogen_api_key_{_field}" + ("_total" if _kind == "counter" else ""), _help, lambda f=_field: _key_samples(f), kind=_kind)
+metrics.callback("neogen_api_key_healthy", "1 if the API key is usable now", lambda: [(labels, int(v)) for labels, v in _key_samples("healthy")])
+
+metrics.callback("neogen_provider_concurrency_limit", "Current adaptive concurrency limit per provider",
+                 lambda: [({"provider": l["provider"]}, l["limit"]) for l in provider_limiters.snapshot()])
+metrics.callback("neogen_provider_in_flight", "Requests in flight per provider",
+                 lambda: [({"provider": l["provider"]}, l["in_flight"]) for l in provider_limiters.snapshot()])
+metrics.callback("neogen_provider_throttles_total", "Throttling responses per provider",
+                 lambda: [({"provider": l["provider"]}, l["throttles"]) for l in provider_limiters.snapshot()], kind="counter")
+
+metrics.callback("neogen_download_bytes_total", "Bytes of completed downloads, by source", lambda: [
+    ({"source": "http"}, download_manager.bytes_downloaded),
+    ({"source": "gcs"}, gcs_downloader.bytes_downloaded),
+], kind="counter")
+metrics.callback("neogen_downloads_total", "Completed downloads, by source", lambda: [
+    ({"source": "http"}, download_manager.files_downloaded),
+    ({"source": "gcs"}, gcs_downloader.files_downloaded),
+], kind="counter")
+metrics.callback("neogen_coalesced_calls_in_flight", "Distinct provider calls currently shared by single-flight", single_flight.in_flight)
+
+metrics.callback("neogen_render_jobs", "Render jobs by state (running, queued)",
+                 lambda: [({"state": state}, admission_controller.snapshot()[state]) for state in ("running", "queued")])
+metrics.callback("neogen_render_jobs_max", "Render job limits by state",
+                 lambda: [({"state": "running"}, MAX_RUNNING_JOBS), ({"state": "queued"}, MAX_QUEUED_JOBS)])
+metrics.callback("neogen_render_jobs_completed_total", "Render jobs completed", lambda: admission_controller.snapshot()["completed"], kind="counter")
+metrics.callback("neogen_render_jobs_rejected_total", "Render jobs rejected because the queue was full", lambda: admission_controller.snapshot()["rejected"], kind="counter")
+metrics.callback("neogen_tasks", "Known tasks by status", lambda: [({"status": status}, count) for status, count in task_store.count_by_status().items()])
+
+
+def _storage_samples(fields: tuple) -> list:
+    # As of the last periodic sweep; walking the whole tree on every scrape is too slow
+    usage = storage_manager.swept_usage
+    if usage is None:
+        return []
+    return [({"kind": field.removesuffix("_bytes")}, usage[field]) for field in fields]
+
+
+metrics.callback("neogen_storage_bytes", "Bytes used under BASE_TEMP_DIR by kind, as of the last storage sweep",
+                 lambda: _storage_samples(("task_bytes", "music_cache_bytes")))
+metrics.callback("neogen_storage_quota_bytes", "Storage quota for BASE_TEMP_DIR (0 = none)", lambda: storage_manager.quota_bytes)
+metrics.callback("neogen_storage_evicted_bytes_total", "Bytes evicted by retention and quota sweeps", lambda: storage_manager.evicted_bytes, kind="counter")
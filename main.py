@@ -1,16 +1,92 @@
 # main.py
+import time
+STARTED_AT = time.monotonic()  # before the imports below, so boot time includes them
+import asyncio
+import json
 import uuid
 import os
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+import shutil
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from schemas import VideoRequest
-from services import ai_service, video_service
-from config import BASE_TEMP_DIR
+from schemas import VideoRequest, BatchVideoRequest, ScriptResponse
+# ai_service and video_service (Gemini SDK, MoviePy, numpy, scipy) are imported by
+# the render worker (warm-up or first job), not at startup
+from services import batch_service
+from config import BASE_TEMP_DIR, progress_broker, task_store, TASK_PURGE_INTERVAL_SECONDS, TASK_TTL_SECONDS
+from config import storage_manager, STORAGE_SWEEP_INTERVAL_SECONDS, admission_controller, job_cost_model
+from config import etag_cache, DOWNLOAD_ACCEL_REDIRECT_PREFIX, DOWNLOAD_CACHE_MAX_AGE_SECONDS
+from config import idempotency_index, RESUME_ON_STARTUP, WARMUP_ON_STARTUP
+from config import metrics, tasks_submitted_total, tasks_finished_total, task_duration_seconds
+from config import cancellation_registry
+from utils.file_delivery import http_date, is_not_modified
+from utils.task_store import FINISHED_STATUSES
+from utils.storage_manager import FINAL_VIDEO
+from utils.idempotency import IdempotencyConflict, request_fingerprint
+from utils.checkpoint import TaskManifest, find_interrupted, COMPLETE, FAILED
+from utils.cancellation import TaskCancelled, current_token
+
+async def purge_expired_tasks():
+    """
+    Periodically drops finished tasks whose TTL has passed.
+    """
+    while True:
+        expired = await asyncio.to_thread(task_store.purge_expired)
+        for task_id in expired:
+            progress_broker.forget(task_id)
+        if expired:
+            print(f"🧹 Purged {len(expired)} expired tasks")
+        batch_service.purge_finished(TASK_TTL_SECONDS)
+        await asyncio.sleep(TASK_PURGE_INTERVAL_SECONDS)
+
+async def warm_up_worker():
+    """
+    Runs the render warm-up, then lets the admission controller start jobs.
+    """
+    from services import warmup_service
+    try:
+        await asyncio.to_thread(warmup_service.warm_up)
+    finally:
+        admission_controller.resume()
+
+async def sweep_storage():
+    """
+    Periodically applies final-video retention and the disk quota.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(storage_manager.sweep)
+        except Exception as e:
+            print(f"⚠️  Storage sweep failed: {e}")
+        await asyncio.sleep(STORAGE_SWEEP_INTERVAL_SECONDS)
+
+# Startup figures reported by GET /worker
+worker_stats = {"boot_seconds": None}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background = [
+        asyncio.create_task(purge_expired_tasks()),
+        asyncio.create_task(sweep_storage()),
+    ]
+    if WARMUP_ON_STARTUP:
+        # Accept and queue jobs right away, but only start them once the worker is warm
+        admission_controller.pause()
+        background.append(asyncio.create_task(warm_up_worker()))
+    if RESUME_ON_STARTUP:
+        await asyncio.to_thread(resume_interrupted_tasks)
+    worker_stats["boot_seconds"] = round(time.monotonic() - STARTED_AT, 3)
+    print(f"🚀 API ready in {worker_stats['boot_seconds']:.2f}s")
+    yield
+    for task in background:
+        task.cancel()
+    admission_controller.shutdown()
 
 app = FastAPI(
     title="AI Video Generation API",
     description="Generates a video from a text prompt asynchronously.",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware to allow requests from React frontend
@@ -23,16 +99,41 @@ app.add_middleware(
 )
 
 # --- Task Status "Database" ---
-# This global dictionary will store the status of each task.
-# In production, you'd replace this with a database (like Redis or Postgres).
-task_statuses = {}
+# Task statuses live in config.task_store (in-memory by default, SQLite with
+# TASK_STORE_BACKEND=sqlite so they survive restarts and are shared between workers).
+
+# A task moves pending -> generating_script -> generating_video and ends in one of
+# FINISHED_STATUSES; DELETE /tasks/{task_id} can move an active task to "cancelling" first.
+ACTIVE_STATUSES = ("pending", "generating_script", "generating_video")
+UNFINISHED_STATUSES = ACTIVE_STATUSES + ("cancelling",)
+
+def create_task_status(task_id: str, status: str, message: str, **fields):
+    """
+    Registers a new task and pushes its first status to progress subscribers.
+    """
+    task_store.create(task_id, status, message, **fields)
+    progress_broker.publish(task_id, status, message, **fields)
+
+def set_task_status(task_id: str, status: str, message: str, from_statuses: tuple = ACTIVE_STATUSES, **fields) -> bool:
+    """
+    Moves a task to `status` if it is currently in one of `from_statuses`
+    (an atomic compare-and-set in the task store) and pushes the new status
+    to progress subscribers.
+
+    Returns:
+        False, without publishing, if the task was in another status.
+    """
+    if not task_store.transition(task_id, from_statuses, status, message, **fields):
+        return False
+    progress_broker.publish(task_id, status, message, **fields)
+    return True
 
 # --- The Background Worker Function ---
 
-def run_video_generation(task_id: str, prompt: str, duration_seconds: int = 20, orientation: str = "horizontal"):
+def run_video_generation(task_id: str, prompt: str, duration_seconds: int = 20, orientation: str = "horizontal", batch_id: str = None, batch_index: int = None):
     """
     This is the long-running function that runs in the background.
-    It updates the task_statuses dictionary as it progresses.
+    It updates the task's status in the task store as it progresses.
     
     Args:
         task_id: Unique identifier for this video generation task
@@ -40,74 +141,426 @@ def run_video_generation(task_id: str, prompt: str, duration_seconds: int = 20,
         prompt: The user's video prompt
         duration_seconds: The exact total duration for the video (default: 20)
         orientation: Video orientation ("horizontal" or "vertical")
+        batch_id: Set for items of POST /generate-videos; the script and assets
+            then come from the batch's shared preparation
+        batch_index: Position of this item in its batch
     """
+    from services import ai_service, video_service
+    
+    # The checkpoint lets a crashed or failed task resume where it stopped
+    task_dir = os.path.join(BASE_TEMP_DIR, task_id)
+    manifest = TaskManifest.open(task_dir)
+    # Everything this task runs (including its coroutines and their threads) sees the token
+    token = cancellation_registry.token_for(task_id)
+    context_token = current_token.set(token)
+    started_at = time.monotonic()
+    final_status = "error"
     try:
+        token.raise_if_cancelled()
+        manifest.start(prompt=prompt, duration_seconds=duration_seconds, orientation=orientation)
+        
         # 1. Update status
-        task_statuses[task_id] = {"status": "generating_script", "message": f"Generating script for {duration_seconds} second video ({orientation})..."}
+        set_task_status(task_id, "generating_script", f"Generating script for {duration_seconds} second video ({orientation})...")
         
-        # 2. Generate script with the specified duration
-        script = ai_service.generate_script(prompt, total_duration_seconds=duration_seconds)
+        # 2. Generate script with the specified duration (or reuse the checkpointed one)
+        assets = None
+        if manifest.script is not None:
+            script = ScriptResponse(**manifest.script)
+            print(f"♻️  Resuming task {task_id} from its checkpoint")
+        elif batch_id is not None:
+            script, assets = batch_service.get_script(batch_id, batch_index)
+        else:
+            script = ai_service.generate_script(prompt, total_duration_seconds=duration_seconds)
+        if manifest.script is None:
+            manifest.set_script(script.model_dump())
+        token.raise_if_cancelled()
         
         # 3. Update status
-        task_statuses[task_id] = {"status": "generating_video", "message": "Script complete. Generating video..."}
+        set_task_status(task_id, "generating_video", "Script complete. Generating video...")
         
         # 4. Create video (This is the long part)
         # We pass the task_id to video_service for file organization
-        video_path = video_service.create_video(script, task_id, orientation)
+        video_path = video_service.create_video(script, task_id, orientation, assets=assets, manifest=manifest)
+        manifest.finish(COMPLETE)
+        final_status = "complete"
+        # Nothing left to cancel: a DELETE from here on gets 409 instead of marking the task "cancelling"
+        cancellation_registry.discard(task_id)
         
         # 5. Update status to "complete"
         final_file_path = os.path.relpath(video_path, BASE_TEMP_DIR)
-        task_statuses[task_id] = {
-            "status": "complete",
-            "message": "Video generation complete.",
-            "video_filename": final_file_path # e.g., "task_id_xyz/final_video.mp4"
-        }
+        set_task_status(
+            task_id,
+            "complete",
+            "Video generation complete.",
+            from_statuses=UNFINISHED_STATUSES,
+            video_filename=final_file_path, # e.g., "task_id_xyz/final_video.mp4"
+            download_url=f"/download/{final_file_path}",
+        )
+        
+        # A new final video may have pushed us over the disk quota
+        try:
+            storage_manager.sweep()
+        except Exception as e:
+            print(f"⚠️  Storage sweep failed: {e}")
 
+    except TaskCancelled:
+        print(f"--- Task {task_id} CANCELLED ---")
+        final_status = "cancelled"
+        # A cancelled task isn't resumable, so its checkpoint goes with its files
+        shutil.rmtree(task_dir, ignore_errors=True)
+        set_task_status(task_id, "cancelled", "Task was cancelled.", from_statuses=UNFINISHED_STATUSES)
     except Exception as e:
         print(f"--- Task {task_id} FAILED ---")
         print(f"Error: {e}")
+        manifest.finish(FAILED, str(e))
         # 6. Update status to "error"
-        task_statuses[task_id] = {"status": "error", "message": str(e)}
+        set_task_status(task_id, "error", str(e), from_statuses=UNFINISHED_STATUSES)
+    finally:
+        current_token.reset(context_token)
+        cancellation_registry.discard(task_id)
+        tasks_finished_total.inc(status=final_status)
+        task_duration_seconds.observe(time.monotonic() - started_at, status=final_status)
+        if batch_id is not None:
+            batch_service.finish_item(batch_id)
+
+def resume_task(manifest: TaskManifest) -> bool:
+    """
+    Re-queues a checkpointed task under its original task_id. Artifacts that
+    are still valid are reused; everything else is redone.
+
+    Returns:
+        False if the render queue is full (the task's status is left as it was),
+        or if the task finished in the meantime.
+    """
+    task_id = os.path.basename(manifest.task_dir)
+    request = manifest.request
+    previous = task_store.get(task_id)
+    # The priority survives in the task store's extra fields (unless it was in memory and the process died)
+    priority = previous.get("priority", "normal") if previous is not None else "normal"
+    message = "Task resumed from its checkpoint and queued."
+    if previous is None:
+        create_task_status(task_id, "pending", message, priority=priority)
+    elif not set_task_status(task_id, "pending", message, from_statuses=UNFINISHED_STATUSES + ("error",)):
+        manifest.release_resume()
+        return False
+
+    if manifest.script is not None:
+        cost = job_cost_model.estimate_script(ScriptResponse(**manifest.script), request["orientation"])
+    else:
+        cost = job_cost_model.estimate(request["duration_seconds"], request["orientation"])
+    admitted = admission_controller.submit(
+        task_id,
+        run_video_generation,
+        task_id,
+        request["prompt"],
+        request["duration_seconds"],
+        request["orientation"],
+        priority=priority,
+        cost=cost,
+    )
+    if not admitted:
+        manifest.release_resume()
+        if previous is None:
+            task_store.delete(task_id)
+        else:
+            fields = {k: v for k, v in previous.items() if k not in ("status", "message", "created_at", "updated_at")}
+            task_store.transition(task_id, ("pending",), previous["status"], previous["message"], **fields)
+    return admitted
+
+def resume_interrupted_tasks():
+    """
+    On startup, resumes tasks whose worker died while they were running.
+    """
+    for manifest in find_interrupted(BASE_TEMP_DIR):
+        # Several workers may start together; only one resumes each task
+        if not manifest.claim_resume():
+            continue
+        task_id = os.path.basename(manifest.task_dir)
+        if resume_task(manifest):
+            print(f"♻️  Resuming interrupted task {task_id}")
+        else:
+            print(f"⚠️  Render queue full; interrupted task {task_id} can be resumed with POST /tasks/{task_id}/resume")
 
 # --- API Endpoints ---
 
+def is_reusable_task(task_id: str) -> bool:
+    """
+    Whether a duplicate submission may be answered with this task:
+    it must still exist and must not have failed or been cancelled.
+    """
+    task = task_store.get(task_id)
+    return task is not None and task["status"] not in ("error", "cancelled", "cancelling")
+
 @app.post("/generate-video")
-async def generate_video_endpoint(request: VideoRequest, background_tasks: BackgroundTasks):
+async def generate_video_endpoint(request: VideoRequest, idempotency_key: str | None = Header(default=None, max_length=255)):
     """
-    Receives the request, assigns a task_id, and starts the
-    video generation in the background. Returns 202 Accepted.
+    Receives the request, assigns a task_id, and queues the video
+    generation with the admission controller. Returns 202 Accepted,
+    or 429 with Retry-After when the render queue is full. Queued jobs
+    start by `priority`, then shortest estimated render first.
+
+    A repeat of an earlier submission (same Idempotency-Key header, or the
+    same request content within the dedupe window) returns 200 with the
+    existing task instead of starting new work, unless that task failed.
     """
-    # 1. Generate a unique task ID
+    # 1. Generate a unique task ID and initialize its status (before admission, since it may start right away)
     task_id = str(uuid.uuid4())
+    await asyncio.to_thread(create_task_status, task_id, "pending", "Task received and queued.", priority=request.priority)
+
+    # 2. Unless an earlier task already covers this request (the new task exists
+    #    first, so a concurrent duplicate checking it sees a live task)
+    try:
+        # is_reusable reads the task store, so the claim runs off the event loop too
+        existing_task_id = await asyncio.to_thread(
+            idempotency_index.claim,
+            task_id,
+            request_fingerprint(request),
+            idempotency_key=idempotency_key,
+            is_reusable=is_reusable_task,
+        )
+    except IdempotencyConflict as e:
+        await asyncio.to_thread(task_store.delete, task_id)
+        progress_broker.forget(task_id)
+        raise HTTPException(status_code=422, detail=str(e))
+    if existing_task_id is not None:
+        await asyncio.to_thread(task_store.delete, task_id)
+        progress_broker.forget(task_id)
+        tasks_submitted_total.inc(outcome="duplicate")
+        existing = await asyncio.to_thread(task_store.get, existing_task_id) or {}
+        print(f"♻️  Duplicate submission; returning existing task {existing_task_id}")
+        return JSONResponse(
+            status_code=200,
+            headers={"Idempotent-Replayed": "true"},
+            content={
+                "message": "An identical request is already in progress or complete.",
+                "task_id": existing_task_id,
+                "status": existing.get("status"),
+                "status_url": f"/status/{existing_task_id}",
+                "events_url": f"/events/{existing_task_id}",
+                "duplicate": True,
+            }
+        )
     
-    # 2. Initialize the status for this task
-    task_statuses[task_id] = {"status": "pending", "message": "Task received and queued."}
-    
-    # 3. Add the long-running function to the background task queue
-    background_tasks.add_task(
+    # 3. Hand the long-running function to the bounded render queue
+    admitted = admission_controller.submit(
+        task_id,
         run_video_generation, 
         task_id, 
         request.prompt,
         request.video_length_seconds,
-        request.orientation
+        request.orientation,
+        priority=request.priority,
+        cost=job_cost_model.estimate(request.video_length_seconds, request.orientation),
     )
+    if not admitted:
+        await asyncio.to_thread(task_store.delete, task_id)
+        progress_broker.forget(task_id)
+        idempotency_index.release(task_id)
+        tasks_submitted_total.inc(outcome="rejected")
+        retry_after = admission_controller.retry_after()
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(retry_after)},
+            content={
+                "message": "Too many videos are being generated right now. Please retry later.",
+                "retry_after_seconds": retry_after,
+            }
+        )
+    
+    tasks_submitted_total.inc(outcome="accepted")
     
     # 4. Return immediately with the task_id
+    position = admission_controller.position(task_id)
     return JSONResponse(
         status_code=202, # "Accepted"
         content={
             "message": "Video generation started. Poll the status endpoint to check progress.",
             "task_id": task_id,
-            "status_url": f"/status/{task_id}"
+            "status_url": f"/status/{task_id}",
+            "events_url": f"/events/{task_id}",
+            "queue_position": position,
+        }
+    )
+
+@app.post("/tasks/{task_id}/resume")
+async def resume_task_endpoint(task_id: str):
+    """
+    Resumes a failed or interrupted task from its checkpoint. Stages whose
+    artifacts are still on disk and intact (script, voiceovers, stock and
+    Veo media, music) are skipped. Returns 202, or 409 if the task is
+    complete or still running.
+    """
+    task_dir = os.path.realpath(os.path.join(BASE_TEMP_DIR, task_id))
+    if os.path.dirname(task_dir) != os.path.realpath(BASE_TEMP_DIR):
+        raise HTTPException(status_code=404, detail="Task not found.")
+    manifest = await asyncio.to_thread(TaskManifest.load, task_dir)
+    if manifest is None or not manifest.request:
+        raise HTTPException(status_code=404, detail="Task has no checkpoint to resume from.")
+    if manifest.state == COMPLETE:
+        raise HTTPException(status_code=409, detail="Task is already complete.")
+    if admission_controller.position(task_id) is not None or (manifest.state != FAILED and not manifest.is_orphaned()):
+        raise HTTPException(status_code=409, detail="Task is still running.")
+    if not manifest.claim_resume():
+        raise HTTPException(status_code=409, detail="Task is already being resumed.")
+
+    if not await asyncio.to_thread(resume_task, manifest):
+        retry_after = admission_controller.retry_after()
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(retry_after)},
+            content={
+                "message": "Too many videos are being generated right now. Please retry later.",
+                "retry_after_seconds": retry_after,
+            }
+        )
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": "Task resumed. Poll the status endpoint to check progress.",
+            "task_id": task_id,
+            "status_url": f"/status/{task_id}",
+            "events_url": f"/events/{task_id}",
+            "queue_position": admission_controller.position(task_id),
+        }
+    )
+
+@app.delete("/tasks/{task_id}")
+async def cancel_task_endpoint(task_id: str):
+    """
+    Cancels a task. A queued task is removed from the queue right away (200).
+    A running task is signalled and stops at its next check: between scenes,
+    inside download loops, in the Veo poll loop or between encoded frames;
+    its worker slot is then released and its directory deleted (202, status
+    "cancelling" until it has stopped). Returns 409 if the task has already
+    finished or is running on another worker.
+    """
+    task = await asyncio.to_thread(task_store.get, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task ID not found.")
+    if task["status"] in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Task has already finished ({task['status']}).")
+
+    if admission_controller.cancel(task_id):
+        await asyncio.to_thread(shutil.rmtree, os.path.join(BASE_TEMP_DIR, task_id), True)
+        await asyncio.to_thread(set_task_status, task_id, "cancelled", "Task was cancelled before it started.")
+        if task.get("batch_id") is not None:
+            batch_service.finish_item(task["batch_id"])
+        tasks_finished_total.inc(status="cancelled")
+        return JSONResponse(status_code=200, content={"task_id": task_id, "status": "cancelled"})
+
+    # Only a run active in this process has a token. "cancelling" is published
+    # before signalling, so the worker's final "cancelled" status comes after it;
+    # it is a transition from an active status, so a task that finished in the
+    # meantime keeps its final status and is not signalled
+    cancelling = await asyncio.to_thread(
+        cancellation_registry.cancel,
+        task_id,
+        before=lambda: set_task_status(task_id, "cancelling", "Cancelling task...", from_statuses=ACTIVE_STATUSES),
+    )
+    if not cancelling:
+        task = await asyncio.to_thread(task_store.get, task_id)
+        if task is not None and task["status"] in FINISHED_STATUSES:
+            raise HTTPException(status_code=409, detail=f"Task has already finished ({task['status']}).")
+        if task is None or task["status"] != "cancelling":
+            raise HTTPException(status_code=409, detail="Task is not running on this worker.")
+    return JSONResponse(
+        status_code=202,
+        content={"task_id": task_id, "status": "cancelling", "status_url": f"/status/{task_id}"},
+    )
+
+@app.post("/generate-videos")
+async def generate_videos_endpoint(request: BatchVideoRequest):
+    """
+    Batch version of /generate-video for campaigns of many variants.
+    All scripts are generated up front, then every distinct stock query,
+    music search and voiceover line across the batch is fetched once and
+    shared by the renders. The batch is admitted all-or-nothing.
+    Returns 202 with a batch_id and one task_id per request.
+    """
+    if len(request.requests) > admission_controller.capacity():
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: at most {admission_controller.capacity()} videos can be queued at once.",
+        )
+
+    batch_id = str(uuid.uuid4())
+    items = [(str(uuid.uuid4()), item) for item in request.requests]
+
+    def create_statuses():
+        for task_id, item in items:
+            create_task_status(task_id, "pending", "Task received and queued.", batch_id=batch_id, priority=item.priority)
+
+    await asyncio.to_thread(create_statuses)
+
+    batch_service.register_batch(batch_id, items)
+    admitted = admission_controller.submit_many([
+        (task_id, run_video_generation, (task_id, item.prompt, item.video_length_seconds, item.orientation),
+         {"batch_id": batch_id, "batch_index": index},
+         item.priority, job_cost_model.estimate(item.video_length_seconds, item.orientation))
+        for index, (task_id, item) in enumerate(items)
+    ])
+    if not admitted:
+        batch_service.discard_batch(batch_id)
+        for task_id, _ in items:
+            await asyncio.to_thread(task_store.delete, task_id)
+            progress_broker.forget(task_id)
+        tasks_submitted_total.inc(len(items), outcome="rejected")
+        retry_after = admission_controller.retry_after(len(items))
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(retry_after)},
+            content={
+                "message": "Not enough room in the render queue for this batch. Please retry later.",
+                "retry_after_seconds": retry_after,
+            }
+        )
+
+    # Shared preparation starts right away; renders pick up scripts as they become ready
+    batch_service.start_batch(batch_id)
+    tasks_submitted_total.inc(len(items), outcome="accepted")
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": "Batch accepted. Poll the batch or task status endpoints to check progress.",
+            "batch_id": batch_id,
+            "batch_url": f"/batches/{batch_id}",
+            "tasks": [
+                {"task_id": task_id, "status_url": f"/status/{task_id}", "events_url": f"/events/{task_id}"}
+                for task_id, _ in items
+            ],
         }
     )
 
+@app.get("/batches/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """
+    Status of a batch: per-task statuses plus how many upstream fetches were saved by deduplication.
+    """
+    summary = batch_service.batch_summary(batch_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Batch ID not found.")
+    tasks = {}
+    for task_id in summary.pop("task_ids"):
+        status = await asyncio.to_thread(task_store.get, task_id)
+        tasks[task_id] = status["status"] if status else "expired"
+    return {"batch_id": batch_id, **summary, "tasks": tasks}
+
+@app.get("/tasks")
+async def list_tasks(status: str = "pending", limit: int = Query(default=100, ge=1, le=1000)):
+    """
+    Tasks in one status, oldest first (e.g. the backlog waiting for a render slot).
+    """
+    tasks = await asyncio.to_thread(task_store.list_by_status, status, limit)
+    return {"status": status, "tasks": tasks}
+
 @app.get("/status/{task_id}")
 async def get_task_status(task_id: str):
     """
     Poll this endpoint to check the status of a generation task.
     """
-    status = task_statuses.get(task_id)
+    # The store returns a fresh copy, so decorating it below never touches stored state
+    status = await asyncio.to_thread(task_store.get, task_id)
     
     if not status:
         raise HTTPException(status_code=404, detail="Task ID not found.")
@@ -115,26 +568,152 @@ async def get_task_status(task_id: str):
     if status["status"] == "complete":
         # If complete, provide the download URL
         status["download_url"] = f"/download/{status['video_filename']}"
+    elif status["status"] == "pending":
+        # Still waiting for a render slot
+        position = admission_controller.position(task_id)
+        if position:
+            status["queue_position"] = position
+            status["estimated_start_seconds"] = round(admission_controller.estimated_start_seconds(position))
     
+    # Finer-grained progress (scene, percent, ETA) from the pipeline
+    progress = progress_broker.latest(task_id)
+    if progress is not None and progress["stage"] != status["status"]:
+        return {**status, "progress": progress}
     return status
 
+@app.get("/events/{task_id}")
+async def stream_task_events(task_id: str, request: Request):
+    """
+    Server-Sent Events stream of a task's progress.
+    Sends the current state immediately, then one event each time the
+    pipeline advances (stage, scene, percent encoded, ETA), and closes
+    after "complete", "error" or "cancelled".
+    """
+    if await asyncio.to_thread(task_store.get, task_id) is None:
+        raise HTTPException(status_code=404, detail="Task ID not found.")
+
+    async def event_source():
+        async for event in progress_broker.stream(task_id):
+            if await request.is_disconnected():
+                break
+            if event is None:
+                # SSE comment line, keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+            else:
+                yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/ws/{task_id}")
+async def task_events_websocket(websocket: WebSocket, task_id: str):
+    """
+    WebSocket alternative to /events/{task_id}: the same progress events as JSON messages.
+    """
+    await websocket.accept()
+    if await asyncio.to_thread(task_store.get, task_id) is None:
+        await websocket.close(code=4404, reason="Task ID not found.")
+        return
+    try:
+        async for event in progress_broker.stream(task_id):
+            if event is not None:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
 @app.get("/download/{task_id}/{filename}")
-async def download_video(task_id: str, filename: str):
+async def download_video(task_id: str, filename: str, request: Request):
     """
     Downloads the final video file.
     The path comes from the status endpoint (e.g., task_id/final_video.mp4).
+    
+    Supports Range requests (206) for seeking players, a strong content ETag
+    with If-None-Match / If-Modified-Since (304) for revalidating caches, and
+    zero-copy delivery (ASGI pathsend, or nginx X-Accel-Redirect when configured).
+
+    Only the final video of a known task is served; nothing else under
+    BASE_TEMP_DIR (manifests, the music cache...) is reachable.
     """
-    file_path = os.path.join(BASE_TEMP_DIR, task_id, filename)
+    if filename != FINAL_VIDEO or await asyncio.to_thread(task_store.get, task_id) is None:
+        raise HTTPException(status_code=404, detail="File not found.")
+    file_path = os.path.realpath(os.path.join(BASE_TEMP_DIR, task_id, filename))
+    if not file_path.startswith(os.path.realpath(BASE_TEMP_DIR) + os.sep):
+        raise HTTPException(status_code=404, detail="File not found.")
 
-    if not os.path.exists(file_path):
+    try:
+        stat_result = await asyncio.to_thread(os.stat, file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found. It may still be generating or an error occurred.")
 
+    etag = await asyncio.to_thread(etag_cache.get, file_path, stat_result)
+    # A downloaded video counts as used for retention and LRU eviction
+    await asyncio.to_thread(storage_manager.touch, os.path.dirname(file_path))
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(stat_result.st_mtime),
+        "Cache-Control": f"public, max-age={DOWNLOAD_CACHE_MAX_AGE_SECONDS}",
+    }
+
+    if is_not_modified(request.headers, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    if DOWNLOAD_ACCEL_REDIRECT_PREFIX:
+        # nginx serves the bytes (sendfile, Range, HEAD) from its internal location
+        return Response(
+            media_type="video/mp4",
+            headers={
+                **headers,
+                "X-Accel-Redirect": f"{DOWNLOAD_ACCEL_REDIRECT_PREFIX}/{task_id}/{filename}",
+                "Content-Disposition": f'attachment; filename="{filename}"',
+            },
+        )
+
+    # FileResponse handles Range/If-Range (206/416) and uses pathsend where the server supports it
     return FileResponse(
         file_path,
         media_type="video/mp4",
-        filename=filename
+        filename=filename,
+        stat_result=stat_result,
+        headers=headers,
     )
 
+@app.get("/worker")
+async def worker_status():
+    """
+    Startup and latency figures for autoscaling: API boot time, the render
+    warm-up report, and the first (cold) vs later (warm) job durations.
+    """
+    from services import warmup_service
+    jobs = admission_controller.snapshot()
+    return {
+        **worker_stats,
+        "warmup": warmup_service.report,
+        "first_job_seconds": jobs["first_job_seconds"],
+        "warm_avg_job_seconds": jobs["warm_avg_job_seconds"],
+        "accepting_jobs": not jobs["paused"],
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Pipeline metrics in the Prometheus text format: task throughput and
+    durations, per-stage latency histograms, download bytes, cache hit
+    rates, API key usage, provider concurrency, queue depth and disk usage.
+    """
+    body = await asyncio.to_thread(metrics.render)
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
+
+@app.get("/storage")
+async def get_storage_usage():
+    """
+    Disk usage of generated files (task directories and music cache) against the quota.
+    """
+    return await asyncio.to_thread(storage_manager.usage)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,11 +1,15 @@
 # schemas.py
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Literal
 
 class VideoRequest(BaseModel):
     prompt: str
     video_length_seconds: int = 20
     orientation: str = "horizontal"  # "horizontal" or "vertical"
+    priority: Literal["high", "normal", "low"] = "normal"  # render queue class (see utils.admission)
+
+class BatchVideoRequest(BaseModel):
+    requests: List[VideoRequest] = Field(min_length=1)
 
 class SceneScript(BaseModel):
     scene_number: int
@@ -1,20 +1,27 @@
 # services/ai_service.py
-import google.generativeai as genai
 import json
 import re
 import wave  # <-- ADDED IMPORT
-import requests
-import time
+import asyncio
 import os
-from google.oauth2 import service_account
+import threading
+import weakref
 from config import google_key_rotator, video_gen_key_rotator, GEMINI_3_PRO_KEY # Import the rotator instances
+from config import async_http_client, download_manager, single_flight, provider_limiters
+from config import gcs_downloader, GCS_STREAM_TO_DECODER
+from config import stage_duration_seconds, cache_requests_total
+from utils.async_runtime import run_sync
+from utils.cancellation import TaskCancelled, check_cancelled
+from utils.http_client import parse_retry_after
+from utils.single_flight import normalize_key, share_file
 from schemas import ScriptResponse
 
 # Vertex AI Veo 3.1 Configuration
 # Get project ID and location from environment variables
 VEO_PROJECT_ID = os.getenv("VEO_PROJECT_ID", "")
 VEO_LOCATION = os.getenv("VEO_LOCATION", "us-central1")
-VEO_API_BASE_URL = os.getenv("VEO_API_BASE_URL", "")
+# Vertex AI root for Veo; defaults to the regional endpoint of VEO_LOCATION
+VEO_API_BASE_URL = os.getenv("VEO_API_BASE_URL", "").rstrip("/")
 
 # --- SCRIPT PROMPT ---
 SCRIPT_PROMPT_TEMPLATE = """
@@ -191,6 +198,74 @@ CRITICAL REQUIREMENTS:
 Do not include any text, notes, or markdown (like ```json) before or after the JSON object.
 """
 
+# Gemini generative clients, one per API key. Async (gRPC asyncio) clients are
+# bound to the event loop they were created on, so they are cached per loop.
+_gemini_clients = {}
+_gemini_async_clients = weakref.WeakKeyDictionary()
+_gemini_clients_lock = threading.Lock()
+
+
+def _gemini_client(api_key: str, use_async: bool = False):
+    """
+    Returns the generative client for `api_key`, creating it on first use.
+    The key is passed in the client's own options, not via the process-global
+    genai.configure(), so concurrent callers never send on each other's key.
+    The async client must be requested from the loop it will be used on.
+    """
+    from google.ai import generativelanguage as glm
+
+    with _gemini_clients_lock:
+        if use_async:
+            clients = _gemini_async_clients.setdefault(asyncio.get_running_loop(), {})
+        else:
+            clients = _gemini_clients
+        client = clients.get(api_key)
+        if client is None:
+            client_class = glm.GenerativeServiceAsyncClient if use_async else glm.GenerativeServiceClient
+            client = clients[api_key] = client_class(client_options={"api_key": api_key})
+        return client
+
+
+def _gemini_request(model_name: str, prompt: str, generation_config: dict = None):
+    """
+    Builds the generateContent request GenerativeModel would send for a text prompt.
+    """
+    from google.generativeai import protos
+    from google.generativeai.types import content_types, generation_types
+
+    contents = content_types.to_contents(prompt)
+    contents[-1].role = "user"
+    return protos.GenerateContentRequest(
+        model=f"models/{model_name}",
+        contents=contents,
+        generation_config=generation_types.to_generation_config_dict(generation_config),
+    )
+
+
+def _gemini_generate(api_key: str, model_name: str, prompt: str, generation_config: dict = None):
+    """
+    Sends a prompt to Gemini on `api_key`.
+
+    Returns:
+        A GenerateContentResponse (with .text and .candidates).
+    """
+    from google.generativeai.types import generation_types
+
+    response = _gemini_client(api_key).generate_content(_gemini_request(model_name, prompt, generation_config))
+    return generation_types.GenerateContentResponse.from_response(response)
+
+
+async def _gemini_generate_async(api_key: str, model_name: str, prompt: str, generation_config: dict = None):
+    """
+    The asyncio version of _gemini_generate().
+    """
+    from google.generativeai.types import generation_types
+
+    client = _gemini_client(api_key, use_async=True)
+    response = await client.generate_content(_gemini_request(model_name, prompt, generation_config))
+    return generation_types.AsyncGenerateContentResponse.from_response(response)
+
+
 # --- _clean_json_response ---
 def _clean_json_response(text: str) -> str:
     """
@@ -313,6 +388,7 @@ def _validate_and_return_script(script_response: ScriptResponse, total_duration_
     return script_response
 
 # --- generate_script ---
+@stage_duration_seconds.timed(stage="script")
 def generate_script(prompt: str, total_duration_seconds: int = 20) -> ScriptResponse:
     """
     Generates the video script using Gemini 3 Pro Preview with GEMINI_3_PRO_KEY.
@@ -335,12 +411,12 @@ def generate_script(prompt: str, total_duration_seconds: int = 20) -> ScriptResp
     # Try GEMINI_3_PRO_KEY first for Gemini 3 Pro Preview
     if GEMINI_3_PRO_KEY:
         print(f"--- Using GEMINI_3_PRO_KEY for Gemini 3 Pro Preview ---")
-        genai.configure(api_key=GEMINI_3_PRO_KEY)
         try:
-            model = genai.GenerativeModel('gemini-3-pro-preview')
+            _gemini_client(GEMINI_3_PRO_KEY)
             print(f"✅ Using Gemini 3 Pro Preview model ---")
             try:
-                response = model.generate_content(full_prompt)
+                with provider_limiters.get("gemini").slot():
+                    response = _gemini_generate(GEMINI_3_PRO_KEY, 'gemini-3-pro-preview', full_prompt)
                 cleaned_json = _clean_json_response(response.text)
                 script_data = json.loads(cleaned_json)
                 script_response = ScriptResponse(**script_data)
@@ -360,13 +436,13 @@ def generate_script(prompt: str, total_duration_seconds: int = 20) -> ScriptResp
     for i in range(num_keys):
         api_key = google_key_rotator.get_key()
         print(f"--- Attempting script generation with key ...{api_key[-4:]} (try {i+1}/{num_keys}) ---")
-        genai.configure(api_key=api_key)
-        
-        model = genai.GenerativeModel('gemini-2.5-flash')
         print(f"--- Using Gemini 2.5 Flash ---")
         
+        response = None
         try:
-            response = model.generate_content(full_prompt)
+            with provider_limiters.get("gemini").slot():
+                response = _gemini_generate(api_key, 'gemini-2.5-flash', full_prompt)
+            google_key_rotator.report_success(api_key)
             raw_response = response.text
             print(f"--- Raw AI Response (first 200 chars): {raw_response[:200]}...")
             
@@ -380,8 +456,14 @@ def generate_script(prompt: str, total_duration_seconds: int = 20) -> ScriptResp
             error_message = str(e).lower()
             if "429" in error_message or "quota" in error_message:
                 print(f"Quota exceeded for key ...{api_key[-4:]}. Trying next key...")
+                google_key_rotator.report_rate_limited(api_key)
+                if google_key_rotator.seconds_until_available() > 0:
+                    break  # Every key is cooling down, don't burn the remaining attempts
                 continue
             else:
+                if response is None:
+                    # Only count failures of the request itself, not parsing/validation of the script
+                    google_key_rotator.report_error(api_key)
                 print(f"Error generating script with key ...{api_key[-4:]}: {e}")
                 # Continue to next key instead of raising immediately
                 if i == num_keys - 1:  # Last attempt
@@ -460,6 +542,8 @@ def generate_audio(text: str, output_path: str, target_duration: float = None) -
     Generates TTS audio using Gemini 2.5 Flash Preview TTS, with key rotation and speed control.
     Saves the audio to a valid WAV file.
     
+    Thin sync wrapper around generate_audio_async.
+    
     Args:
         text: The voiceover text to generate
         output_path: Path where the audio file will be saved
@@ -468,12 +552,36 @@ def generate_audio(text: str, output_path: str, target_duration: float = None) -
     Returns:
         Path to the generated audio file
     """
-    num_keys = len(google_key_rotator.api_keys)
-    
+    return run_sync(generate_audio_async(text, output_path, target_duration))
+
+
+async def generate_audio_async(text: str, output_path: str, target_duration: float = None) -> str:
+    """
+    The asyncio version of generate_audio.
+    """
     # We must save as .wav since the API returns raw PCM data
     # Ensure the output_path ends in .wav
     if not output_path.lower().endswith(".wav"):
         output_path = f"{output_path}.wav"
+
+    # Identical voiceover lines requested concurrently share one TTS call
+    key = normalize_key("tts", text, round(target_duration or 0, 2))
+    shared_path, shared = await single_flight.do_async(key, _generate_audio, text, output_path, target_duration)
+    cache_requests_total.inc(cache="tts_coalesce", result="hit" if shared else "miss")
+    if shared:
+        print(f"🔗 Reusing in-flight TTS audio for: '{text}'")
+        return share_file(shared_path, output_path)
+    return shared_path
+
+
+@stage_duration_seconds.timed(stage="tts")
+async def _generate_audio(text: str, output_path: str, target_duration: float = None) -> str:
+    """
+    Does the actual Gemini TTS request for generate_audio_async, then fits
+    the audio to the target duration off the event loop.
+    """
+    
+    num_keys = len(google_key_rotator.api_keys)
     
     # Calculate speed if target duration is provided
     speed = 1.0  # Default speed
@@ -483,28 +591,29 @@ def generate_audio(text: str, output_path: str, target_duration: float = None) -
         expected_wps = word_count / target_duration
         print(f"  📊 Audio speed calculation: {word_count} words, {target_duration:.1f}s target → speed: {speed:.2f}x (expected: {expected_wps:.2f} wps)")
 
+    audio_data = None
     for i in range(num_keys):
+        check_cancelled()
         api_key = google_key_rotator.get_key()
         print(f"--- Requesting audio with key ...{api_key[-4:]} (try {i+1}/{num_keys}) ---")
-        genai.configure(api_key=api_key)
-
         try:
             # --- USING YOUR WORKING MODEL CONFIG (NO SPEED PARAMETER) ---
             # Speed adjustment will be done using moviepy post-processing
-            model = genai.GenerativeModel(
-                model_name='gemini-2.5-flash-preview-tts',
-                generation_config={
-                    "response_modalities": ["AUDIO"],
-                    "speech_config": {
-                        "voice_config": {
-                            "prebuilt_voice_config": {"voice_name": "Kore"}
-                        }
+            generation_config = {
+                "response_modalities": ["AUDIO"],
+                "speech_config": {
+                    "voice_config": {
+                        "prebuilt_voice_config": {"voice_name": "Kore"}
                     }
                 }
-            )
+            }
             
             print(f"--- Requesting audio from Gemini for: '{text}' ---")
-            response = model.generate_content(f"Say this: {text}")
+            async with provider_limiters.get("gemini").slot_async():
+                response = await _gemini_generate_async(
+                    api_key, 'gemini-2.5-flash-preview-tts', f"Say this: {text}", generation_config
+                )
+            google_key_rotator.report_success(api_key)
 
             if (not response.candidates[0] or
                 not response.candidates[0].content or
@@ -514,146 +623,164 @@ def generate_audio(text: str, output_path: str, target_duration: float = None) -
 
             # Get the raw PCM audio data
             audio_data = response.candidates[0].content.parts[0].inline_data.data
+            break
+            
+        except Exception as e:
+            error_message = str(e).lower()
+            if "429" in error_message or "quota" in error_message:
+                print(f"Quota exceeded for key ...{api_key[-4:]}. Trying next key...")
+                google_key_rotator.report_rate_limited(api_key)
+                if google_key_rotator.seconds_until_available() > 0:
+                    break  # Every key is cooling down, don't burn the remaining attempts
+                continue # Go to the next iteration of the loop
+            else:
+                # This is a different error, raise it
+                google_key_rotator.report_error(api_key)
+                print(f"Error generating audio with key ...{api_key[-4:]}: {e}")
+                raise ValueError(f"Failed to generate audio: {e}")
+
+    # If the loop finishes without audio, all keys are exhausted
+    if audio_data is None:
+        raise ValueError("Failed to generate audio: All Google API keys are rate-limited.")
+
+    # Duration fitting is CPU work (resampling, WAV encoding) - keep it off the event loop
+    try:
+        return await asyncio.to_thread(_save_tts_audio, audio_data, output_path, target_duration)
+    except Exception as e:
+        raise ValueError(f"Failed to generate audio: {e}")
+
 
-            # Save to temporary file first
-            temp_wav_path = output_path.replace(".wav", "_temp.wav")
-            save_pcm_to_wav(temp_wav_path, audio_data)
+def _save_tts_audio(audio_data: bytes, output_path: str, target_duration: float = None) -> str:
+    """
+    Saves raw TTS PCM to output_path, resampling it to target_duration if given.
+    """
+    # Save to temporary file first
+    temp_wav_path = output_path.replace(".wav", "_temp.wav")
+    save_pcm_to_wav(temp_wav_path, audio_data)
+    
+    # Always adjust speed using moviepy if target duration is provided
+    # This ensures smooth audio transitions and exact duration matching
+    if target_duration and target_duration > 0:
+        try:
+            from moviepy import AudioFileClip
             
-            # Always adjust speed using moviepy if target duration is provided
-            # This ensures smooth audio transitions and exact duration matching
-            if target_duration and target_duration > 0:
-                try:
-                    from moviepy import AudioFileClip
-                    
-                    print(f"  ⚡ Adjusting audio speed to match target duration ({target_duration:.1f}s)...")
-                    audio_clip = AudioFileClip(temp_wav_path)
-                    original_duration = audio_clip.duration
-                    
-                    # Calculate the speed needed to match target duration exactly
-                    # speed = original_duration / target_duration
-                    # This ensures no audio is cut - we just speed up or slow down
-                    calculated_speed = original_duration / target_duration
-                    
-                    # Clamp speed to reasonable bounds for natural-sounding speech
-                    # Too fast (>1.5) or too slow (<0.7) sounds unnatural
-                    final_speed = max(0.7, min(1.5, calculated_speed))
+            print(f"  ⚡ Adjusting audio speed to match target duration ({target_duration:.1f}s)...")
+            audio_clip = AudioFileClip(temp_wav_path)
+            original_duration = audio_clip.duration
+            
+            # Calculate the speed needed to match target duration exactly
+            # speed = original_duration / target_duration
+            # This ensures no audio is cut - we just speed up or slow down
+            calculated_speed = original_duration / target_duration
+            
+            # Clamp speed to reasonable bounds for natural-sounding speech
+            # Too fast (>1.5) or too slow (<0.7) sounds unnatural
+            final_speed = max(0.7, min(1.5, calculated_speed))
+            
+            if abs(final_speed - 1.0) > 0.01:  # Only adjust if significant difference
+                print(f"  📊 Original: {original_duration:.2f}s → Target: {target_duration:.2f}s → Speed: {final_speed:.2f}x")
+                
+                # Adjust speed using MoviePy 2.x - resample audio to match target duration
+                # This preserves all audio content, just changes playback speed
+                import numpy as np
+                from moviepy.audio.AudioClip import AudioArrayClip
+                
+                # Get audio array at original fps
+                audio_array = audio_clip.to_soundarray(fps=audio_clip.fps)
+                original_fps = audio_clip.fps
+                
+                # Calculate target number of samples for exact duration match
+                target_samples = int(target_duration * original_fps)
+                original_samples = len(audio_array)
+                
+                if original_samples > 0 and target_samples > 0:
+                    # Resample audio to match target duration (no cutting, just resampling)
+                    # This changes playback speed smoothly
+                    try:
+                        from scipy import signal
+                        resampled = signal.resample(audio_array, target_samples, axis=0)
+                    except ImportError:
+                        # Fallback: use numpy interpolation if scipy not available
+                        print(f"  ⚠️  scipy not available, using numpy interpolation")
+                        indices = np.linspace(0, original_samples - 1, target_samples)
+                        if audio_array.ndim == 1:
+                            resampled = np.interp(indices, np.arange(original_samples), audio_array)
+                        else:
+                            resampled = np.array([np.interp(indices, np.arange(original_samples), audio_array[:, i]) 
+                                                  for i in range(audio_array.shape[1])]).T
                     
-                    if abs(final_speed - 1.0) > 0.01:  # Only adjust if significant difference
-                        print(f"  📊 Original: {original_duration:.2f}s → Target: {target_duration:.2f}s → Speed: {final_speed:.2f}x")
-                        
-                        # Adjust speed using MoviePy 2.x - resample audio to match target duration
-                        # This preserves all audio content, just changes playback speed
-                        import numpy as np
-                        from moviepy.audio.AudioClip import AudioArrayClip
-                        
-                        # Get audio array at original fps
-                        audio_array = audio_clip.to_soundarray(fps=audio_clip.fps)
-                        original_fps = audio_clip.fps
-                        
-                        # Calculate target number of samples for exact duration match
-                        target_samples = int(target_duration * original_fps)
-                        original_samples = len(audio_array)
-                        
-                        if original_samples > 0 and target_samples > 0:
-                            # Resample audio to match target duration (no cutting, just resampling)
-                            # This changes playback speed smoothly
+                    # Create new audio clip with resampled audio (preserves all content)
+                    adjusted_clip = AudioArrayClip(resampled, fps=original_fps)
+                else:
+                    adjusted_clip = audio_clip
+                
+                # Verify duration matches (should be very close now)
+                adjusted_duration = adjusted_clip.duration
+                if abs(adjusted_duration - target_duration) > 0.05:
+                    # Fine-tune if needed (small adjustment)
+                    fine_speed = adjusted_duration / target_duration
+                    fine_speed = max(0.95, min(1.05, fine_speed))  # Very small adjustment
+                    if abs(fine_speed - 1.0) > 0.01:
+                        audio_array_fine = adjusted_clip.to_soundarray(fps=adjusted_clip.fps)
+                        fine_target_samples = int(target_duration * adjusted_clip.fps)
+                        if len(audio_array_fine) > 0 and fine_target_samples > 0:
                             try:
                                 from scipy import signal
-                                resampled = signal.resample(audio_array, target_samples, axis=0)
+                                resampled_fine = signal.resample(audio_array_fine, fine_target_samples, axis=0)
                             except ImportError:
-                                # Fallback: use numpy interpolation if scipy not available
-                                print(f"  ⚠️  scipy not available, using numpy interpolation")
-                                indices = np.linspace(0, original_samples - 1, target_samples)
-                                if audio_array.ndim == 1:
-                                    resampled = np.interp(indices, np.arange(original_samples), audio_array)
+                                indices = np.linspace(0, len(audio_array_fine) - 1, fine_target_samples)
+                                if audio_array_fine.ndim == 1:
+                                    resampled_fine = np.interp(indices, np.arange(len(audio_array_fine)), audio_array_fine)
                                 else:
-                                    resampled = np.array([np.interp(indices, np.arange(original_samples), audio_array[:, i]) 
-                                                          for i in range(audio_array.shape[1])]).T
-                            
-                            # Create new audio clip with resampled audio (preserves all content)
-                            adjusted_clip = AudioArrayClip(resampled, fps=original_fps)
-                        else:
-                            adjusted_clip = audio_clip
-                        
-                        # Verify duration matches (should be very close now)
-                        adjusted_duration = adjusted_clip.duration
-                        if abs(adjusted_duration - target_duration) > 0.05:
-                            # Fine-tune if needed (small adjustment)
-                            fine_speed = adjusted_duration / target_duration
-                            fine_speed = max(0.95, min(1.05, fine_speed))  # Very small adjustment
-                            if abs(fine_speed - 1.0) > 0.01:
-                                audio_array_fine = adjusted_clip.to_soundarray(fps=adjusted_clip.fps)
-                                fine_target_samples = int(target_duration * adjusted_clip.fps)
-                                if len(audio_array_fine) > 0 and fine_target_samples > 0:
-                                    try:
-                                        from scipy import signal
-                                        resampled_fine = signal.resample(audio_array_fine, fine_target_samples, axis=0)
-                                    except ImportError:
-                                        indices = np.linspace(0, len(audio_array_fine) - 1, fine_target_samples)
-                                        if audio_array_fine.ndim == 1:
-                                            resampled_fine = np.interp(indices, np.arange(len(audio_array_fine)), audio_array_fine)
-                                        else:
-                                            resampled_fine = np.array([np.interp(indices, np.arange(len(audio_array_fine)), audio_array_fine[:, i]) 
-                                                                      for i in range(audio_array_fine.shape[1])]).T
-                                    adjusted_clip = AudioArrayClip(resampled_fine, fps=adjusted_clip.fps)
-                                print(f"  🔧 Fine-tuned speed adjustment: {fine_speed:.3f}x")
-                        
-                        # Write the adjusted audio with high quality settings for smooth transitions
-                        adjusted_clip.write_audiofile(
-                            output_path,
-                            codec='pcm_s16le',  # High quality PCM
-                            bitrate='192k'
-                        )
-                        adjusted_clip.close()
-                    else:
-                        # Speed is close to 1.0, no adjustment needed
-                        print(f"  ✅ Audio duration ({original_duration:.2f}s) already matches target")
-                        audio_clip.write_audiofile(
-                            output_path,
-                            codec='pcm_s16le',
-                            bitrate='192k'
-                        )
-                    
-                    audio_clip.close()
-                    
-                    # Remove temp file
-                    if os.path.exists(temp_wav_path):
-                        os.remove(temp_wav_path)
-                    
-                    print(f"✅ Audio generated and adjusted to: {output_path}")
-                    return output_path
-                except Exception as e:
-                    print(f"  ⚠️  Post-processing speed adjustment failed: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    print(f"  ⚠️  Using original audio without speed adjustment")
-                    # Fall back to original audio
-                    if os.path.exists(temp_wav_path):
-                        os.rename(temp_wav_path, output_path)
-                    else:
-                        save_pcm_to_wav(output_path, audio_data)
+                                    resampled_fine = np.array([np.interp(indices, np.arange(len(audio_array_fine)), audio_array_fine[:, i]) 
+                                                              for i in range(audio_array_fine.shape[1])]).T
+                            adjusted_clip = AudioArrayClip(resampled_fine, fps=adjusted_clip.fps)
+                        print(f"  🔧 Fine-tuned speed adjustment: {fine_speed:.3f}x")
+                
+                # Write the adjusted audio with high quality settings for smooth transitions
+                adjusted_clip.write_audiofile(
+                    output_path,
+                    codec='pcm_s16le',  # High quality PCM
+                    bitrate='192k'
+                )
+                adjusted_clip.close()
             else:
-                # No target duration provided, use original audio
-                if os.path.exists(temp_wav_path):
-                    os.rename(temp_wav_path, output_path)
-                else:
-                    save_pcm_to_wav(output_path, audio_data)
+                # Speed is close to 1.0, no adjustment needed
+                print(f"  ✅ Audio duration ({original_duration:.2f}s) already matches target")
+                audio_clip.write_audiofile(
+                    output_path,
+                    codec='pcm_s16le',
+                    bitrate='192k'
+                )
             
-            print(f"✅ Audio generated and saved to: {output_path}")
-            return output_path
+            audio_clip.close()
+            
+            # Remove temp file
+            if os.path.exists(temp_wav_path):
+                os.remove(temp_wav_path)
             
+            print(f"✅ Audio generated and adjusted to: {output_path}")
+            return output_path
         except Exception as e:
-            error_message = str(e).lower()
-            if "429" in error_message or "quota" in error_message:
-                print(f"Quota exceeded for key ...{api_key[-4:]}. Trying next key...")
-                continue # Go to the next iteration of the loop
+            print(f"  ⚠️  Post-processing speed adjustment failed: {e}")
+            import traceback
+            traceback.print_exc()
+            print(f"  ⚠️  Using original audio without speed adjustment")
+            # Fall back to original audio
+            if os.path.exists(temp_wav_path):
+                os.rename(temp_wav_path, output_path)
             else:
-                # This is a different error, raise it
-                print(f"Error generating audio with key ...{api_key[-4:]}: {e}")
-                raise ValueError(f"Failed to generate audio: {e}")
+                save_pcm_to_wav(output_path, audio_data)
+    else:
+        # No target duration provided, use original audio
+        if os.path.exists(temp_wav_path):
+            os.rename(temp_wav_path, output_path)
+        else:
+            save_pcm_to_wav(output_path, audio_data)
+    
+    print(f"✅ Audio generated and saved to: {output_path}")
+    return output_path
 
-    # If the loop finishes without returning, all keys are exhausted
-    raise ValueError("Failed to generate audio: All Google API keys are rate-limited.")
 
 
 # -----------------------------------------------------------------
@@ -664,6 +791,7 @@ def _get_access_token_from_service_account(service_account_key_path: str) -> str
     Gets an OAuth 2.0 access token from a service account JSON key file.
     """
     from google.auth.transport.requests import Request as GoogleRequest
+    from google.oauth2 import service_account
     
     credentials = service_account.Credentials.from_service_account_file(
         service_account_key_path,
@@ -688,6 +816,27 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
     Generates AI video using Vertex AI Veo 3.1 API.
     Downloads the video and saves it to output_path.
     
+    Thin sync wrapper around ai_video_gen_async.
+    
+    Args:
+        prompt: Text description of the video to generate
+        output_path: Path where the video will be saved
+        generation_type: Either "text_to_video" or "image_to_video" (default: "text_to_video")
+        aspect_ratio: Video aspect ratio (default: "auto")
+        image_url: Required if generation_type is "image_to_video"
+    
+    Returns:
+        str: The output_path where the video was saved (or a signed GCS URL when GCS_STREAM_TO_DECODER is on)
+    """
+    return run_sync(ai_video_gen_async(prompt, output_path, generation_type, aspect_ratio, image_url))
+
+
+@stage_duration_seconds.timed(stage="veo")
+async def ai_video_gen_async(prompt: str, output_path: str, generation_type: str = "text_to_video", aspect_ratio: str = "auto", image_url: str = None) -> str:
+    """
+    The asyncio version of ai_video_gen. Submission and polling run on the
+    shared async HTTP client; credential refresh and GCS transfers run in threads.
+    
     Args:
         prompt: Text description of the video to generate
         output_path: Path where the video will be saved
@@ -696,7 +845,7 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
         image_url: Required if generation_type is "image_to_video"
     
     Returns:
-        str: The output_path where the video was saved
+        str: The output_path where the video was saved (or a signed GCS URL when GCS_STREAM_TO_DECODER is on)
     
     Note:
         Requires VEO_PROJECT_ID environment variable or in VIDEO_GEN_API_KEYS.
@@ -735,7 +884,8 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
     model_name = "veo-3.1-generate-preview"
     
     # Vertex AI endpoint format
-    endpoint = f"https://{location}-aiplatform.googleapis.com/v1/projects/{project_id}/locations/{location}/publishers/google/models/{model_name}:predictLongRunning"
+    api_base_url = VEO_API_BASE_URL or f"https://{location}-aiplatform.googleapis.com"
+    endpoint = f"{api_base_url}/v1/projects/{project_id}/locations/{location}/publishers/google/models/{model_name}:predictLongRunning"
     
     print(f"--- Using Vertex AI Veo 3.1 API ---")
     print(f"--- Project ID: {project_id} ---")
@@ -756,7 +906,7 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
                 # It's a service account JSON file path
                 print(f"--- Using service account file: {api_key_or_path} ---")
                 try:
-                    access_token = _get_access_token_from_service_account(api_key_or_path)
+                    access_token = await asyncio.to_thread(_get_access_token_from_service_account, api_key_or_path)
                     print(f"✅ Successfully obtained access token from service account")
                     break
                 except Exception as e:
@@ -770,7 +920,7 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
                     f.write(api_key_or_path)
                     temp_path = f.name
                 try:
-                    access_token = _get_access_token_from_service_account(temp_path)
+                    access_token = await asyncio.to_thread(_get_access_token_from_service_account, temp_path)
                     print(f"✅ Successfully obtained access token from JSON key")
                     os.unlink(temp_path)
                     break
@@ -794,7 +944,7 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
     if not access_token:
         print(f"--- No valid credentials from VIDEO_GEN_API_KEYS, trying Application Default Credentials (ADC) ---")
         try:
-            access_token = _get_access_token_from_adc()
+            access_token = await asyncio.to_thread(_get_access_token_from_adc)
             print(f"✅ Successfully obtained access token from ADC")
         except Exception as e:
             print(f"⚠️  Failed to get access token from ADC: {e}")
@@ -830,8 +980,9 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
     
     try:
         # Step 1: Initiate video generation
+        check_cancelled()
         print(f"--- Initiating video generation for: '{prompt}' ---")
-        response = requests.post(endpoint, headers=headers, json=payload, timeout=60)
+        response = await async_http_client.post(endpoint, headers=headers, json=payload, timeout=60, limiter=provider_limiters.get("vertex"))
         
         # Debug: Print response details
         print(f"--- Response status: {response.status_code} ---")
@@ -859,6 +1010,8 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
             
             if response.status_code == 429:
                 print(f"⚠️  Rate-limited. Please wait and try again.")
+                if video_gen_key_rotator is not None and api_key_or_path in video_gen_key_rotator.key_state:
+                    video_gen_key_rotator.report_rate_limited(api_key_or_path, parse_retry_after(response))
                 raise Exception(f"Rate limited: {error_msg}")
             
             raise Exception(f"Error initiating video generation: {error_msg}")
@@ -875,22 +1028,23 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
         # Step 2: Poll for video status using fetchPredictOperation endpoint
         # According to official docs: https://docs.cloud.google.com/vertex-ai/generative-ai/docs/model-reference/veo-video-generation
         print(f"--- Polling for video status... ---")
-        fetch_operation_endpoint = f"https://{location}-aiplatform.googleapis.com/v1/projects/{project_id}/locations/{location}/publishers/google/models/{model_name}:fetchPredictOperation"
+        fetch_operation_endpoint = f"{api_base_url}/v1/projects/{project_id}/locations/{location}/publishers/google/models/{model_name}:fetchPredictOperation"
         max_poll_attempts = 120  # Maximum 10 minutes
         poll_attempt = 0
         
         while poll_attempt < max_poll_attempts:
+            check_cancelled()
             # Use fetchPredictOperation endpoint with POST request
             fetch_payload = {
                 "operationName": operation_name
             }
-            status_response = requests.post(fetch_operation_endpoint, headers=headers, json=fetch_payload, timeout=30)
+            status_response = await async_http_client.post(fetch_operation_endpoint, headers=headers, json=fetch_payload, timeout=30)
             
             if status_response.status_code != 200:
                 error_msg = f"HTTP {status_response.status_code}"
                 if status_response.status_code == 429:
                     print(f"Rate-limited while polling. Waiting...")
-                    time.sleep(5)
+                    await asyncio.sleep(async_http_client.retry_policy.delay(poll_attempt, status_response))
                     poll_attempt += 1
                     continue
                 # Log response for debugging
@@ -938,7 +1092,7 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
             else:
                 # Still processing
                 print(f"⏳ Video generation in progress... (attempt {poll_attempt + 1}/{max_poll_attempts})")
-                time.sleep(5)
+                await asyncio.sleep(5)
                 poll_attempt += 1
         
         if poll_attempt >= max_poll_attempts:
@@ -949,32 +1103,20 @@ def ai_video_gen(prompt: str, output_path: str, generation_type: str = "text_to_
         
         # If it's a GCS URI (gs://), we need to use Google Cloud Storage
         if video_uri.startswith("gs://"):
-            from google.cloud import storage
-            # Parse GCS URI: gs://bucket-name/path/to/file
-            uri_parts = video_uri.replace("gs://", "").split("/", 1)
-            bucket_name = uri_parts[0]
-            blob_name = uri_parts[1] if len(uri_parts) > 1 else ""
-            
-            # Use service account or default credentials
-            if api_key_or_path and os.path.exists(api_key_or_path):
-                storage_client = storage.Client.from_service_account_json(api_key_or_path)
-            else:
-                storage_client = storage.Client(project=project_id)
-            
-            bucket = storage_client.bucket(bucket_name)
-            blob = bucket.blob(blob_name)
-            blob.download_to_filename(output_path)
+            if GCS_STREAM_TO_DECODER:
+                signed_url = await asyncio.to_thread(gcs_downloader.signed_url, video_uri, api_key_or_path, project_id)
+                if signed_url:
+                    print(f"✅ Video generated, streaming from GCS without staging to disk")
+                    return signed_url
+            await asyncio.to_thread(gcs_downloader.download, video_uri, output_path, api_key_or_path, project_id)
         else:
             # Regular HTTP/HTTPS URL
-            with requests.get(video_uri, stream=True, timeout=60) as video_response:
-                video_response.raise_for_status()
-                with open(output_path, "wb") as video_file:
-                    for chunk in video_response.iter_content(chunk_size=8192):
-                        video_file.write(chunk)
+            await download_manager.download_async(video_uri, output_path)
         
         print(f"✅ Video generated and saved to: {output_path}")
         return output_path
         
+    except TaskCancelled:
+        raise
     except Exception as e:
-        error_message = str(e).lower()
         raise ValueError(f"Failed to generate video: {e}")
\ No newline at end of file
@@ -1,13 +1,21 @@
-import requests
 import os
 import random
-from config import FREESOUND_API_KEY, BASE_TEMP_DIR
+from config import FREESOUND_API_KEY, MUSIC_CACHE_DIR, async_http_client, download_manager, single_flight, provider_limiters, storage_manager
+from config import stage_duration_seconds, cache_requests_total
+from utils.async_runtime import run_sync
+from utils.cancellation import TaskCancelled
+from utils.single_flight import normalize_key
+
+# Freesound API root (overridable, e.g. to point the pipeline at the offline benchmark stand-ins)
+FREESOUND_API_BASE_URL = os.getenv("FREESOUND_API_BASE_URL", "https://freesound.org").rstrip("/")
 
 def search_music(query: str, duration: int = 15) -> str:
     """
     Searches Freesound for music tracks matching the query and duration.
     Downloads the preview file (MP3/OGG) and returns the path.
     
+    Thin sync wrapper around search_music_async.
+    
     Args:
         query: Search keywords (e.g., "upbeat pop", "cinematic ambient")
         duration: Target duration in seconds (used to filter results)
@@ -15,14 +23,35 @@ def search_music(query: str, duration: int = 15) -> str:
     Returns:
         Path to the downloaded audio file, or None if no suitable track found.
     """
+    return run_sync(search_music_async(query, duration))
+
+
+async def search_music_async(query: str, duration: int = 15) -> str:
+    """
+    The asyncio version of search_music.
+    """
     if not FREESOUND_API_KEY:
         print("⚠️  FREESOUND_API_KEY not set. Skipping music search.")
         return None
+
+    # Tracks are stored in the shared music cache, so coalesced callers can share the path directly
+    music_path, shared = await single_flight.do_async(normalize_key("music", query, duration), _fetch_music, query, duration)
+    cache_requests_total.inc(cache="music_coalesce", result="hit" if shared else "miss")
+    if shared:
+        print(f"🔗 Reusing in-flight Freesound lookup for '{query}'")
+    return music_path
+
+
+@stage_duration_seconds.timed(stage="music")
+async def _fetch_music(query: str, duration: int = 15) -> str:
+    """
+    Does the actual Freesound search and preview download for search_music_async.
+    """
         
     print(f"🎵 Searching Freesound for: '{query}' (duration ~{duration}s)")
     
     # Freesound Text Search API
-    search_url = "https://freesound.org/apiv2/search/text/"
+    search_url = f"{FREESOUND_API_BASE_URL}/apiv2/search/text/"
     
     # Filter for music-like sounds
     # duration: [duration-5 TO duration+15] to find tracks that are long enough but not too long
@@ -40,7 +69,7 @@ def search_music(query: str, duration: int = 15) -> str:
     }
     
     try:
-        response = requests.get(search_url, params=params, timeout=10)
+        response = await async_http_client.get(search_url, params=params, timeout=10, limiter=provider_limiters.get("freesound"))
         
         if response.status_code == 200:
             results = response.json()
@@ -75,18 +104,18 @@ def search_music(query: str, duration: int = 15) -> str:
             
             # Download
             output_filename = f"freesound_{track_id}.mp3"
-            output_path = os.path.join(BASE_TEMP_DIR, output_filename)
+            output_path = os.path.join(MUSIC_CACHE_DIR, output_filename)
             
             if os.path.exists(output_path):
                 print(f"  → File already exists: {output_path}")
+                cache_requests_total.inc(cache="music_file", result="hit")
+                # Keep recently reused tracks at the back of the eviction queue
+                storage_manager.touch(output_path)
                 return output_path
                 
+            cache_requests_total.inc(cache="music_file", result="miss")
             print(f"⬇️  Downloading preview from: {preview_url}")
-            with requests.get(preview_url, stream=True, timeout=30) as r:
-                r.raise_for_status()
-                with open(output_path, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
+            await download_manager.download_async(preview_url, output_path, timeout=30)
                         
             print(f"✅ Music saved to: {output_path}")
             return output_path
@@ -95,6 +124,8 @@ def search_music(query: str, duration: int = 15) -> str:
             print(f"❌ Freesound API error: {response.status_code} - {response.text}")
             return None
             
+    except TaskCancelled:
+        raise
     except Exception as e:
         print(f"❌ Error searching/downloading music: {e}")
         return None
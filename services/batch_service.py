@@ -0,0 +1,160 @@
+# services/batch_service.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from config import BASE_TEMP_DIR, storage_manager, admission_controller, job_cost_model
+from utils.asset_table import AssetTable
+from utils.async_runtime import submit
+from utils.cancellation import check_cancelled
+
+# batch_id -> _Batch (process-local; a batch lives on the worker that accepted it)
+batches = {}
+batches_lock = threading.Lock()
+
+
+class _Batch:
+    """
+    State shared by the tasks of one POST /generate-videos call.
+    """
+    def __init__(self, batch_id: str, items: list):
+        self.batch_id = batch_id
+        self.items = items  # [(task_id, VideoRequest)]
+        self.asset_dir = os.path.join(BASE_TEMP_DIR, f"batch_{batch_id}")
+        self.assets = AssetTable(batch_id)
+        self.scripts = [Future() for _ in items]  # -> (script, AssetView)
+        self.requested_assets = 0
+        self.finished = 0
+        self.created_at = time.time()
+        self.finished_at = None
+
+
+def register_batch(batch_id: str, items: list):
+    """
+    Registers a batch so its items can be admitted (their jobs look the batch up).
+
+    Args:
+        batch_id: The batch's id
+        items: [(task_id, VideoRequest)] in submission order
+    """
+    batch = _Batch(batch_id, items)
+    os.makedirs(batch.asset_dir, exist_ok=True)
+    # Renders read the shared assets in place; keep them until the last item is done
+    storage_manager.pin(os.path.basename(batch.asset_dir))
+    with batches_lock:
+        batches[batch_id] = batch
+
+
+def start_batch(batch_id: str):
+    """
+    Starts a registered batch's shared preparation on the provider loop:
+    all scripts are generated concurrently, then every distinct asset across
+    the batch is fetched once into the batch's shared AssetTable.
+    """
+    with batches_lock:
+        batch = batches[batch_id]
+    submit(_prepare_batch(batch))
+
+
+def discard_batch(batch_id: str):
+    """
+    Forgets a registered batch that was not admitted.
+    """
+    with batches_lock:
+        batch = batches.pop(batch_id, None)
+    if batch is not None:
+        storage_manager.unpin(os.path.basename(batch.asset_dir))
+        os.rmdir(batch.asset_dir)
+
+
+def get_script(batch_id: str, index: int):
+    """
+    Blocks until the script of item `index` is ready, or raises TaskCancelled
+    if the calling task is cancelled while it waits.
+
+    Returns:
+        (script, assets) - the ScriptResponse and the item's AssetView for create_video.
+    """
+    with batches_lock:
+        batch = batches[batch_id]
+    while True:
+        try:
+            return batch.scripts[index].result(timeout=1)
+        except FutureTimeoutError:
+            check_cancelled()
+
+
+def finish_item(batch_id: str):
+    """
+    Called when an item's task ends. Once every item is done, the shared asset
+    directory is unpinned and left to the storage manager's retention/LRU.
+    """
+    with batches_lock:
+        batch = batches.get(batch_id)
+        if batch is None:
+            return
+        batch.finished += 1
+        if batch.finished < len(batch.items):
+            return
+        batch.finished_at = time.time()
+    storage_manager.unpin(os.path.basename(batch.asset_dir))
+
+
+def batch_summary(batch_id: str) -> dict | None:
+    """
+    The batch's task ids and dedupe statistics, or None if it is unknown.
+    """
+    with batches_lock:
+        batch = batches.get(batch_id)
+    if batch is None:
+        return None
+    return {
+        "task_ids": [task_id for task_id, _ in batch.items],
+        "finished": batch.finished,
+        "scripts_ready": sum(1 for f in batch.scripts if f.done()),
+        "assets_requested": batch.requested_assets,
+        "assets_unique": len(batch.assets.fetches),
+        "assets": batch.assets.status(),
+    }
+
+
+def purge_finished(max_age_seconds: float) -> list[str]:
+    """
+    Forgets batches that finished more than max_age_seconds ago. Returns their ids.
+    """
+    cutoff = time.time() - max_age_seconds
+    with batches_lock:
+        expired = [bid for bid, b in batches.items() if b.finished_at is not None and b.finished_at <= cutoff]
+        for batch_id in expired:
+            del batches[batch_id]
+    return expired
+
+
+async def _prepare_batch(batch: _Batch):
+    from . import ai_service, video_service
+
+    try:
+        scripts = await asyncio.gather(
+            *(asyncio.to_thread(ai_service.generate_script, request.prompt, total_duration_seconds=request.video_length_seconds)
+              for _, request in batch.items),
+            return_exceptions=True,
+        )
+        for index, ((task_id, request), script) in enumerate(zip(batch.items, scripts)):
+            if isinstance(script, BaseException):
+                batch.scripts[index].set_exception(script)
+                continue
+            view = video_service.prefetch_shared_assets(batch.assets, script, batch.asset_dir, request.orientation)
+            batch.requested_assets += len(view.names)
+            batch.scripts[index].set_result((script, view))
+            # The scene mix is known now; items still waiting are reordered by their real cost
+            admission_controller.update_cost(task_id, job_cost_model.estimate_script(script, request.orientation))
+    except BaseException as e:
+        # Never leave an item's render thread waiting on a script that won't come
+        for future in batch.scripts:
+            if not future.done():
+                future.set_exception(e)
+        raise
+
+    print(f"📦 Batch {batch.batch_id}: {len(batch.items)} videos need {batch.requested_assets} assets, fetching {len(batch.assets.fetches)} unique")
@@ -1,32 +1,290 @@
 # services/media_service.py
-import requests
+import asyncio
+import httpx
 import os
-import time
-# Import our new rotator from config
-from config import pexels_key_rotator, BASE_TEMP_DIR 
+import re
+# Import our new rotator and the shared HTTP layer from config
+from config import pexels_key_rotator, async_http_client, download_manager, single_flight, provider_limiters, BASE_TEMP_DIR 
+from config import PEXELS_HEDGE_ENABLED, PEXELS_HEDGE_DELAY_SECONDS, PEXELS_HEDGE_MAX_ALTERNATES
+from config import stage_duration_seconds, cache_requests_total
+from utils.async_runtime import run_sync
+from utils.cancellation import TaskCancelled
+from utils.http_client import TRANSIENT_STATUSES, parse_retry_after
+from utils.single_flight import normalize_key, share_file
 
-def get_stock_video(query: str, output_path: str, orientation: str = "horizontal") -> str:
+# Pexels API root (overridable, e.g. to point the pipeline at the offline benchmark stand-ins)
+PEXELS_API_BASE_URL = os.getenv("PEXELS_API_BASE_URL", "https://api.pexels.com").rstrip("/")
+
+# Output canvas for each orientation (must match video_service.create_video)
+TARGET_CANVAS = {
+    "horizontal": (1920, 1080),
+    "vertical": (1080, 1920),
+}
+
+# Bitrate band (bits per second) we consider reasonable for a 1080p source.
+# Below it the clip looks bad once graded; above it we download and decode bytes we throw away.
+MIN_REASONABLE_BITRATE = 2_000_000
+MAX_REASONABLE_BITRATE = 20_000_000
+
+# Words dropped when simplifying a visual_prompt into an alternate stock query.
+# Stock libraries are tagged with nouns; styling, camera and mood words mostly narrow the search to nothing.
+QUERY_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "with", "and", "or", "for", "to", "from", "by", "into",
+    "over", "under", "through", "across", "while", "as", "is", "are", "its", "their", "his", "her",
+    "shot", "footage", "video", "clip", "scene", "view", "close", "up", "closeup", "close-up", "wide",
+    "aerial", "drone", "cinematic", "slow", "motion", "4k", "hd", "timelapse", "time-lapse", "shallow",
+    "depth", "field", "camera", "panning", "tracking", "zoom", "angle", "background", "style",
+    "beautiful", "stunning", "dramatic", "moody", "vibrant", "bright", "dark", "soft", "warm", "cold",
+    "golden", "epic", "serene", "peaceful", "busy", "modern", "old", "ancient", "futuristic", "small",
+    "large", "big", "tiny", "huge", "young", "happy", "sad", "calm", "colorful", "lush", "misty",
+    # Curated rather than suffix-guessed: endings like -ent/-ant/-ic/-ly also end common nouns
+    # (student, elephant, traffic, family), which are exactly what the fallback must keep
+    "gentle", "gently", "slowly", "quickly", "softly", "quietly", "brightly", "rapidly", "very",
+    "glowing", "shimmering", "sparkling", "majestic", "dynamic", "energetic", "mysterious",
+    "luxurious", "elegant", "magnificent", "vivid", "realistic", "atmospheric", "dreamy", "hazy",
+    "foggy", "sunny", "rainy", "snowy", "cozy", "tranquil", "bustling", "crowded", "empty",
+}
+
+
+def _score_rendition(video: dict, file_info: dict, rank: int, orientation: str, duration_seconds: float = None) -> float:
+    """
+    Scores one Pexels rendition for our target canvas and scene length. Lower is better.
+
+    - Prefers the smallest rendition that still covers the target width/height
+      (anything smaller has to be upscaled, anything bigger is wasted bytes).
+    - Prefers clips at least as long as the scene, so we don't have to loop.
+    - Penalizes extreme bitrates when Pexels reports the file size.
+    - Keeps a small bias towards Pexels' own relevance order.
+    """
+    target_width, target_height = TARGET_CANVAS.get(orientation, TARGET_CANVAS["horizontal"])
+    width = file_info.get("width") or 0
+    height = file_info.get("height") or 0
+    if not width or not height:
+        return float("inf")
+
+    # 1. Resolution: pixel ratio vs. the canvas if it covers it, otherwise a heavy penalty by upscale factor
+    if width >= target_width and height >= target_height:
+        score = (width * height) / (target_width * target_height)
+    else:
+        upscale = max(target_width / width, target_height / height)
+        score = 10.0 + upscale
+
+    # 2. Duration: clips shorter than the scene need looping
+    clip_duration = video.get("duration") or 0
+    if duration_seconds and clip_duration and clip_duration < duration_seconds:
+        score += 3.0 * (1 - clip_duration / duration_seconds) + 1.0
+
+    # 3. Bitrate (only when Pexels tells us the file size)
+    file_size = file_info.get("size")
+    if file_size and clip_duration:
+        bitrate = file_size * 8 / clip_duration
+        if bitrate > MAX_REASONABLE_BITRATE:
+            score += bitrate / MAX_REASONABLE_BITRATE - 1.0
+        elif bitrate < MIN_REASONABLE_BITRATE:
+            score += 1.0
+
+    # 4. High frame rates double the decode cost for no visible gain (we render at 60fps from any source)
+    fps = file_info.get("fps") or 0
+    if fps > 31:
+        score += 0.25
+
+    # 5. Relevance tie-breaker
+    score += 0.05 * rank
+    return score
+
+
+def _select_best_rendition(videos: list, orientation: str, duration_seconds: float = None):
+    """
+    Picks the best (video, file_info) pair across all returned videos and their video_files.
+
+    Returns:
+        (video, file_info) or (None, None) if no rendition has a usable link.
+    """
+    best = (float("inf"), None, None)
+    for rank, video in enumerate(videos):
+        for file_info in video.get("video_files", []):
+            if not file_info.get("link"):
+                continue
+            if file_info.get("file_type") and file_info["file_type"] != "video/mp4":
+                continue
+            score = _score_rendition(video, file_info, rank, orientation, duration_seconds)
+            if score < best[0]:
+                best = (score, video, file_info)
+
+    if best[1] is None:
+        # Nothing scorable (e.g. missing dimensions) - fall back to the first link we have
+        for video in videos:
+            for file_info in video.get("video_files", []):
+                if file_info.get("link"):
+                    return video, file_info
+        return None, None
+    return best[1], best[2]
+
+
+def get_stock_video(query: str, output_path: str, orientation: str = "horizontal", duration_seconds: float = None) -> str:
     """
     Searches Pexels for a video using the direct API, downloads it,
     and saves it to output_path.
     
+    Thin sync wrapper around get_stock_video_async.
+    
     Args:
         query: Search query
         output_path: Path to save the video
         orientation: "horizontal" (16:9) or "vertical" (9:16)
+        duration_seconds: Scene length, used to prefer clips that don't need looping (optional)
     """
+    return run_sync(get_stock_video_async(query, output_path, orientation, duration_seconds))
+
+
+async def get_stock_video_async(query: str, output_path: str, orientation: str = "horizontal", duration_seconds: float = None) -> str:
+    """
+    The asyncio version of get_stock_video.
     
+    Concurrent calls for the same query/orientation/duration are coalesced:
+    only one search and download runs, and the other callers get a link to its file.
+    """
+    key = normalize_key("stock", query, orientation, round(duration_seconds or 0))
+    shared_path, shared = await single_flight.do_async(key, _fetch_stock_video, query, output_path, orientation, duration_seconds)
+    cache_requests_total.inc(cache="stock_coalesce", result="hit" if shared else "miss")
+    if shared:
+        print(f"🔗 Reusing in-flight Pexels download for '{query}'")
+        return share_file(shared_path, output_path)
+    return shared_path
+
+
+async def _fetch_stock_video(query: str, output_path: str, orientation: str = "horizontal", duration_seconds: float = None) -> str:
+    """
+    Does the actual Pexels search and download for get_stock_video_async.
+    """
+    # --- Part 1: Search for Video ---
+    with stage_duration_seconds.time(stage="stock_search"):
+        if PEXELS_HEDGE_ENABLED:
+            video_url = await _search_pexels_hedged(query, orientation, duration_seconds)
+        else:
+            video_url = await _search_pexels(query, orientation, duration_seconds)
+
+    # --- Check if search was successful ---
+    if not video_url:
+        print(f"❌ All Pexels keys failed or no video was found for query: '{query}'")
+        raise ValueError(f"No video found for query: {query}. All keys failed or no results.")
+
+    # --- Part 2: Download Video ---
+    try:
+        print(f"⌛ Downloading video from: {video_url}")
+        with stage_duration_seconds.time(stage="download"):
+            await download_manager.download_async(video_url, output_path)
+        print(f"\n✅ Success! Video saved to: {output_path}")
+        # Return the path, as our service expects
+        return output_path 
+        
+    except httpx.HTTPError as e:
+        print(f"❌ An error occurred downloading video: {e}")
+        raise
+    except Exception as e:
+        print(f"❌ An error occurred saving file: {e}")
+        raise
+
+
+def _alternate_queries(query: str, max_alternates: int = 3) -> list[str]:
+    """
+    Derives simpler stock queries from a visual_prompt, locally and without an API call:
+    styling/camera/mood words and common adjectives (QUERY_STOPWORDS) are dropped and
+    the remaining words, mostly nouns, are kept.
+
+    "Cinematic aerial shot of a misty mountain lake at sunrise" gives
+    ["mountain lake sunrise", "lake sunrise", "mountain lake"].
+
+    Returns:
+        Up to max_alternates distinct queries, broadest last; never the original query.
+    """
+    words = re.findall(r"[a-zA-Z][a-zA-Z'-]*", query.lower())
+    nouns = [w for w in words if w not in QUERY_STOPWORDS]
+    if not nouns:
+        return []
+
+    candidates = [
+        " ".join(nouns),
+        " ".join(nouns[-2:]),   # the head of the phrase is usually at the end
+        " ".join(nouns[:2]),    # ...but the subject is usually at the start
+        nouns[0],
+    ]
+    alternates = []
+    original = normalize_key(query)
+    for candidate in candidates:
+        if candidate and candidate not in alternates and normalize_key(candidate) != original:
+            alternates.append(candidate)
+    return alternates[:max_alternates]
+
+
+async def _search_pexels_hedged(query: str, orientation: str = "horizontal", duration_seconds: float = None) -> str:
+    """
+    Searches Pexels for `query`, hedging with simplified alternate queries.
+
+    The original query runs alone first. If it has not answered within
+    PEXELS_HEDGE_DELAY_SECONDS, or answers with no usable result, the
+    alternates are fired concurrently (the original keeps running) and the
+    first link from any of them wins; the rest are cancelled.
+
+    Returns:
+        The best rendition link, or None if no query found anything.
+    """
+    primary = asyncio.ensure_future(_search_pexels(query, orientation, duration_seconds))
+    done, _ = await asyncio.wait({primary}, timeout=PEXELS_HEDGE_DELAY_SECONDS)
+    if primary in done and _search_result(primary):
+        return primary.result()
+
+    alternates = _alternate_queries(query, PEXELS_HEDGE_MAX_ALTERNATES)
+    if not alternates or pexels_key_rotator.seconds_until_available() > 0:
+        # Nothing simpler to try, or no key to try it with
+        return await primary
+
+    reason = "found nothing" if primary in done else f"slower than {PEXELS_HEDGE_DELAY_SECONDS:.1f}s"
+    print(f"🔀 Pexels search for '{query}' {reason}; hedging with {alternates}")
+
+    pending = set() if primary in done else {primary}
+    pending |= {asyncio.ensure_future(_search_pexels(alt, orientation, duration_seconds)) for alt in alternates}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for search in done:
+                link = _search_result(search)
+                if link:
+                    return link
+        return None
+    finally:
+        for search in pending:
+            search.cancel()
+
+
+def _search_result(search: asyncio.Future) -> str | None:
+    """
+    The link a finished search returned. A search that raised counts as
+    having found nothing, so the hedge still fires; a cancelled task re-raises.
+    """
+    error = search.exception()
+    if error is None:
+        return search.result()
+    if isinstance(error, TaskCancelled):
+        raise error
+    print(f"⚠️  Pexels search failed: {error}")
+    return None
+
+
+async def _search_pexels(query: str, orientation: str = "horizontal", duration_seconds: float = None) -> str:
+    """
+    Searches Pexels (rotating keys on 429) and returns the link of the best
+    rendition for the canvas and scene length, or None if nothing was found.
+    """
     # Map our orientation to Pexels orientation
     # Pexels supports: landscape, portrait, square
     pexels_orientation = "landscape"
     if orientation == "vertical":
         pexels_orientation = "portrait"
     
-    # --- Part 1: Search for Video (Your 'search_for_video' logic) ---
-    search_url = "https://api.pexels.com/videos/search"
+    search_url = f"{PEXELS_API_BASE_URL}/videos/search"
     params = { "query": query, "per_page": 10, "orientation": pexels_orientation }
     max_retries = len(pexels_key_rotator.api_keys)
-    video_url = None
     
     print(f"⌛ Searching Pexels for: '{query}'")
 
@@ -37,65 +295,46 @@ def get_stock_video(query: str, output_path: str, orientation: str = "horizontal
         key_short = api_key[:5] + "..."
 
         try:
-            response = requests.get(search_url, headers=headers, params=params, timeout=30)
+            # 429s are handled here by rotating keys, so only transient errors are retried on the same key
+            response = await async_http_client.get(
+                search_url, headers=headers, params=params, timeout=30,
+                retry_statuses=TRANSIENT_STATUSES, limiter=provider_limiters.get("pexels"),
+            )
 
             if response.status_code == 200:
+                pexels_key_rotator.report_success(api_key)
                 print(f"✅ Success with Pexels key {key_short}")
                 results = response.json()
                 
                 if not results.get("videos"):
                     print(f"❌ No video results found for '{query}'.")
-                    # Break loop, no video will be found
-                    break 
+                    # No video will be found with another key either
+                    return None
 
-                first_video = results["videos"][0]
-                best_link = None
-                
-                for file_info in first_video.get("video_files", []):
-                    if file_info.get("quality") == "hd":
-                        best_link = file_info.get("link")
-                        break
-                
-                if not best_link and first_video.get("video_files"):
-                    best_link = first_video["video_files"][0].get("link")
+                best_video, best_file = _select_best_rendition(results["videos"], orientation, duration_seconds)
+                if not best_file:
+                    print(f"❌ No downloadable rendition found for '{query}'.")
+                    return None
 
-                print(f"✅ Found video. URL: {best_link}")
-                video_url = best_link
-                # Success! Exit the retry loop
-                break 
+                print(f"✅ Found video ({best_file.get('width')}x{best_file.get('height')}, {best_video.get('duration')}s). URL: {best_file['link']}")
+                return best_file["link"]
 
             elif response.status_code == 429:
                 print(f"⚠️ Pexels key {key_short} rate-limited. Rotating key. (Attempt {attempt + 1}/{max_retries})")
-                time.sleep(1)
+                # The key sits out its Retry-After; the rotator hands us a healthy one next, no need to sleep
+                pexels_key_rotator.report_rate_limited(api_key, parse_retry_after(response))
+                if pexels_key_rotator.seconds_until_available() > 0:
+                    print(f"❌ All Pexels keys are cooling down.")
+                    return None
             
             else:
+                pexels_key_rotator.report_error(api_key)
                 print(f"❌ Pexels key {key_short} failed ({response.status_code}). Rotating key.")
-                time.sleep(1)
+                await asyncio.sleep(async_http_client.retry_policy.delay(attempt))
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
+            pexels_key_rotator.report_error(api_key)
             print(f"❌ Pexels request with key {key_short} failed: {e}. Rotating key.")
-            time.sleep(1)
-
-    # --- Check if search was successful ---
-    if not video_url:
-        print(f"❌ All Pexels keys failed or no video was found for query: '{query}'")
-        raise ValueError(f"No video found for query: {query}. All keys failed or no results.")
+            await asyncio.sleep(async_http_client.retry_policy.delay(attempt))
 
-    # --- Part 2: Download Video (Your 'download_video' logic) ---
-    try:
-        print(f"⌛ Downloading video from: {video_url}")
-        with requests.get(video_url, stream=True, timeout=60) as response:
-            response.raise_for_status()
-            with open(output_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        print(f"\n✅ Success! Video saved to: {output_path}")
-        # Return the path, as our service expects
-        return output_path 
-        
-    except requests.exceptions.RequestException as e:
-        print(f"❌ An error occurred downloading video: {e}")
-        raise
-    except Exception as e:
-        print(f"❌ An error occurred saving file: {e}")
-        raise
\ No newline at end of file
+    return None
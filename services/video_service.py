@@ -1,5 +1,10 @@
 # services/video_service.py
+import asyncio
+import functools
+import hashlib
 import os
+import random
+import time
 from moviepy import (
     VideoFileClip, 
     AudioFileClip,
@@ -12,9 +17,16 @@ from moviepy import (
     ColorClip,
 )
 # Use BASE_TEMP_DIR from config
-from config import BASE_TEMP_DIR 
-from schemas import ScriptResponse
-from . import ai_service, media_service
+from config import BASE_TEMP_DIR, KEEP_INTERMEDIATES, progress_broker, storage_manager
+from config import stage_duration_seconds, cache_requests_total
+from schemas import ScriptResponse, SceneScript
+from utils.async_runtime import run_sync
+from utils.asset_table import AssetTable, AssetView
+from utils.single_flight import normalize_key
+from utils.progress import EncodeProgressLogger
+from utils.checkpoint import TaskManifest
+from utils.cancellation import check_cancelled
+from . import ai_service, media_service, audio_service
 
 # --- HELPER FUNCTIONS ---
 
@@ -74,301 +86,300 @@ def apply_color_grading(clip):
     return clip
 
 
-def create_video(script: ScriptResponse, task_id: str, orientation: str = "horizontal") -> str:
+def _target_size(orientation: str) -> tuple:
     """
-    Orchestrates the entire video creation process.
-    All files are saved inside a directory named after the task_id.
+    Returns the (width, height) of the output canvas for the orientation.
     """
-    scene_clips = []
-    scene_audio_clips = []
-    
-    # --- NEW FILE ORGANIZATION ---
-    # Create a unique directory for this task's files
-    task_dir = os.path.join(BASE_TEMP_DIR, task_id)
-    os.makedirs(task_dir, exist_ok=True)
-    
-    print(f"Starting video creation for task: {task_id}")
+    if orientation == "vertical":
+        return 1080, 1920
+    return 1920, 1080
+
+
+def _load_scene_audio(audio_path: str, target_duration: float):
+    """
+    Loads a scene's voiceover (already adjusted to target duration by generate_audio)
+    and fine-tunes it if it is still more than 0.1s off.
+    """
+    audio_clip = AudioFileClip(audio_path)
+    audio_duration = audio_clip.duration
     
-    for scene in script.scenes:
-        # Use scene number for clear file labeling
-        scene_filename = f"scene_{scene.scene_number}"
-        
-        # 1. Generate Audio with speed control
-        #    Files are now saved inside the task_dir
-        audio_path = os.path.join(task_dir, f"{scene_filename}.wav")
-        
-        # Get target duration from script
-        target_duration = scene.duration_seconds
+    # Verify audio matches target duration (should be very close after speed adjustment)
+    duration_diff = abs(audio_duration - target_duration)
+    if duration_diff > 0.1:  # If difference is more than 0.1 seconds
+        print(f"  ⚠️  Audio duration ({audio_duration:.2f}s) doesn't match target ({target_duration:.2f}s), fine-tuning...")
+        # Fine-tune using resampling (no cutting, smooth transition)
+        import numpy as np
+        from moviepy.audio.AudioClip import AudioArrayClip
         
-        print(f"Generating audio for scene {scene.scene_number} (target: {target_duration:.1f}s)...")
-        ai_service.generate_audio(scene.voiceover_text, audio_path, target_duration=target_duration)
+        audio_array = audio_clip.to_soundarray(fps=audio_clip.fps)
+        target_samples = int(target_duration * audio_clip.fps)
         
-        # 2. Load audio clip (already adjusted to target duration by generate_audio)
-        audio_clip = AudioFileClip(audio_path)
-        audio_duration = audio_clip.duration
-        target_duration = scene.duration_seconds
-        
-        # Verify audio matches target duration (should be very close after speed adjustment)
-        duration_diff = abs(audio_duration - target_duration)
-        if duration_diff > 0.1:  # If difference is more than 0.1 seconds
-            print(f"  ⚠️  Audio duration ({audio_duration:.2f}s) doesn't match target ({target_duration:.2f}s), fine-tuning...")
-            # Fine-tune using resampling (no cutting, smooth transition)
-            import numpy as np
-            from moviepy.audio.AudioClip import AudioArrayClip
-            
-            audio_array = audio_clip.to_soundarray(fps=audio_clip.fps)
-            target_samples = int(target_duration * audio_clip.fps)
+        if len(audio_array) > 0 and target_samples > 0:
+            try:
+                from scipy import signal
+                resampled = signal.resample(audio_array, target_samples, axis=0)
+            except ImportError:
+                # Fallback to numpy interpolation
+                indices = np.linspace(0, len(audio_array) - 1, target_samples)
+                if audio_array.ndim == 1:
+                    resampled = np.interp(indices, np.arange(len(audio_array)), audio_array)
+                else:
+                    resampled = np.array([np.interp(indices, np.arange(len(audio_array)), audio_array[:, i]) 
+                                          for i in range(audio_array.shape[1])]).T
             
-            if len(audio_array) > 0 and target_samples > 0:
-                try:
-                    from scipy import signal
-                    resampled = signal.resample(audio_array, target_samples, axis=0)
-                except ImportError:
-                    # Fallback to numpy interpolation
-                    indices = np.linspace(0, len(audio_array) - 1, target_samples)
-                    if audio_array.ndim == 1:
-                        resampled = np.interp(indices, np.arange(len(audio_array)), audio_array)
-                    else:
-                        resampled = np.array([np.interp(indices, np.arange(len(audio_array)), audio_array[:, i]) 
-                                              for i in range(audio_array.shape[1])]).T
-                
-                audio_clip = AudioArrayClip(resampled, fps=audio_clip.fps)
-                print(f"  🔧 Fine-tuned audio to match target duration")
-        
-        scene_audio_clips.append(audio_clip)
-        scene_duration = target_duration  # Use script's target duration
+            audio_clip = AudioArrayClip(resampled, fps=audio_clip.fps)
+            print(f"  🔧 Fine-tuned audio to match target duration")
+    
+    return audio_clip
+
+
+def _fit_video_to_scene(video_clip, scene_duration: float, orientation: str):
+    """
+    Trims or loops the clip to the scene duration, then crops/resizes it
+    to fill the output canvas.
+    """
+    # Adjust duration to match exact target duration from script
+    if video_clip.duration > scene_duration:
+        video_clip = video_clip.subclipped(0, scene_duration)
+    else:
+        # Loop the video if it's shorter than needed
+        clips = []
+        duration_accumulated = 0
+        while duration_accumulated < scene_duration:
+            clips.append(video_clip)
+            duration_accumulated += video_clip.duration
+        video_clip = concatenate_videoclips(clips).subclipped(0, scene_duration)
+    
+    # Resize/Crop to target format based on orientation
+    target_width, target_height = _target_size(orientation)
         
-        # 3. Get Media (Stock Video or AI-Generated Video)
-        media_path = os.path.join(task_dir, f"{scene_filename}.mp4")
-        print(f"Fetching media for scene {scene.scene_number} (source: {scene.media_source}, target duration: {scene_duration}s)...")
+    # Smart resizing/cropping logic
+    # 1. If aspect ratios match, just resize
+    # 2. If source is wider than target (e.g. 16:9 source for 9:16 target), crop center then resize
+    # 3. If source is taller than target (unlikely here but possible), crop center then resize
+    
+    # Calculate aspect ratios
+    source_ratio = video_clip.w / video_clip.h
+    target_ratio = target_width / target_height
+    
+    if abs(source_ratio - target_ratio) < 0.01:
+        # Ratios match, just resize
+        video_clip = video_clip.with_effects([vfx.Resize(height=target_height, width=target_width)])
+    else:
+        # Ratios mismatch, need to crop then resize
+        # We want to fill the target frame (cover)
         
-        if scene.media_source.lower() == "stock":
-            # Use stock video from Pexels
-            print(f"  → Using stock video with query: '{scene.visual_prompt}' (orientation: {orientation})")
-            media_service.get_stock_video(scene.visual_prompt, media_path, orientation=orientation)
-        elif scene.media_source.lower() == "ai_generated":
-            # Use AI video generation (Veo 3.1)
-            print(f"  → Generating AI video with prompt: '{scene.visual_prompt}'")
-            
-            # Determine aspect ratio for AI generation
-            ai_aspect_ratio = "16:9"
-            if orientation == "vertical":
-                ai_aspect_ratio = "9:16"
-                
-            ai_service.ai_video_gen(
-                prompt=scene.visual_prompt,
-                output_path=media_path,
-                generation_type="text_to_video",
-                aspect_ratio=ai_aspect_ratio
+        if source_ratio > target_ratio:
+            # Source is wider than target (e.g. 16:9 source, 9:16 target)
+            # Crop width to match target ratio
+            new_source_width = video_clip.h * target_ratio
+            video_clip = video_clip.cropped(
+                x_center=video_clip.w / 2, 
+                y_center=video_clip.h / 2, 
+                width=new_source_width, 
+                height=video_clip.h
             )
         else:
-            raise ValueError(f"Unknown media_source: {scene.media_source}. Must be 'stock' or 'ai_generated'.")
+            # Source is taller than target
+            # Crop height to match target ratio
+            new_source_height = video_clip.w / target_ratio
+            video_clip = video_clip.cropped(
+                x_center=video_clip.w / 2, 
+                y_center=video_clip.h / 2, 
+                width=video_clip.w, 
+                height=new_source_height
+            )
         
-        # Load and process the video clip
-        video_clip = VideoFileClip(media_path)
+        # Now resize to exact target dimensions
+        video_clip = video_clip.with_effects([vfx.Resize(height=target_height, width=target_width)])
+    
+    return video_clip
+
+
+@functools.lru_cache(maxsize=None)
+def _caption_font() -> str:
+    """
+    Resolves the caption font once per process: Arial Bold, else Arial.
+    (Previously every caption chunk tried the bold font and fell back on failure.)
+    """
+    from PIL import ImageFont
+
+    for font in ('/System/Library/Fonts/Supplemental/Arial Bold.ttf', 'Arial-Bold'):
+        try:
+            ImageFont.truetype(font, 80)
+            return font
+        except OSError:
+            continue
+    # Fallback to regular Arial if Bold fails
+    return 'Arial'
+
+
+def _make_caption_clip(chunk: str, target_width: int):
+    """
+    Creates the TextClip for one caption chunk, scaled down if it is too wide.
+    """
+    # Add spaces and newlines to text to prevent clipping of strokes/descenders
+    # This forces the canvas to be larger than the text glyphs
+    padded_text = f"\n {chunk.upper()} \n"
+
+    # Use 'label' method to avoid clipping (let it expand)
+    # Then resize if it's too wide
+    txt_clip = TextClip(
+        text=padded_text, 
+        font=_caption_font(),
+        font_size=80, # Large text
+        color='white',
+        stroke_color='black',
+        stroke_width=5,
+        method='label', # Auto-size to fit text
+        text_align='center'
+    )
+    
+    # Remove the margin effect as we are using text padding
+    # txt_clip = txt_clip.with_effects([vfx.Margin(left=10, right=10, top=10, bottom=10, opacity=0)])
+    
+    # Check if text is too wide and resize if needed
+    max_width = int(target_width * 0.9)
+    if txt_clip.w > max_width:
+        txt_clip = txt_clip.with_effects([vfx.Resize(width=max_width)])
+    
+    return txt_clip
+
+
+def _build_caption_clips(subtitle_text: str, scene_duration: float, target_width: int) -> list:
+    """
+    Builds the karaoke-style caption chunks (2-4 words each) for one scene.
+    """
+    words = subtitle_text.split()
+    
+    # Chunk words into groups of 2-4
+    chunks = []
+    current_chunk = []
+    
+    for word in words:
+        current_chunk.append(word)
+        # Randomly decide chunk size between 2 and 4, or if it's the last word
+        target_chunk_size = random.randint(2, 4)
+        if len(current_chunk) >= target_chunk_size:
+            chunks.append(" ".join(current_chunk))
+            current_chunk = []
+    
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
         
-        # Adjust duration to match exact target duration from script
-        if video_clip.duration > scene_duration:
-            video_clip = video_clip.subclipped(0, scene_duration)
-        else:
-            # Loop the video if it's shorter than needed
-            clips = []
-            duration_accumulated = 0
-            while duration_accumulated < scene_duration:
-                clips.append(video_clip)
-                duration_accumulated += video_clip.duration
-            video_clip = concatenate_videoclips(clips).subclipped(0, scene_duration)
+    # Calculate timing for each chunk
+    total_words = len(words)
+    chunk_clips = []
+    current_time = 0
+    
+    for chunk in chunks:
+        chunk_word_count = len(chunk.split())
+        # Proportional duration based on word count
+        chunk_duration = (chunk_word_count / total_words) * scene_duration
         
-        # Resize/Crop to target format based on orientation
-        target_width = 1920
-        target_height = 1080
+        # Create TextClip for this chunk
+        txt_clip = _make_caption_clip(chunk, target_width)
         
-        if orientation == "vertical":
-            target_width = 1080
-            target_height = 1920
-            
-        # Smart resizing/cropping logic
-        # 1. If aspect ratios match, just resize
-        # 2. If source is wider than target (e.g. 16:9 source for 9:16 target), crop center then resize
-        # 3. If source is taller than target (unlikely here but possible), crop center then resize
+        txt_clip = txt_clip.with_duration(chunk_duration)
         
-        # Calculate aspect ratios
-        source_ratio = video_clip.w / video_clip.h
-        target_ratio = target_width / target_height
+        # Position: Center of screen (Safe Zone)
+        txt_clip = txt_clip.with_position('center')
         
-        if abs(source_ratio - target_ratio) < 0.01:
-            # Ratios match, just resize
-            video_clip = video_clip.with_effects([vfx.Resize(height=target_height, width=target_width)])
-        else:
-            # Ratios mismatch, need to crop then resize
-            # We want to fill the target frame (cover)
+        # Set start time
+        txt_clip = txt_clip.with_start(current_time)
+        
+        chunk_clips.append(txt_clip)
+        current_time += chunk_duration
+    
+    return chunk_clips
+
+
+def _add_background_music(final_video_clip, music_path: str):
+    """
+    Mixes the background track under the clip's voiceover at low volume.
+    """
+    if music_path and os.path.exists(music_path):
+        try:
+            print(f"🎵 Adding background music: {music_path}")
+            music_clip = AudioFileClip(music_path)
             
-            if source_ratio > target_ratio:
-                # Source is wider than target (e.g. 16:9 source, 9:16 target)
-                # Crop width to match target ratio
-                new_source_width = video_clip.h * target_ratio
-                video_clip = video_clip.cropped(
-                    x_center=video_clip.w / 2, 
-                    y_center=video_clip.h / 2, 
-                    width=new_source_width, 
-                    height=video_clip.h
-                )
+            # Loop if too short
+            if music_clip.duration < final_video_clip.duration:
+                music_clip = vfx.loop(music_clip, duration=final_video_clip.duration)
             else:
-                # Source is taller than target
-                # Crop height to match target ratio
-                new_source_height = video_clip.w / target_ratio
-                video_clip = video_clip.cropped(
-                    x_center=video_clip.w / 2, 
-                    y_center=video_clip.h / 2, 
-                    width=video_clip.w, 
-                    height=new_source_height
-                )
+                music_clip = music_clip.subclipped(0, final_video_clip.duration)
             
-            # Now resize to exact target dimensions
-            video_clip = video_clip.with_effects([vfx.Resize(height=target_height, width=target_width)])
-        
-        # 5. Apply Viral Video Effects (Color & Zoom)
-        print(f"  → Applying viral effects (Color Grading & Zoom)...")
-        try:
-            # Apply Color Grading
-            video_clip = apply_color_grading(video_clip)
+            # Lower volume for background (e.g., 15-20%)
+            music_clip = music_clip.with_volume_scaled(0.15)
             
-            # Apply Zoom Effect
-            video_clip = zoom_in_effect(video_clip, zoom_ratio=0.1) # 10% zoom for dynamic feel
+            # Combine with voiceover
+            final_audio = CompositeAudioClip([final_video_clip.audio, music_clip])
+            final_video_clip = final_video_clip.with_audio(final_audio)
+            print("✅ Background music added successfully")
         except Exception as e:
-            print(f"  ⚠️  Error applying effects: {e}")
+            print(f"⚠️  Failed to add background music: {e}")
+    else:
+        print("⚠️  No background music found or keywords missing.")
+    return final_video_clip
 
+
+@stage_duration_seconds.timed(stage="scene_render")
+def _build_scene_clip(scene: SceneScript, audio_path: str, media_path: str, music_path: str, orientation: str, source_clips: list = None):
+    """
+    Builds one finished scene (video + effects + captions + music) from its
+    downloaded assets. This is the CPU-bound part of a scene.
+
+    Args:
+        source_clips: Optional list the file-backed clips opened here are appended
+            to, so the caller can close them (and their ffmpeg readers) later.
+
+    Returns:
+        (scene_video_clip, scene_audio_clip)
+    """
+    scene_duration = scene.duration_seconds  # Use script's target duration
+    target_width, _ = _target_size(orientation)
+
+    # 2. Load audio clip (already adjusted to target duration by generate_audio)
+    audio_clip = _load_scene_audio(audio_path, scene_duration)
+    
+    # Load and process the video clip
+    source_clip = VideoFileClip(media_path)
+    if source_clips is not None:
+        source_clips.extend([audio_clip, source_clip])
+    video_clip = _fit_video_to_scene(source_clip, scene_duration, orientation)
+    
+    # 5. Apply Viral Video Effects (Color & Zoom)
+    print(f"  → Applying viral effects (Color Grading & Zoom)...")
+    try:
+        # Apply Color Grading
+        video_clip = apply_color_grading(video_clip)
         
-        # 4. Add subtitles to the video clip (Karaoke Style / Chunked)
-        # Create subtitle clip with the voiceover text
-        print(f"  → Adding subtitles for scene {scene.scene_number} (Karaoke Style)...")
-        
-        subtitle_text = scene.voiceover_text
-        words = subtitle_text.split()
-        
-        # Chunk words into groups of 2-4
-        chunks = []
-        current_chunk = []
-        
-        import random
-        
-        for word in words:
-            current_chunk.append(word)
-            # Randomly decide chunk size between 2 and 4, or if it's the last word
-            target_chunk_size = random.randint(2, 4)
-            if len(current_chunk) >= target_chunk_size:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = []
-        
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
-            
-        # Calculate timing for each chunk
-        total_words = len(words)
-        chunk_clips = []
-        current_time = 0
-        
-        for chunk in chunks:
-            chunk_word_count = len(chunk.split())
-            # Proportional duration based on word count
-            chunk_duration = (chunk_word_count / total_words) * scene_duration
-            
-            # Create TextClip for this chunk
-            try:
-                # Use 'label' method to avoid clipping (let it expand)
-                # Then resize if it's too wide
-                font_path = '/System/Library/Fonts/Supplemental/Arial Bold.ttf'
-                if not os.path.exists(font_path):
-                    font_path = 'Arial-Bold' # Fallback
-
-                # Add spaces and newlines to text to prevent clipping of strokes/descenders
-                # This forces the canvas to be larger than the text glyphs
-                padded_text = f"\n {chunk.upper()} \n"
-
-                txt_clip = TextClip(
-                    text=padded_text, 
-                    font=font_path,
-                    font_size=80, # Large text
-                    color='white',
-                    stroke_color='black',
-                    stroke_width=5,
-                    method='label', # Auto-size to fit text
-                    text_align='center'
-                )
-            except Exception:
-                # Fallback to regular Arial if Bold fails
-                padded_text = f"\n {chunk.upper()} \n"
-                txt_clip = TextClip(
-                    text=padded_text,
-                    font='Arial',
-                    font_size=80,
-                    color='white',
-                    stroke_color='black',
-                    stroke_width=5,
-                    method='label',
-                    text_align='center'
-                )
-            
-            # Remove the margin effect as we are using text padding
-            # txt_clip = txt_clip.with_effects([vfx.Margin(left=10, right=10, top=10, bottom=10, opacity=0)])
-            
-            # Check if text is too wide and resize if needed
-            max_width = int(target_width * 0.9)
-            if txt_clip.w > max_width:
-                txt_clip = txt_clip.with_effects([vfx.Resize(width=max_width)])
-            
-            txt_clip = txt_clip.with_duration(chunk_duration)
-            
-            # Position: Center of screen (Safe Zone)
-            txt_clip = txt_clip.with_position('center')
-            
-            # Set start time
-            txt_clip = txt_clip.with_start(current_time)
-            
-            chunk_clips.append(txt_clip)
-            current_time += chunk_duration
-            
-        # Composite video with all subtitle chunks
-        # Note: We don't need a background box for this style as the stroke is heavy
-        final_video_clip = CompositeVideoClip([video_clip] + chunk_clips)
+        # Apply Zoom Effect
+        video_clip = zoom_in_effect(video_clip, zoom_ratio=0.1) # 10% zoom for dynamic feel
+    except Exception as e:
+        print(f"  ⚠️  Error applying effects: {e}")
+
+    # 4. Add subtitles to the video clip (Karaoke Style / Chunked)
+    print(f"  → Adding subtitles for scene {scene.scene_number} (Karaoke Style)...")
+    chunk_clips = _build_caption_clips(scene.voiceover_text, scene_duration, target_width)
         
-        # --- ADD BACKGROUND MUSIC ---
-        # Check if script has music keywords
-        music_path = None
-        if hasattr(script, 'background_music_keywords') and script.background_music_keywords:
-            # Use maximum 2-3 keywords, join them into a simple search query
-            keywords = script.background_music_keywords[:2]  # Limit to 2 keywords
-            search_query = " ".join(keywords)
-            print(f"🎵 Looking for background music with keywords: {search_query}")
-            
-            from services import audio_service
-            music_path = audio_service.search_music(search_query, duration=int(final_video_clip.duration))
-            
-        if music_path and os.path.exists(music_path):
-            try:
-                print(f"🎵 Adding background music: {music_path}")
-                music_clip = AudioFileClip(music_path)
-                
-                # Loop if too short
-                if music_clip.duration < final_video_clip.duration:
-                    music_clip = vfx.loop(music_clip, duration=final_video_clip.duration)
-                else:
-                    music_clip = music_clip.subclipped(0, final_video_clip.duration)
-                
-                # Lower volume for background (e.g., 15-20%)
-                music_clip = music_clip.with_volume_scaled(0.15)
-                
-                # Combine with voiceover
-                final_audio = CompositeAudioClip([final_video_clip.audio, music_clip])
-                final_video_clip = final_video_clip.with_audio(final_audio)
-                print("✅ Background music added successfully")
-            except Exception as e:
-                print(f"⚠️  Failed to add background music: {e}")
-        else:
-            print("⚠️  No background music found or keywords missing.")
+    # Composite video with all subtitle chunks
+    # Note: We don't need a background box for this style as the stroke is heavy
+    final_video_clip = CompositeVideoClip([video_clip] + chunk_clips)
+    
+    # --- ADD BACKGROUND MUSIC ---
+    final_video_clip = _add_background_music(final_video_clip, music_path)
+    
+    return final_video_clip, audio_clip
 
-        scene_clips.append(final_video_clip)
 
+@stage_duration_seconds.timed(stage="encode")
+def _render_final_video(scene_clips: list, scene_audio_clips: list, task_dir: str, logger="bar") -> str:
+    """
+    Stitches all scenes together and encodes final_video.mp4 into task_dir.
+    `logger` is passed to moviepy's write_audiofile/write_videofile (e.g. an
+    EncodeProgressLogger); if it raises, the encode stops and the partial file is removed.
+    """
     # 6. Stitch all scenes together
     print("Concatenating all scenes...")
     final_video = concatenate_videoclips(scene_clips,method="compose")
@@ -376,23 +387,274 @@ def create_video(script: ScriptResponse, task_id: str, orientation: str = "horiz
 
     # 7. Write the final file to the task_dir
     output_path = os.path.join(task_dir, "final_video.mp4")
+    # Encode under a temporary name so /download never serves a half-written file
+    partial_output_path = os.path.join(task_dir, "final_video.partial.mp4")
     output_final_audio_path = os.path.join(task_dir, "final_audio.mp3")
-    final_audio.write_audiofile(output_final_audio_path)
-    final_video.write_videofile(
-        output_path,
-        codec='libx264',
-        audio_codec='libmp3lame',
-        temp_audiofile=os.path.join(task_dir, 'temp-audio.mp3'),
-        remove_temp=True,
-        audio=output_final_audio_path,
-        fps=60 # High framerate for smooth motion
+    try:
+        final_audio.write_audiofile(output_final_audio_path, logger=logger)
+        final_video.write_videofile(
+            partial_output_path,
+            codec='libx264',
+            audio_codec='libmp3lame',
+            temp_audiofile=os.path.join(task_dir, 'temp-audio.mp3'),
+            remove_temp=True,
+            audio=output_final_audio_path,
+            fps=60, # High framerate for smooth motion
+            # Put the moov atom at the front so playback can start before the download finishes
+            ffmpeg_params=["-movflags", "+faststart"],
+            logger=logger,
+        )
+    except BaseException:
+        if os.path.exists(partial_output_path):
+            os.remove(partial_output_path)
+        raise
+    os.replace(partial_output_path, output_path)
+    return output_path
+
+
+def _close_clips(clips: list):
+    for clip in clips:
+        try:
+            clip.close()
+        except Exception as e:
+            print(f"  ⚠️  Failed to close clip: {e}")
+
+
+# --- ASYNC FETCH HELPERS ---
+
+async def _fetch_scene_media(scene: SceneScript, media_path: str, orientation: str) -> str:
+    """
+    Gets the stock clip or AI-generated video for a scene.
+    """
+    print(f"Fetching media for scene {scene.scene_number} (source: {scene.media_source}, target duration: {scene.duration_seconds}s)...")
+    
+    if scene.media_source.lower() == "stock":
+        # Use stock video from Pexels
+        print(f"  → Using stock video with query: '{scene.visual_prompt}' (orientation: {orientation})")
+        return await media_service.get_stock_video_async(scene.visual_prompt, media_path, orientation=orientation, duration_seconds=scene.duration_seconds)
+    elif scene.media_source.lower() == "ai_generated":
+        # Use AI video generation (Veo 3.1)
+        print(f"  → Generating AI video with prompt: '{scene.visual_prompt}'")
+        
+        # Determine aspect ratio for AI generation
+        ai_aspect_ratio = "16:9"
+        if orientation == "vertical":
+            ai_aspect_ratio = "9:16"
+            
+        return await ai_service.ai_video_gen_async(
+            prompt=scene.visual_prompt,
+            output_path=media_path,
+            generation_type="text_to_video",
+            aspect_ratio=ai_aspect_ratio
+        )
+    else:
+        raise ValueError(f"Unknown media_source: {scene.media_source}. Must be 'stock' or 'ai_generated'.")
+
+
+async def _fetch_scene_music(script: ScriptResponse, scene_duration: float) -> str:
+    """
+    Looks up background music for a scene from the script's keywords.
+    """
+    # Check if script has music keywords
+    if hasattr(script, 'background_music_keywords') and script.background_music_keywords:
+        # Use maximum 2-3 keywords, join them into a simple search query
+        keywords = script.background_music_keywords[:2]  # Limit to 2 keywords
+        search_query = " ".join(keywords)
+        print(f"🎵 Looking for background music with keywords: {search_query}")
+        return await audio_service.search_music_async(search_query, duration=int(scene_duration))
+    return None
+
+
+async def _resume_or_fetch(manifest: TaskManifest, name: str, fetch) -> str:
+    """
+    Returns the checkpointed artifact `name` if it is still valid, otherwise
+    awaits `fetch` and checkpoints its result.
+    """
+    if manifest is None:
+        return await fetch
+    restored = await asyncio.to_thread(manifest.valid_artifact, name)
+    cache_requests_total.inc(cache="checkpoint", result="hit" if restored is not None else "miss")
+    if restored is not None:
+        fetch.close()
+        print(f"  ♻️  Reusing checkpointed '{name}'")
+        return restored
+    result = await fetch
+    await asyncio.to_thread(manifest.record, name, result)
+    return result
+
+
+# --- ORCHESTRATION ---
+
+def create_video(script: ScriptResponse, task_id: str, orientation: str = "horizontal", assets=None, manifest: TaskManifest = None) -> str:
+    """
+    Orchestrates the entire video creation process.
+    All files are saved inside a directory named after the task_id.
+    
+    Thin sync wrapper around create_video_async.
+    """
+    return run_sync(create_video_async(script, task_id, orientation, assets, manifest))
+
+
+def prefetch_scene_assets(script: ScriptResponse, task_id: str, task_dir: str, orientation: str, manifest: TaskManifest = None) -> AssetTable:
+    """
+    Starts every scene's media fetch (stock search + download or Veo submission)
+    and music lookup at once, as soon as the script is known.
+    Must be called from a coroutine on the loop that will consume the table.
+    
+    With a manifest, assets checkpointed by an earlier attempt are reused
+    and newly fetched ones are checkpointed.
+    
+    Returns:
+        The task's AssetTable, with entries "media:<scene_number>" and "music:<scene_number>".
+    """
+    assets = AssetTable(task_id)
+    for scene in script.scenes:
+        media_path = os.path.join(task_dir, f"scene_{scene.scene_number}.mp4")
+        media_name, music_name = f"media:{scene.scene_number}", f"music:{scene.scene_number}"
+        assets.add(media_name, _resume_or_fetch(manifest, media_name, _fetch_scene_media(scene, media_path, orientation)))
+        assets.add(music_name, _resume_or_fetch(manifest, music_name, _fetch_scene_music(script, scene.duration_seconds)))
+    print(f"🚀 Prefetching media and music for {len(script.scenes)} scenes")
+    return assets
+
+
+def prefetch_shared_assets(table: AssetTable, script: ScriptResponse, asset_dir: str, orientation: str) -> AssetView:
+    """
+    Registers one script's voiceovers, media and music in an AssetTable shared by
+    a whole batch. Entries are keyed by content (query, prompt, text, duration),
+    so a stock query, music search or voiceover line that appears in several
+    scripts of the batch is fetched only once.
+    Must be called from a coroutine on the loop that will consume the table.
+    
+    Returns:
+        An AssetView with the same names as prefetch_scene_assets, plus "voiceover:<scene_number>".
+    """
+    def shared_path(key: str, extension: str) -> str:
+        return os.path.join(asset_dir, f"{hashlib.sha1(key.encode()).hexdigest()[:16]}{extension}")
+
+    names = {}
+    for scene in script.scenes:
+        n = scene.scene_number
+        if scene.media_source.lower() == "stock":
+            media_key = normalize_key("stock", scene.visual_prompt, orientation, round(scene.duration_seconds))
+        else:
+            media_key = normalize_key("ai", scene.media_source, scene.visual_prompt, orientation)
+        voiceover_key = normalize_key("tts", scene.voiceover_text, round(scene.duration_seconds, 2))
+        music_key = normalize_key("music", " ".join(script.background_music_keywords[:2]), int(scene.duration_seconds))
+
+        table.add(media_key, _fetch_scene_media(scene, shared_path(media_key, ".mp4"), orientation))
+        table.add(voiceover_key, ai_service.generate_audio_async(scene.voiceover_text, shared_path(voiceover_key, ".wav"), target_duration=scene.duration_seconds))
+        table.add(music_key, _fetch_scene_music(script, scene.duration_seconds))
+        names.update({f"media:{n}": media_key, f"voiceover:{n}": voiceover_key, f"music:{n}": music_key})
+    return AssetView(table, names)
+
+
+async def create_video_async(script: ScriptResponse, task_id: str, orientation: str = "horizontal", assets=None, manifest: TaskManifest = None) -> str:
+    """
+    The asyncio version of create_video.
+    All scenes' media and music are prefetched up front (see prefetch_scene_assets);
+    the scene loop generates each voiceover and only waits on assets that haven't
+    arrived yet. Clip building and the final encode run in worker threads so
+    the event loop stays free for the remaining downloads.
+    
+    The task directory is protected from storage eviction while it renders, and
+    its intermediates are deleted once the final video is written.
+    
+    Args:
+        assets: Optional prefetched assets (an AssetView from prefetch_shared_assets,
+            for batches). By default the task prefetches its own.
+        manifest: Optional checkpoint of the task (see utils.checkpoint). Voiceovers,
+            media and music are recorded in it as they finish, and valid ones
+            from an earlier attempt are reused instead of being fetched again.
+    """
+    # --- NEW FILE ORGANIZATION ---
+    # Create a unique directory for this task's files
+    task_dir = os.path.join(BASE_TEMP_DIR, task_id)
+    os.makedirs(task_dir, exist_ok=True)
+    
+    with storage_manager.protect(task_id):
+        output_path = await _render_task(script, task_id, orientation, task_dir, assets, manifest)
+        if not KEEP_INTERMEDIATES:
+            await asyncio.to_thread(storage_manager.cleanup_intermediates, task_dir)
+    return output_path
+
+
+async def _render_task(script: ScriptResponse, task_id: str, orientation: str, task_dir: str, assets=None, manifest: TaskManifest = None) -> str:
+    """
+    Prefetches, renders and encodes one task into task_dir (see create_video_async).
+    """
+    scene_clips = []
+    scene_audio_clips = []
+    source_clips = []
+    
+    print(f"Starting video creation for task: {task_id}")
+    if assets is None:
+        assets = prefetch_scene_assets(script, task_id, task_dir, orientation, manifest)
+    total_scenes = len(script.scenes)
+    progress_broker.publish(task_id, "fetching_assets", f"Fetching media for {total_scenes} scenes...", total_scenes=total_scenes)
+    loop_started_at = time.monotonic()
+    
+    try:
+        for index, scene in enumerate(script.scenes):
+            check_cancelled()
+            # ETA from the average time of the scenes rendered so far
+            eta = None
+            if index:
+                eta = round((time.monotonic() - loop_started_at) / index * (total_scenes - index), 1)
+            progress_broker.publish(
+                task_id, "rendering_scene", f"Rendering scene {index + 1} of {total_scenes}...",
+                scene=index + 1, total_scenes=total_scenes, percent=int(index * 100 / total_scenes), eta_seconds=eta,
+            )
+            
+            # Use scene number for clear file labeling
+            scene_filename = f"scene_{scene.scene_number}"
+            
+            # 1. Generate Audio with speed control
+            #    Files are now saved inside the task_dir
+            audio_path = os.path.join(task_dir, f"{scene_filename}.wav")
+            
+            if f"voiceover:{scene.scene_number}" in assets:
+                audio_path = await assets.get(f"voiceover:{scene.scene_number}")
+            else:
+                print(f"Generating audio for scene {scene.scene_number} (target: {scene.duration_seconds:.1f}s)...")
+                audio_path = await _resume_or_fetch(
+                    manifest, f"voiceover:{scene.scene_number}",
+                    ai_service.generate_audio_async(scene.voiceover_text, audio_path, target_duration=scene.duration_seconds),
+                )
+            
+            # 3. Get Media (Stock Video or AI-Generated Video) from the prefetch table
+            media_path = await assets.get(f"media:{scene.scene_number}")
+            music_path = await assets.get(f"music:{scene.scene_number}")
+            
+            if manifest is not None and isinstance(assets, AssetView):
+                # Batch assets are fetched by the batch; checkpoint them for this task too
+                for name, location in (("voiceover", audio_path), ("media", media_path), ("music", music_path)):
+                    await asyncio.to_thread(manifest.record, f"{name}:{scene.scene_number}", location)
+            
+            final_video_clip, audio_clip = await asyncio.to_thread(
+                _build_scene_clip, scene, audio_path, media_path, music_path, orientation, source_clips
+            )
+            scene_audio_clips.append(audio_clip)
+            scene_clips.append(final_video_clip)
+        check_cancelled()
+    except BaseException:
+        # Don't leave downloads or Veo polls running for a task that has already failed
+        assets.cancel()
+        _close_clips(source_clips)
+        raise
+
+    progress_broker.publish(task_id, "encoding", "Encoding final video...", percent=0)
+    encode_logger = EncodeProgressLogger(
+        lambda percent, eta: progress_broker.publish(
+            task_id, "encoding", "Encoding final video...",
+            percent=percent, eta_seconds=round(eta, 1) if eta is not None else None,
+        )
     )
+    try:
+        output_path = await asyncio.to_thread(_render_final_video, scene_clips, scene_audio_clips, task_dir, encode_logger)
+    finally:
+        # Stops the ffmpeg reader processes of the scene sources
+        _close_clips(source_clips)
     
     print(f"Final video for {task_id} written to: {output_path}")
     
-    # (Optional cleanup: remove intermediate scene files)
-    # for scene in script.scenes:
-    #    os.remove(os.path.join(task_dir, f"scene_{scene.scene_number}.wav"))
-    #    os.remove(os.path.join(task_dir, f"scene_{scene.scene_number}.mp4"))
-    
-    return output_path
\ No newline at end of file
+    return output_path
@@ -0,0 +1,125 @@
+# services/warmup_service.py
+import importlib
+import os
+import subprocess
+import tempfile
+import time
+
+from config import async_http_client
+from utils.async_runtime import run_sync
+
+# Filled by warm_up(); reported by GET /worker
+report = {"state": "cold", "steps": {}}
+
+# Imported only for the side effect of loading them (the API process imports them lazily)
+RENDER_MODULES = (
+    "numpy",
+    "scipy.signal",
+    "moviepy.audio.AudioClip",
+    "google.generativeai",
+    "services.ai_service",
+    "services.video_service",
+)
+
+
+def warm_up() -> dict:
+    """
+    Loads everything a render needs before the worker takes jobs, so the
+    first task doesn't pay for it: the render modules (MoviePy, numpy,
+    scipy, the Gemini SDK), ffmpeg and its probing, the caption font, the
+    color grading / zoom effect path, and provider HTTP connections.
+
+    Each step is timed; a failing step is logged and skipped (the first
+    task then pays for it as before). Blocking; run it in a thread.
+
+    Returns:
+        The warm-up report: {"state", "seconds", "steps": {name: seconds or error}}.
+    """
+    report.update(state="warming", steps={})
+    started_at = time.monotonic()
+    with tempfile.TemporaryDirectory(prefix="warmup_") as scratch:
+        sample_path = os.path.join(scratch, "sample.mp4")
+        steps = [
+            ("imports", _import_render_modules),
+            ("ffmpeg", lambda: _probe_ffmpeg(sample_path)),
+            ("fonts", _load_fonts),
+            ("effects", lambda: _run_effects(sample_path)),
+            ("http_pools", _open_http_pools),
+        ]
+        for name, step in steps:
+            step_started_at = time.monotonic()
+            try:
+                step()
+                report["steps"][name] = round(time.monotonic() - step_started_at, 3)
+            except Exception as e:
+                print(f"⚠️  Warm-up step '{name}' failed: {e}")
+                report["steps"][name] = f"failed: {e}"
+    report.update(state="warm", seconds=round(time.monotonic() - started_at, 3))
+    print(f"🔥 Worker warmed up in {report['seconds']:.1f}s {report['steps']}")
+    return report
+
+
+def _import_render_modules():
+    for name in RENDER_MODULES:
+        importlib.import_module(name)
+
+
+def _probe_ffmpeg(sample_path: str):
+    """
+    Encodes a tiny clip with the bundled ffmpeg and reads it back through
+    MoviePy, which exercises the ffmpeg binary lookup, probing and decoding.
+    """
+    import imageio_ffmpeg
+    from moviepy import AudioFileClip, VideoFileClip
+
+    subprocess.run(
+        [
+            imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", "color=c=gray:s=64x36:d=0.5:r=10",
+            "-f", "lavfi", "-i", "sine=frequency=440:duration=0.5",
+            "-shortest", "-c:v", "libx264", "-c:a", "aac", sample_path,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    with VideoFileClip(sample_path) as clip:
+        clip.get_frame(0)
+    with AudioFileClip(sample_path) as clip:
+        clip.get_frame(0)
+
+
+def _load_fonts():
+    from . import video_service
+
+    video_service._make_caption_clip("warm up", 640)
+
+
+def _run_effects(sample_path: str):
+    """
+    Runs one frame through color grading and zoom, and one small resample,
+    so the numpy/Pillow/scipy code paths are initialized.
+    """
+    import numpy as np
+    from scipy import signal
+    from moviepy import VideoFileClip
+    from . import video_service
+
+    with VideoFileClip(sample_path) as clip:
+        graded = video_service.zoom_in_effect(video_service.apply_color_grading(clip), zoom_ratio=0.1)
+        graded.get_frame(clip.duration / 2)
+    signal.resample(np.zeros((4410, 2)), 4000, axis=0)
+
+
+def _open_http_pools():
+    from .ai_service import VEO_API_BASE_URL, VEO_LOCATION
+    from .audio_service import FREESOUND_API_BASE_URL
+    from .media_service import PEXELS_API_BASE_URL
+
+    # Hosts the render pipeline talks to through the pooled async client
+    provider_urls = [
+        f"{PEXELS_API_BASE_URL}/",
+        f"{FREESOUND_API_BASE_URL}/",
+        f"{VEO_API_BASE_URL or f'https://{VEO_LOCATION}-aiplatform.googleapis.com'}/",
+    ]
+    # The pools belong to the provider loop, so they must be opened on it
+    run_sync(async_http_client.warm(provider_urls))
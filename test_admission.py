@@ -0,0 +1,70 @@
+# test_admission.py
+import os
+import threading
+
+# config.py requires provider keys at import; these tests never call a provider
+os.environ.setdefault("GOOGLE_API_KEYS", "test")
+os.environ.setdefault("PEXELS_API_KEYS", "test")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("RESUME_ON_STARTUP", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from utils.admission import AdmissionController
+
+
+@pytest.fixture
+def controller():
+    controller = AdmissionController(max_running=1, max_queued=2, default_job_seconds=60, priority_aging_seconds=0)
+    release = threading.Event()
+    controller.block = lambda: release.wait(5)
+    yield controller
+    release.set()
+    controller.shutdown()
+
+
+def test_submit_rejects_when_running_and_queue_are_full(controller):
+    assert controller.submit("running", controller.block)
+    assert controller.submit("queued-1", controller.block)
+    assert controller.submit("queued-2", controller.block)
+
+    assert not controller.submit("overflow", controller.block)
+    assert controller.rejected == 1
+    assert controller.position("running") == 0
+    assert controller.position("overflow") is None
+    assert controller.retry_after() >= 1
+
+
+def test_submit_many_is_all_or_nothing(controller):
+    assert controller.submit("running", controller.block)
+    jobs = [(f"batch-{i}", controller.block, (), {}, "normal", None) for i in range(3)]
+
+    assert not controller.submit_many(jobs)
+    assert controller.snapshot()["queued"] == 0
+    assert controller.submit_many(jobs[:2])
+    assert controller.snapshot()["queued"] == 2
+
+
+def test_cancel_removes_only_waiting_jobs(controller):
+    assert controller.submit("running", controller.block)
+    assert controller.submit("queued", controller.block)
+
+    assert controller.cancel("queued")
+    assert controller.position("queued") is None
+    assert not controller.cancel("running")
+
+
+def test_generate_video_returns_429_with_retry_after_when_queue_is_full(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main.admission_controller, "submit", lambda *args, **kwargs: False)
+    monkeypatch.setattr(main.admission_controller, "retry_after", lambda slots=1: 42)
+
+    pending_before = main.task_store.count_by_status().get("pending", 0)
+    response = TestClient(main.app).post("/generate-video", json={"prompt": "queue full test"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "42"
+    assert response.json()["retry_after_seconds"] == 42
+    assert main.task_store.count_by_status().get("pending", 0) == pending_before
@@ -0,0 +1,116 @@
+# test_api_key_rotator.py
+import json
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+from utils.api_key_rotator import APIKeyRotator
+from utils.http_client import parse_retry_after
+
+
+def test_rotates_round_robin_while_all_keys_are_healthy():
+    rotator = APIKeyRotator(["a", "b", "c"])
+
+    assert [rotator.get_key() for _ in range(4)] == ["a", "b", "c", "a"]
+
+
+def test_rate_limited_key_is_skipped_during_its_cooldown():
+    rotator = APIKeyRotator(["a", "b"], default_cooldown=60)
+    rotator.report_rate_limited("a")
+
+    assert [rotator.get_key() for _ in range(3)] == ["b", "b", "b"]
+    assert rotator.get_stats()[0]["healthy"] is False
+    assert rotator.get_stats()[0]["cooldown_remaining"] > 59
+
+
+def test_retry_after_overrides_the_default_cooldown():
+    rotator = APIKeyRotator(["a", "b"], default_cooldown=60)
+    rotator.report_rate_limited("a", retry_after=0.05)
+    rotator.report_rate_limited("b")
+    assert rotator.seconds_until_available() <= 0.05
+
+    time.sleep(0.1)
+
+    assert rotator.get_stats()[0]["healthy"] is True
+    assert rotator.get_key() == "a"
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    def response(value):
+        return SimpleNamespace(headers={"Retry-After": value} if value is not None else {})
+
+    assert parse_retry_after(response("120")) == 120
+    assert 25 < parse_retry_after(response(formatdate(time.time() + 30, usegmt=True))) <= 30
+    assert parse_retry_after(response("soon")) is None
+    assert parse_retry_after(response(None)) is None
+
+
+def test_least_recently_limited_healthy_key_is_preferred():
+    rotator = APIKeyRotator(["a", "b", "c"])
+    rotator.report_rate_limited("a", retry_after=0)
+    rotator.report_rate_limited("b", retry_after=0)
+
+    # All are healthy again, but c was never limited
+    assert [rotator.get_key() for _ in range(3)] == ["c", "c", "c"]
+
+    time.sleep(0.01)
+    rotator.report_rate_limited("c", retry_after=0)
+    assert rotator.get_key() == "a"
+
+
+def test_when_every_key_is_cooling_down_the_soonest_available_wins():
+    rotator = APIKeyRotator(["a", "b"])
+    rotator.report_rate_limited("a", retry_after=60)
+    rotator.report_rate_limited("b", retry_after=5)
+
+    assert rotator.get_key() == "b"
+    assert 4 < rotator.seconds_until_available() <= 5
+
+
+def test_a_key_that_keeps_failing_is_benched():
+    rotator = APIKeyRotator(["a", "b"], default_cooldown=60, max_error_rate=0.5)
+    for _ in range(2):
+        rotator.report_success("a")
+    for _ in range(3):
+        rotator.report_error("a")
+
+    assert rotator.get_stats()[0]["healthy"] is False
+    assert rotator.get_key() == "b"
+
+
+def test_cooldowns_survive_a_restart_without_writing_raw_keys(tmp_path):
+    path = tmp_path / "keys.json"
+    rotator = APIKeyRotator(["secret-a", "secret-b"], state_path=str(path))
+    rotator.get_key()
+    rotator.report_rate_limited("secret-a", retry_after=60)
+
+    assert "secret" not in path.read_text()
+    assert len(json.loads(path.read_text())) == 2
+
+    reloaded = APIKeyRotator(["secret-a", "secret-b"], state_path=str(path))
+    stats = reloaded.get_stats()
+    assert stats[0]["rate_limited"] == 1 and stats[0]["requests"] == 1 and not stats[0]["healthy"]
+    assert reloaded.get_key() == "secret-b"
+
+
+def test_unreadable_state_is_ignored(tmp_path):
+    path = tmp_path / "keys.json"
+    path.write_text("{not json")
+
+    assert APIKeyRotator(["a"], state_path=str(path)).get_key() == "a"
+
+
+def test_empty_key_list_is_rejected():
+    with pytest.raises(ValueError):
+        APIKeyRotator([])
+
+
+def test_key_ids_tell_apart_keys_with_the_same_suffix():
+    rotator = APIKeyRotator(["/secrets/sa-one.json", "/secrets/sa-two.json"])
+    first, second = rotator.get_stats()
+
+    assert first["key"] == second["key"] == "...json"
+    assert first["key_id"] != second["key_id"]
+    assert first["key_id"] == APIKeyRotator(["/secrets/sa-one.json"]).get_stats()[0]["key_id"]
@@ -0,0 +1,132 @@
+# test_batch.py
+import asyncio
+import os
+import threading
+from collections import Counter
+
+# config.py requires provider keys at import; these tests never call a provider
+os.environ.setdefault("GOOGLE_API_KEYS", "test")
+os.environ.setdefault("PEXELS_API_KEYS", "test")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("RESUME_ON_STARTUP", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from schemas import ScriptResponse, VideoRequest
+from services import ai_service, batch_service, video_service
+from utils.admission import AdmissionController
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    """
+    A small render queue for the endpoint; jobs block until the test ends.
+    """
+    controller = AdmissionController(max_running=1, max_queued=3)
+    release = threading.Event()
+    controller.block = lambda: release.wait(5)
+    monkeypatch.setattr(main, "admission_controller", controller)
+    # Shared preparation would call Gemini; the endpoint tests only cover admission
+    monkeypatch.setattr(batch_service, "start_batch", lambda batch_id: None)
+    yield controller
+    release.set()
+    controller.shutdown()
+
+
+def batch(*prompts):
+    return {"requests": [{"prompt": prompt, "video_length_seconds": 8} for prompt in prompts]}
+
+
+def test_batch_that_does_not_fit_is_rejected_whole(controller):
+    controller.pause()
+    assert controller.submit("earlier", controller.block)
+    known_batches = set(batch_service.batches)
+    pending_before = main.task_store.count_by_status().get("pending", 0)
+
+    response = TestClient(main.app).post("/generate-videos", json=batch("one", "two", "three", "four"))
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert controller.snapshot()["queued"] == 1
+    assert main.task_store.count_by_status().get("pending", 0) == pending_before
+    assert set(batch_service.batches) == known_batches
+
+
+def test_batch_larger_than_the_queue_is_refused(controller):
+    response = TestClient(main.app).post("/generate-videos", json=batch(*"abcde"))
+
+    assert response.status_code == 413
+
+
+def test_batch_that_fits_is_queued_whole(controller):
+    controller.pause()
+
+    response = TestClient(main.app).post("/generate-videos", json=batch("one", "two", "three"))
+
+    assert response.status_code == 202
+    body = response.json()
+    task_ids = [task["task_id"] for task in body["tasks"]]
+    assert controller.snapshot()["queued"] == 3
+    for task_id in task_ids:
+        status = main.task_store.get(task_id)
+        assert status["status"] == "pending" and status["batch_id"] == body["batch_id"]
+    batch_service.discard_batch(body["batch_id"])
+
+
+def script(title, scenes):
+    return ScriptResponse(
+        title=title,
+        background_music_keywords=["upbeat", "corporate"],
+        scenes=[
+            {"scene_number": n, "media_source": "stock", "visual_prompt": query, "voiceover_text": line, "duration_seconds": 4}
+            for n, (query, line) in enumerate(scenes, start=1)
+        ],
+    )
+
+
+def test_duplicated_queries_are_fetched_once_per_batch(monkeypatch):
+    scripts = {
+        "first": script("First", [("city skyline at night", "Welcome to the city."), ("coffee shop", "Meet us here.")]),
+        "second": script("Second", [("City  Skyline at night", "Welcome to the city."), ("mountain lake", "Or out here.")]),
+    }
+    fetches = Counter()
+
+    async def fetch_media(scene, media_path, orientation):
+        fetches["media:" + scene.visual_prompt.lower().replace("  ", " ")] += 1
+        return media_path
+
+    async def fetch_music(script, scene_duration):
+        fetches["music"] += 1
+        return "music.mp3"
+
+    async def generate_audio(text, output_path, target_duration=None):
+        fetches["voiceover:" + text] += 1
+        return output_path
+
+    monkeypatch.setattr(ai_service, "generate_script", lambda prompt, total_duration_seconds: scripts[prompt])
+    monkeypatch.setattr(ai_service, "generate_audio_async", generate_audio)
+    monkeypatch.setattr(video_service, "_fetch_scene_media", fetch_media)
+    monkeypatch.setattr(video_service, "_fetch_scene_music", fetch_music)
+
+    items = [("task-first", VideoRequest(prompt="first", video_length_seconds=8)),
+             ("task-second", VideoRequest(prompt="second", video_length_seconds=8))]
+    batch_service.register_batch("test-batch", items)
+    try:
+        async def prepare():
+            prepared = batch_service.batches["test-batch"]
+            await batch_service._prepare_batch(prepared)
+            await asyncio.gather(*prepared.assets.fetches.values())
+
+        asyncio.run(prepare())
+
+        assert set(fetches.values()) == {1}
+        assert fetches["media:city skyline at night"] == 1
+        assert fetches["voiceover:Welcome to the city."] == 1
+        summary = batch_service.batch_summary("test-batch")
+        assert summary["assets_requested"] == 12
+        assert summary["assets_unique"] == len(fetches) == 7
+        assert batch_service.get_script("test-batch", 1)[0].title == "Second"
+    finally:
+        batch_service.discard_batch("test-batch")
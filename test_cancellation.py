@@ -0,0 +1,175 @@
+# test_cancellation.py
+import os
+import threading
+import uuid
+
+# config.py requires provider keys at import; these tests never call a provider
+os.environ.setdefault("GOOGLE_API_KEYS", "test")
+os.environ.setdefault("PEXELS_API_KEYS", "test")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("RESUME_ON_STARTUP", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from schemas import ScriptResponse
+from services import ai_service, video_service
+from utils.admission import AdmissionController
+from utils.cancellation import CancellationRegistry, TaskCancelled, check_cancelled, is_cancelled
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    """
+    A render queue that admits jobs but never starts them.
+    """
+    controller = AdmissionController(max_running=1, max_queued=3)
+    controller.pause()
+    monkeypatch.setattr(main, "admission_controller", controller)
+    yield controller
+    controller.shutdown()
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    """
+    Runs run_video_generation against tmp_path with a canned script; tests
+    replace video_service.create_video with the render they need.
+    """
+    monkeypatch.setattr(main, "BASE_TEMP_DIR", str(tmp_path))
+    monkeypatch.setattr(main.storage_manager, "sweep", lambda: None)
+    script = ScriptResponse(title="t", background_music_keywords=["calm"], scenes=[])
+    monkeypatch.setattr(ai_service, "generate_script", lambda prompt, total_duration_seconds: script)
+    return tmp_path
+
+
+def new_task(status: str = "pending") -> str:
+    task_id = uuid.uuid4().hex
+    main.create_task_status(task_id, status, "test")
+    return task_id
+
+
+def status_of(task_id: str) -> str:
+    return main.task_store.get(task_id)["status"]
+
+
+def test_registry_cancel_signals_the_token():
+    registry = CancellationRegistry()
+    token = registry.token_for("a")
+
+    assert registry.cancel("a")
+    assert token.cancelled
+    with pytest.raises(TaskCancelled):
+        token.raise_if_cancelled()
+
+
+def test_registry_cancel_unknown_task_returns_false():
+    assert not CancellationRegistry().cancel("missing")
+
+
+def test_registry_cancel_is_abandoned_when_before_returns_false():
+    registry = CancellationRegistry()
+    token = registry.token_for("a")
+
+    assert not registry.cancel("a", before=lambda: False)
+    assert not token.cancelled
+
+
+def test_cancelling_a_queued_task_removes_it_from_admission(client, controller):
+    task_id = new_task()
+    assert controller.submit(task_id, main.run_video_generation, task_id, "prompt")
+    assert controller.position(task_id) == 1
+
+    response = client.delete(f"/tasks/{task_id}")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+    assert controller.position(task_id) is None
+    assert status_of(task_id) == "cancelled"
+
+
+def test_running_task_stops_at_its_next_checkpoint(client, pipeline, monkeypatch):
+    rendering = threading.Event()
+
+    def create_video(script, task_id, orientation, assets=None, manifest=None):
+        rendering.set()
+        for _ in range(500):
+            if is_cancelled():
+                break
+            threading.Event().wait(0.01)
+        check_cancelled()
+        raise AssertionError("the task was never cancelled")
+
+    monkeypatch.setattr(video_service, "create_video", create_video)
+    task_id = new_task()
+    worker = threading.Thread(target=main.run_video_generation, args=(task_id, "prompt", 8))
+    worker.start()
+    assert rendering.wait(5)
+
+    response = client.delete(f"/tasks/{task_id}")
+    worker.join(5)
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "cancelling"
+    assert status_of(task_id) == "cancelled"
+    assert task_id not in main.cancellation_registry.tokens
+    assert not os.path.exists(pipeline / task_id)
+
+
+def test_cancel_losing_the_race_to_complete_leaves_the_task_complete(client, monkeypatch):
+    task_id = new_task("generating_video")
+    token = main.cancellation_registry.token_for(task_id)
+
+    def finish_first(queued_task_id):
+        # The worker completes between the endpoint's status read and its transition
+        main.set_task_status(task_id, "complete", "Video generation complete.")
+        return False
+
+    monkeypatch.setattr(main.admission_controller, "cancel", finish_first)
+    try:
+        response = client.delete(f"/tasks/{task_id}")
+    finally:
+        main.cancellation_registry.discard(task_id)
+
+    assert response.status_code == 409
+    assert "already finished" in response.json()["detail"]
+    assert status_of(task_id) == "complete"
+    assert not token.cancelled
+
+
+def test_completed_task_has_no_token_when_complete_is_published(pipeline, monkeypatch):
+    monkeypatch.setattr(video_service, "create_video",
+                        lambda script, task_id, orientation, assets=None, manifest=None: str(pipeline / task_id / "final_video.mp4"))
+    published = {}
+    publish = main.progress_broker.publish
+
+    def record(task_id, status, message, **fields):
+        published[status] = task_id in main.cancellation_registry.tokens
+        publish(task_id, status, message, **fields)
+
+    monkeypatch.setattr(main.progress_broker, "publish", record)
+    task_id = new_task()
+
+    main.run_video_generation(task_id, "prompt", 8)
+
+    assert status_of(task_id) == "complete"
+    assert published["generating_video"] is True
+    assert published["complete"] is False
+
+
+def test_repeated_cancel_of_a_cancelling_task_is_accepted(client):
+    task_id = new_task("cancelling")
+    main.cancellation_registry.token_for(task_id)
+    try:
+        response = client.delete(f"/tasks/{task_id}")
+    finally:
+        main.cancellation_registry.discard(task_id)
+
+    assert response.status_code == 202
+    assert status_of(task_id) == "cancelling"
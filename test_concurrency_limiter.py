@@ -0,0 +1,126 @@
+# test_concurrency_limiter.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils.concurrency_limiter import AIMDLimiter, LimiterRegistry
+
+
+def respond(limiter, status_code):
+    with limiter.slot() as permit:
+        permit.record(SimpleNamespace(status_code=status_code))
+
+
+def allow_next_decrease(limiter):
+    # Decreases are rate-limited to one per backoff window
+    limiter.last_decrease_at = 0.0
+
+
+def test_success_grows_the_limit_by_about_one_per_window():
+    limiter = AIMDLimiter("test", initial_limit=4)
+
+    respond(limiter, 200)
+    assert limiter.limit == pytest.approx(4.25)
+
+    for _ in range(3):
+        respond(limiter, 200)
+    assert 4.9 < limiter.limit < 5.0
+
+
+@pytest.mark.parametrize("status_code", [429, 500, 503])
+def test_throttle_and_server_errors_halve_the_limit(status_code):
+    limiter = AIMDLimiter("test", initial_limit=8)
+
+    respond(limiter, status_code)
+
+    assert limiter.limit == 4
+    assert limiter.throttles == 1 and limiter.successes == 0
+
+
+def test_client_errors_do_not_decrease_the_limit():
+    limiter = AIMDLimiter("test", initial_limit=8)
+
+    respond(limiter, 404)
+
+    assert limiter.limit > 8
+
+
+def test_a_burst_of_429s_counts_once_per_backoff_window():
+    limiter = AIMDLimiter("test", initial_limit=8)
+
+    for _ in range(5):
+        respond(limiter, 429)
+
+    assert limiter.limit == 4
+    assert limiter.throttles == 5
+
+
+def test_sdk_quota_errors_decrease_the_limit_and_propagate():
+    limiter = AIMDLimiter("test", initial_limit=8)
+
+    with pytest.raises(RuntimeError):
+        with limiter.slot():
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_latency_spike_decreases_the_limit():
+    limiter = AIMDLimiter("test", initial_limit=8, latency_threshold=2.0)
+
+    limiter.on_success(5.0)
+
+    assert limiter.limit == 4
+
+
+def test_limit_never_drops_below_the_floor():
+    limiter = AIMDLimiter("test", initial_limit=4, min_limit=2)
+
+    for _ in range(5):
+        allow_next_decrease(limiter)
+        respond(limiter, 429)
+
+    assert limiter.limit == 2
+
+
+def test_limit_never_grows_above_the_ceiling():
+    limiter = AIMDLimiter("test", initial_limit=4, max_limit=6)
+
+    for _ in range(100):
+        respond(limiter, 200)
+
+    assert limiter.limit == 6
+
+
+def test_slots_are_bounded_by_the_current_limit():
+    limiter = AIMDLimiter("test", initial_limit=2)
+
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert not limiter.acquire(timeout=0.01)
+
+    limiter.release()
+    assert limiter.try_acquire()
+
+
+def test_async_slot_feeds_back_like_the_sync_one():
+    limiter = AIMDLimiter("test", initial_limit=8)
+
+    async def run():
+        async with limiter.slot_async() as permit:
+            permit.record(SimpleNamespace(status_code=429))
+
+    asyncio.run(run())
+
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
+
+
+def test_registry_shares_one_limiter_per_provider():
+    registry = LimiterRegistry(initial_limit=3)
+
+    assert registry.get("pexels") is registry.get("pexels")
+    assert [snapshot["provider"] for snapshot in registry.snapshot()] == ["pexels"]
+    assert registry.snapshot()[0]["limit"] == 3
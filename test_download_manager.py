@@ -0,0 +1,213 @@
+# test_download_manager.py
+import asyncio
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.async_http_client import AsyncProviderHTTPClient
+from utils.download_manager import DownloadManager
+from utils.http_client import ProviderHTTPClient, RetryPolicy
+
+DATA = bytes(range(256)) * 256  # 64 KiB
+PART_SIZE = 16 * 1024
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """
+    Serves DATA with byte-range and If-Range support and records every Range it was asked for.
+    """
+    etag = '"v1"'
+    ranges = []
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(DATA)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+
+    def do_GET(self):
+        header = self.headers.get("Range")
+        self.ranges.append(header)
+        if_range = self.headers.get("If-Range")
+        if header is None or (if_range is not None and if_range != self.etag):
+            start, end = 0, len(DATA) - 1
+            self.send_response(200)
+        else:
+            first, _, last = header.removeprefix("bytes=").partition("-")
+            start, end = int(first), int(last) if last else len(DATA) - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(DATA)}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(DATA[start:end + 1])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    RangeHandler.ranges = []
+    RangeHandler.etag = '"v1"'
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/clip.mp4"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_manager(min_parallel_size=1, async_http_client=None):
+    retry_policy = RetryPolicy(max_retries=0, backoff_base=0)
+    return DownloadManager(
+        ProviderHTTPClient(retry_policy=retry_policy),
+        async_http_client=async_http_client,
+        part_size=PART_SIZE,
+        buffer_size=4096,
+        min_parallel_size=min_parallel_size,
+    )
+
+
+def write_progress(output, received_parts):
+    """
+    Leaves the .part/.part.json pair an interrupted ranged download would:
+    the first `received_parts` parts done, the rest untouched.
+    """
+    done = received_parts * PART_SIZE
+    with open(f"{output}.part", "wb") as f:
+        f.write(DATA[:done].ljust(len(DATA), b"\0"))
+    parts = [
+        {"start": start, "end": start + PART_SIZE - 1, "received": PART_SIZE if start < done else 0}
+        for start in range(0, len(DATA), PART_SIZE)
+    ]
+    with open(f"{output}.part.json", "w") as f:
+        json.dump({"size": len(DATA), "validator": '"v1"', "parts": parts}, f)
+
+
+def download_async(manager_kwargs, url, output):
+    async def run():
+        client = AsyncProviderHTTPClient(retry_policy=RetryPolicy(max_retries=0, backoff_base=0))
+        try:
+            return await make_manager(async_http_client=client, **manager_kwargs).download_async(url, str(output))
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def test_ranged_download_fetches_every_part(server, tmp_path):
+    output = tmp_path / "clip.mp4"
+
+    assert make_manager().download(server, str(output)) == str(output)
+
+    assert output.read_bytes() == DATA
+    assert sorted(RangeHandler.ranges) == sorted(
+        f"bytes={start}-{start + PART_SIZE - 1}" for start in range(0, len(DATA), PART_SIZE)
+    )
+    assert not os.path.exists(f"{output}.part") and not os.path.exists(f"{output}.part.json")
+
+
+def test_ranged_download_resumes_from_saved_progress(server, tmp_path):
+    output = tmp_path / "clip.mp4"
+    # A previous attempt finished the first part and half of the second
+    with open(f"{output}.part", "wb") as f:
+        f.write(DATA[:PART_SIZE + PART_SIZE // 2].ljust(len(DATA), b"\0"))
+    parts = [
+        {"start": start, "end": start + PART_SIZE - 1, "received": 0}
+        for start in range(0, len(DATA), PART_SIZE)
+    ]
+    parts[0]["received"] = PART_SIZE
+    parts[1]["received"] = PART_SIZE // 2
+    with open(f"{output}.part.json", "w") as f:
+        json.dump({"size": len(DATA), "validator": '"v1"', "parts": parts}, f)
+
+    make_manager().download(server, str(output))
+
+    assert output.read_bytes() == DATA
+    assert sorted(RangeHandler.ranges) == [
+        f"bytes={PART_SIZE + PART_SIZE // 2}-{2 * PART_SIZE - 1}",
+        f"bytes={2 * PART_SIZE}-{3 * PART_SIZE - 1}",
+        f"bytes={3 * PART_SIZE}-{4 * PART_SIZE - 1}",
+    ]
+
+
+def test_ranged_download_starts_over_when_the_remote_file_changed(server, tmp_path):
+    output = tmp_path / "clip.mp4"
+    with open(f"{output}.part", "wb") as f:
+        f.write(b"\xff" * len(DATA))
+    with open(f"{output}.part.json", "w") as f:
+        json.dump({"size": len(DATA), "validator": '"old"', "parts": [
+            {"start": 0, "end": len(DATA) - 1, "received": len(DATA)},
+        ]}, f)
+
+    make_manager().download(server, str(output))
+
+    assert output.read_bytes() == DATA
+    assert len(RangeHandler.ranges) == len(DATA) // PART_SIZE
+
+
+def test_single_stream_download_resumes_with_an_open_range(server, tmp_path):
+    output = tmp_path / "clip.mp4"
+    with open(f"{output}.part", "wb") as f:
+        f.write(DATA[:1000])
+
+    make_manager(min_parallel_size=len(DATA) + 1).download(server, str(output))
+
+    assert output.read_bytes() == DATA
+    assert RangeHandler.ranges == ["bytes=1000-"]
+
+
+def test_single_stream_download_starts_over_when_the_remote_file_changed(server, tmp_path):
+    output = tmp_path / "clip.mp4"
+    with open(f"{output}.part", "wb") as f:
+        f.write(b"\xff" * 1000)
+    RangeHandler.etag = '"v2"'
+    # The partial file belongs to v1; the file changes to v2 between the probe and the resume
+    manager = make_manager(min_parallel_size=len(DATA) + 1)
+    probe = manager._probe
+    manager._probe = lambda *args: (*probe(*args)[:2], '"v1"')
+
+    manager.download(server, str(output))
+
+    assert output.read_bytes() == DATA
+    assert RangeHandler.ranges == ["bytes=1000-"]
+
+
+def test_single_stream_download_without_a_validator_starts_over(server, tmp_path):
+    output = tmp_path / "clip.mp4"
+    with open(f"{output}.part", "wb") as f:
+        f.write(b"\xff" * 1000)
+    manager = make_manager(min_parallel_size=len(DATA) + 1)
+    probe = manager._probe
+    manager._probe = lambda *args: (*probe(*args)[:2], None)
+
+    manager.download(server, str(output))
+
+    assert output.read_bytes() == DATA
+    assert RangeHandler.ranges == [None]
+
+
+def test_async_ranged_download_resumes_from_saved_progress(server, tmp_path):
+    output = tmp_path / "clip.mp4"
+    write_progress(output, received_parts=3)
+
+    assert download_async({}, server, output) == str(output)
+
+    assert output.read_bytes() == DATA
+    assert RangeHandler.ranges == [f"bytes={3 * PART_SIZE}-{4 * PART_SIZE - 1}"]
+    assert not os.path.exists(f"{output}.part.json")
+
+
+def test_async_single_stream_download_resumes_with_if_range(server, tmp_path):
+    output = tmp_path / "clip.mp4"
+    with open(f"{output}.part", "wb") as f:
+        f.write(DATA[:1000])
+
+    download_async({"min_parallel_size": len(DATA) + 1}, server, output)
+
+    assert output.read_bytes() == DATA
+    assert RangeHandler.ranges == ["bytes=1000-"]
@@ -0,0 +1,111 @@
+# test_file_delivery.py
+import os
+import shutil
+import time
+import uuid
+
+# config.py requires provider keys at import; these tests never call a provider
+os.environ.setdefault("GOOGLE_API_KEYS", "test")
+os.environ.setdefault("PEXELS_API_KEYS", "test")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("RESUME_ON_STARTUP", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from utils.file_delivery import http_date, is_not_modified
+
+VIDEO = bytes(range(256)) * 40  # 10 KiB
+
+
+@pytest.fixture
+def video():
+    """
+    A finished task with its final video on disk; yields its download URL.
+    """
+    task_id = str(uuid.uuid4())
+    task_dir = os.path.join(main.BASE_TEMP_DIR, task_id)
+    os.makedirs(task_dir)
+    with open(os.path.join(task_dir, main.FINAL_VIDEO), "wb") as f:
+        f.write(VIDEO)
+    main.task_store.create(task_id, "complete", "Done.")
+    yield f"/download/{task_id}/{main.FINAL_VIDEO}"
+    main.task_store.delete(task_id)
+    shutil.rmtree(task_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "DOWNLOAD_ACCEL_REDIRECT_PREFIX", "")
+    return TestClient(main.app)
+
+
+def test_full_download_carries_validators(client, video):
+    response = client.get(video)
+
+    assert response.status_code == 200
+    assert response.content == VIDEO
+    assert response.headers["ETag"].startswith('"')
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert "Last-Modified" in response.headers
+
+
+def test_matching_if_none_match_returns_304(client, video):
+    etag = client.get(video).headers["ETag"]
+
+    response = client.get(video, headers={"If-None-Match": f'"other", W/{etag}'})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_stale_if_none_match_returns_the_file(client, video):
+    response = client.get(video, headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == VIDEO
+
+
+def test_if_modified_since_returns_304_unless_the_file_is_newer(client, video):
+    last_modified = client.get(video).headers["Last-Modified"]
+
+    assert client.get(video, headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(video, headers={"If-Modified-Since": http_date(time.time() - 3600)}).status_code == 200
+
+
+def test_range_returns_206_with_content_range(client, video):
+    response = client.get(video, headers={"Range": "bytes=100-199"})
+
+    assert response.status_code == 206
+    assert response.content == VIDEO[100:200]
+    assert response.headers["Content-Range"] == f"bytes 100-199/{len(VIDEO)}"
+
+
+def test_suffix_range_returns_the_tail(client, video):
+    response = client.get(video, headers={"Range": "bytes=-16"})
+
+    assert response.status_code == 206
+    assert response.content == VIDEO[-16:]
+
+
+def test_range_past_the_end_returns_416(client, video):
+    response = client.get(video, headers={"Range": f"bytes={len(VIDEO)}-{len(VIDEO) + 10}"})
+
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(VIDEO)}"
+
+
+def test_only_final_videos_of_known_tasks_are_served(client, video):
+    task_id = video.split("/")[2]
+
+    assert client.get(f"/download/{task_id}/manifest.json").status_code == 404
+    assert client.get(f"/download/{uuid.uuid4()}/{main.FINAL_VIDEO}").status_code == 404
+
+
+def test_is_not_modified_prefers_if_none_match():
+    headers = {"if-none-match": '"new"', "if-modified-since": http_date(time.time())}
+
+    assert not is_not_modified(headers, '"old"', time.time() - 3600)
+    assert is_not_modified({"if-none-match": "*"}, '"old"', 0)
@@ -0,0 +1,69 @@
+# test_idempotency.py
+import os
+
+# config.py requires provider keys at import; these tests never call a provider
+os.environ.setdefault("GOOGLE_API_KEYS", "test")
+os.environ.setdefault("PEXELS_API_KEYS", "test")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("RESUME_ON_STARTUP", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from schemas import VideoRequest
+from utils.idempotency import IdempotencyConflict, IdempotencyIndex, request_fingerprint
+
+
+def test_fingerprint_ignores_case_and_whitespace():
+    assert request_fingerprint(VideoRequest(prompt="Sunset  Beach")) == request_fingerprint(VideoRequest(prompt="sunset beach"))
+    assert request_fingerprint(VideoRequest(prompt="sunset beach")) != request_fingerprint(VideoRequest(prompt="sunset beach", priority="high"))
+
+
+def test_duplicate_submission_returns_the_existing_task():
+    index = IdempotencyIndex()
+
+    assert index.claim("first", "fp") is None
+    assert index.claim("second", "fp") == "first"
+    assert index.claim("third", "fp", idempotency_key="key") == "first"
+    assert index.claim("fourth", "other-fp") is None
+
+
+def test_reused_key_with_a_different_request_conflicts():
+    index = IdempotencyIndex()
+    assert index.claim("first", "fp-a", idempotency_key="key") is None
+
+    with pytest.raises(IdempotencyConflict):
+        index.claim("second", "fp-b", idempotency_key="key")
+
+
+def test_failed_tasks_are_not_reused():
+    index = IdempotencyIndex()
+    assert index.claim("failed", "fp", idempotency_key="key") is None
+
+    assert index.claim("retry", "fp", idempotency_key="key", is_reusable=lambda task_id: False) is None
+    assert index.claim("third", "fp", idempotency_key="key", is_reusable=lambda task_id: True) == "retry"
+
+
+def test_release_frees_the_slot():
+    index = IdempotencyIndex()
+    index.claim("rejected", "fp", idempotency_key="key")
+    index.release("rejected")
+
+    assert index.claim("next", "fp", idempotency_key="key") is None
+
+
+def test_generate_video_rejects_a_conflicting_idempotency_key(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main.admission_controller, "submit", lambda *args, **kwargs: True)
+    client = TestClient(main.app)
+    headers = {"Idempotency-Key": "conflict-test"}
+
+    first = client.post("/generate-video", json={"prompt": "a quiet forest"}, headers=headers)
+    replay = client.post("/generate-video", json={"prompt": "A quiet  forest"}, headers=headers)
+    conflict = client.post("/generate-video", json={"prompt": "a busy city"}, headers=headers)
+
+    assert first.status_code == 202
+    assert replay.status_code == 200
+    assert replay.json()["task_id"] == first.json()["task_id"]
+    assert conflict.status_code == 422
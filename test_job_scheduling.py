@@ -0,0 +1,98 @@
+# test_job_scheduling.py
+import threading
+
+import pytest
+
+from utils.admission import AdmissionController
+
+
+@pytest.fixture
+def controller():
+    controller = AdmissionController(max_running=1, max_queued=10, default_job_seconds=60, priority_aging_seconds=300)
+    release = threading.Event()
+    controller.block = lambda: release.wait(5)
+    yield controller
+    release.set()
+    controller.shutdown()
+
+
+def age(controller, task_id, seconds):
+    """
+    Pretends the queued job has been waiting `seconds` longer than it has.
+    """
+    for job in controller.queue:
+        if job.task_id == task_id:
+            job.enqueued_at -= seconds
+
+
+def test_shortest_job_starts_first_within_a_priority_class():
+    controller = AdmissionController(max_running=1, max_queued=10)
+    started = []
+    done = threading.Event()
+    try:
+        controller.pause()
+        for task_id, cost in (("long", 300), ("medium", 120), ("short", 30)):
+            controller.submit(task_id, started.append, task_id, cost=cost)
+        controller.submit("last", lambda: (started.append("last"), done.set()), cost=900)
+        controller.resume()
+
+        assert done.wait(5)
+        assert started == ["short", "medium", "long", "last"]
+    finally:
+        controller.shutdown()
+
+
+def test_priority_class_outranks_cost(controller):
+    assert controller.submit("running", controller.block)
+    assert controller.submit("long", controller.block, cost=300)
+    assert controller.submit("short", controller.block, cost=30)
+    assert controller.submit("urgent", controller.block, priority="high", cost=600)
+    assert controller.submit("background", controller.block, priority="low", cost=10)
+
+    assert [controller.position(t) for t in ("urgent", "short", "long", "background")] == [1, 2, 3, 4]
+
+
+def test_waiting_counts_against_cost(controller):
+    assert controller.submit("running", controller.block)
+    assert controller.submit("long", controller.block, cost=300)
+    assert controller.submit("short", controller.block, cost=30)
+
+    age(controller, "long", 280)
+
+    assert controller.position("long") == 1
+
+
+def test_starved_low_priority_job_is_promoted_after_the_aging_interval(controller):
+    assert controller.submit("running", controller.block)
+    assert controller.submit("starved", controller.block, priority="low", cost=900)
+    assert controller.submit("normal", controller.block, cost=30)
+    assert controller.submit("urgent", controller.block, priority="high", cost=600)
+    assert controller.position("starved") == 3
+
+    # One interval: low -> normal, but still the longest normal job
+    age(controller, "starved", 300)
+    assert controller.position("starved") == 3
+
+    # Two intervals: promoted to high, and its aged cost (900 - 600) beats the fresh high job
+    age(controller, "starved", 300)
+    assert controller.position("starved") == 1
+
+
+def test_aging_can_be_disabled():
+    controller = AdmissionController(max_running=1, max_queued=10, priority_aging_seconds=0)
+    release = threading.Event()
+    try:
+        controller.submit("running", release.wait, 5)
+        controller.submit("starved", release.wait, 5, priority="low", cost=900)
+        controller.submit("urgent", release.wait, 5, priority="high", cost=900)
+        age(controller, "starved", 10_000)
+
+        assert controller.position("starved") == 2
+    finally:
+        release.set()
+        controller.shutdown()
+
+
+def test_unknown_priority_is_rejected(controller):
+    with pytest.raises(ValueError):
+        controller.submit("task", controller.block, priority="urgent")
@@ -0,0 +1,59 @@
+# test_media_service.py
+import asyncio
+import os
+
+# config.py requires provider keys at import; these tests never call a provider
+os.environ.setdefault("GOOGLE_API_KEYS", "test")
+os.environ.setdefault("PEXELS_API_KEYS", "test")
+
+import pytest
+
+from services.media_service import _alternate_queries
+from utils.cancellation import TaskCancelled
+
+
+def test_alternate_queries_keep_nouns_with_adjective_like_endings():
+    assert _alternate_queries("elephant walking in restaurant")[0] == "elephant walking restaurant"
+    assert _alternate_queries("student with parent in traffic")[0] == "student parent traffic"
+
+
+def test_alternate_queries_drop_styling_words():
+    assert _alternate_queries("Cinematic aerial shot of a misty mountain lake at sunrise") == [
+        "mountain lake sunrise",
+        "lake sunrise",
+        "mountain lake",
+    ]
+
+
+def test_alternate_queries_never_repeat_the_original():
+    assert "mountain lake" not in _alternate_queries("mountain lake")
+    assert _alternate_queries("a cinematic shot") == []
+
+
+def test_hedged_search_falls_back_when_the_primary_query_raises(monkeypatch):
+    from services import media_service
+
+    async def search(query, orientation="horizontal", duration_seconds=None):
+        if query == "cinematic mountain lake":
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")
+        return f"https://videos.example/{query.replace(' ', '-')}.mp4"
+
+    monkeypatch.setattr(media_service, "_search_pexels", search)
+    monkeypatch.setattr(media_service.pexels_key_rotator, "seconds_until_available", lambda: 0.0)
+
+    link = asyncio.run(media_service._search_pexels_hedged("cinematic mountain lake"))
+
+    # Whichever alternate answers first wins
+    assert link in ("https://videos.example/mountain-lake.mp4", "https://videos.example/mountain.mp4")
+
+
+def test_hedged_search_propagates_cancellation(monkeypatch):
+    from services import media_service
+
+    async def search(query, orientation="horizontal", duration_seconds=None):
+        raise TaskCancelled("Task was cancelled")
+
+    monkeypatch.setattr(media_service, "_search_pexels", search)
+
+    with pytest.raises(TaskCancelled):
+        asyncio.run(media_service._search_pexels_hedged("cinematic mountain lake"))
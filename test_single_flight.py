@@ -0,0 +1,75 @@
+# test_single_flight.py
+import threading
+import time
+
+import pytest
+
+from utils.cancellation import CancellationToken, TaskCancelled, current_token
+from utils.single_flight import SingleFlight, normalize_key
+
+
+def test_normalize_key_collapses_case_and_whitespace():
+    assert normalize_key("Sunset  Beach ", 5) == normalize_key("sunset beach", 5)
+    assert normalize_key(["A", "b"]) == "a|b"
+
+
+def test_concurrent_callers_share_one_call():
+    group = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "clip.mp4"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(group.do("key", fetch)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(group.do("key", fetch)))
+    follower.start()
+    time.sleep(0.2)  # let the follower start waiting on the leader's call
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("clip.mp4", False), ("clip.mp4", True)]
+    assert group.in_flight() == 0
+
+
+def test_follower_retries_when_the_leader_task_is_cancelled():
+    group = SingleFlight()
+    leader_token = CancellationToken("leader")
+    started = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        if len(calls) == 1:
+            started.set()
+            leader_token.event.wait(5)
+            leader_token.raise_if_cancelled()
+        return "clip.mp4"
+
+    def lead():
+        current_token.set(leader_token)
+        with pytest.raises(TaskCancelled):
+            group.do("key", fetch)
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait(5)
+    follower_result = []
+    follower = threading.Thread(target=lambda: follower_result.append(group.do("key", fetch)))
+    follower.start()
+    time.sleep(0.2)
+    leader_token.cancel()
+    leader.join(5)
+    follower.join(5)
+
+    assert follower_result == [("clip.mp4", False)]
+    assert len(calls) == 2
+
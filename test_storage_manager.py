@@ -0,0 +1,41 @@
+# test_storage_manager.py
+import os
+import time
+
+from utils.storage_manager import StorageManager
+
+
+def make_tree(tmp_path):
+    base = tmp_path / "temp_files"
+    music = base / "music_cache"
+    for task_id, size, age in (("old-task", 100, 7200), ("new-task", 60, 0)):
+        task_dir = base / task_id
+        task_dir.mkdir(parents=True)
+        (task_dir / "final_video.mp4").write_bytes(b"\0" * size)
+        mtime = time.time() - age
+        os.utime(task_dir / "final_video.mp4", (mtime, mtime))
+        os.utime(task_dir, (mtime, mtime))
+    music.mkdir()
+    (music / "track.mp3").write_bytes(b"\0" * 40)
+    return str(base), str(music)
+
+
+def test_sweep_records_the_usage_it_leaves(tmp_path):
+    base, music = make_tree(tmp_path)
+    manager = StorageManager(base, music, final_retention_seconds=0)
+    assert manager.swept_usage is None
+
+    assert manager.sweep() == []
+
+    assert manager.swept_usage["task_bytes"] == 160
+    assert manager.swept_usage["music_cache_bytes"] == 40
+
+
+def test_swept_usage_excludes_evicted_entries(tmp_path):
+    base, music = make_tree(tmp_path)
+    manager = StorageManager(base, music, final_retention_seconds=3600, grace_seconds=60)
+
+    assert manager.sweep() == [os.path.join(base, "old-task")]
+
+    assert manager.swept_usage["task_bytes"] == 60
+    assert manager.swept_usage["task_bytes"] + manager.swept_usage["music_cache_bytes"] == manager.usage()["used_bytes"]
@@ -0,0 +1,104 @@
+# test_task_store.py
+import threading
+import time
+
+import pytest
+
+from utils.task_store import InMemoryTaskStore, SQLiteTaskStore, TaskStore, create_task_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return create_task_store(request.param, path=str(tmp_path / "tasks.db"), ttl_seconds=60)
+
+
+def test_task_store_is_abstract():
+    with pytest.raises(TypeError):
+        TaskStore()
+
+
+def test_update_keeps_fields_it_was_not_given(store):
+    store.create("task", "pending", "Queued.", priority="high", batch_id="batch")
+
+    status = store.update("task", "processing", "Rendering.", progress=40)
+
+    assert status["priority"] == "high" and status["batch_id"] == "batch" and status["progress"] == 40
+    assert store.get("task") == status
+    assert store.update("task", "processing", "Rendering.", progress=80)["progress"] == 80
+
+
+def test_transition_applies_only_from_the_given_statuses(store):
+    store.create("task", "pending", "Queued.", priority="high")
+
+    assert not store.transition("task", ("processing",), "complete", "Done.")
+    assert store.get("task")["status"] == "pending"
+
+    assert store.transition("task", ("pending", "processing"), "complete", "Done.", video_filename="task/final_video.mp4")
+    status = store.get("task")
+    assert status["status"] == "complete" and status["priority"] == "high" and status["video_filename"] == "task/final_video.mp4"
+
+    assert not store.transition("missing", ("pending",), "complete", "Done.")
+
+
+def test_only_one_concurrent_transition_wins(store):
+    store.create("task", "pending", "Queued.")
+    results = []
+    barrier = threading.Barrier(8)
+
+    def claim(worker):
+        barrier.wait()
+        results.append(store.transition("task", ("pending",), "processing", "Claimed.", worker=worker))
+
+    threads = [threading.Thread(target=claim, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert store.get("task")["worker"] in range(8)
+
+
+def test_list_by_status_returns_oldest_first(store):
+    for task_id in ("first", "second", "third"):
+        store.create(task_id, "pending", "Queued.")
+        time.sleep(0.001)
+    store.create("running", "processing", "Rendering.")
+    store.transition("second", ("pending",), "processing", "Rendering.")
+
+    pending = store.list_by_status("pending")
+    assert [task["task_id"] for task in pending] == ["first", "third"]
+    assert pending[0]["message"] == "Queued."
+    assert [task["task_id"] for task in store.list_by_status("processing", limit=1)] == ["second"]
+
+
+def test_update_of_unknown_task_returns_none(store):
+    assert store.update("missing", "processing", "Rendering.") is None
+    assert store.get("missing") is None
+
+
+def test_reads_return_copies(store):
+    store.create("task", "pending", "Queued.")
+    store.get("task")["status"] = "changed"
+
+    assert store.get("task")["status"] == "pending"
+
+
+def test_only_finished_tasks_expire(store):
+    store.ttl_seconds = 0.01
+    store.create("running", "processing", "Rendering.")
+    store.create("done", "processing", "Rendering.")
+    store.update("done", "complete", "Done.")
+    time.sleep(0.05)
+
+    assert store.get("done") is None
+    assert store.purge_expired() == ["done"]
+    assert store.count_by_status() == {"processing": 1}
+
+
+def test_sqlite_store_survives_a_restart(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    SQLiteTaskStore(path).create("task", "pending", "Queued.", priority="low")
+
+    assert SQLiteTaskStore(path).get("task")["priority"] == "low"
+    assert isinstance(create_task_store(), InMemoryTaskStore)
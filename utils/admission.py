@@ -0,0 +1,300 @@
+# utils/admission.py
+import math
+import threading
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+# Priority classes, most urgent first
+PRIORITIES = ("high", "normal", "low")
+
+
+class JobCostModel:
+    """
+    Rough render time of a job in seconds, from what is known when it is
+    queued: the video length, the orientation (vertical output means
+    cropping and rescaling mostly landscape stock footage) and the number
+    of Veo-generated scenes, which dominate when present.
+
+    The scene mix is only known once the script exists (batches, resumed
+    tasks); before that `expected_ai_scenes` is assumed.
+    """
+    def __init__(self, base_seconds: float = 20.0, seconds_per_video_second: float = 4.0,
+                 vertical_factor: float = 1.15, seconds_per_ai_scene: float = 90.0, expected_ai_scenes: float = 0.0):
+        self.base_seconds = base_seconds
+        self.seconds_per_video_second = seconds_per_video_second
+        self.vertical_factor = vertical_factor
+        self.seconds_per_ai_scene = seconds_per_ai_scene
+        self.expected_ai_scenes = expected_ai_scenes
+
+    def estimate(self, video_length_seconds: float, orientation: str = "horizontal", ai_scenes: int = None) -> float:
+        """
+        Args:
+            ai_scenes: Number of "ai_generated" scenes, if the script is known.
+
+        Returns:
+            Estimated job duration in seconds.
+        """
+        render = self.seconds_per_video_second * video_length_seconds
+        if orientation == "vertical":
+            render *= self.vertical_factor
+        if ai_scenes is None:
+            ai_scenes = self.expected_ai_scenes
+        return self.base_seconds + render + self.seconds_per_ai_scene * ai_scenes
+
+    def estimate_script(self, script, orientation: str = "horizontal") -> float:
+        """
+        Estimate for a job whose script (a ScriptResponse) is already known.
+        """
+        ai_scenes = sum(1 for scene in script.scenes if scene.media_source.lower() == "ai_generated")
+        length = sum(scene.duration_seconds for scene in script.scenes)
+        return self.estimate(length, orientation, ai_scenes)
+
+
+class _Job:
+    """
+    A queued render job.
+    """
+    def __init__(self, task_id: str, fn, args: tuple, kwargs: dict, priority: str, cost: float, seq: int):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}; expected one of {PRIORITIES}")
+        self.task_id = task_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.cost = cost
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Bounded admission and dispatch for render jobs.
+
+    At most `max_running` jobs execute at once (each on its own worker
+    thread) and at most `max_queued` wait behind them. A job submitted
+    when both are full is rejected, and retry_after() says when a slot
+    is expected to open, based on a moving average of job durations.
+
+    Waiting jobs start in order of priority class, then shortest estimated
+    cost first, so a short preview doesn't wait behind long renders. To
+    keep long or low-priority jobs from starving, waiting counts against
+    a job's cost second for second, and every `priority_aging_seconds`
+    of waiting promotes it one priority class.
+
+    Limits are per process; run one API worker per render node, or size
+    the limits per worker.
+    """
+    def __init__(self, max_running: int = 2, max_queued: int = 20, default_job_seconds: float = 180.0,
+                 priority_aging_seconds: float = 300.0):
+        self.max_running = max(1, max_running)
+        self.max_queued = max(0, max_queued)
+        self.avg_job_seconds = default_job_seconds
+        self.default_job_seconds = default_job_seconds
+        self.priority_aging_seconds = priority_aging_seconds
+        self.queue = []        # _Job, in arrival order (see _ordered for dispatch order)
+        self.running = {}      # task_id -> started_at
+        self.completed = 0
+        self.rejected = 0
+        self.paused = False
+        self.first_job_seconds = None   # the process's first job (pays any cold start)
+        self.warm_avg_job_seconds = None  # moving average of every later job
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_running, thread_name_prefix="render")
+
+    def submit(self, task_id: str, fn, *args, priority: str = "normal", cost: float = None, **kwargs) -> bool:
+        """
+        Admits a job and starts it when a worker is free and it is next in line.
+
+        Args:
+            priority: One of PRIORITIES.
+            cost: Estimated duration in seconds (see JobCostModel); defaults
+                to the controller's default job duration.
+
+        Returns:
+            False if the job was rejected because the queue is full.
+        """
+        with self.lock:
+            if len(self.running) >= self.max_running and len(self.queue) >= self.max_queued:
+                self.rejected += 1
+                return False
+            self.queue.append(self._job(task_id, fn, args, kwargs, priority, cost))
+            self._dispatch()
+        return True
+
+    def submit_many(self, jobs: list) -> bool:
+        """
+        Admits a group of jobs all-or-nothing (a batch is never partially queued).
+
+        Args:
+            jobs: [(task_id, fn, args, kwargs, priority, cost)]
+
+        Returns:
+            False if the group does not fit in the free running + queue slots.
+        """
+        with self.lock:
+            free = (self.max_running + self.max_queued) - (len(self.running) + len(self.queue))
+            if len(jobs) > free:
+                self.rejected += 1
+                return False
+            for task_id, fn, args, kwargs, priority, cost in jobs:
+                self.queue.append(self._job(task_id, fn, args, kwargs, priority, cost))
+            self._dispatch()
+        return True
+
+    def update_cost(self, task_id: str, cost: float) -> bool:
+        """
+        Replaces a waiting job's cost estimate, e.g. once its script is known.
+
+        Returns:
+            False if the job isn't queued.
+        """
+        with self.lock:
+            for job in self.queue:
+                if job.task_id == task_id:
+                    job.cost = cost
+                    return True
+        return False
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        Removes a job that is still waiting in the queue.
+
+        Returns:
+            False if the job isn't queued (it is running, finished or unknown).
+        """
+        with self.lock:
+            for job in self.queue:
+                if job.task_id == task_id:
+                    self.queue.remove(job)
+                    return True
+        return False
+
+    def pause(self):
+        """
+        Keeps admitting jobs but doesn't start any until resume() (e.g. during warm-up).
+        """
+        with self.lock:
+            self.paused = True
+
+    def resume(self):
+        with self.lock:
+            self.paused = False
+            self._dispatch()
+
+    def capacity(self) -> int:
+        """
+        Total jobs this controller can hold at once (running + queued).
+        """
+        return self.max_running + self.max_queued
+
+    def position(self, task_id: str) -> int | None:
+        """
+        1-based position of a waiting job in dispatch order, 0 if it is
+        running, or None if this controller doesn't know it. Positions can
+        change as shorter or higher-priority jobs arrive.
+        """
+        with self.lock:
+            if task_id in self.running:
+                return 0
+            for index, job in enumerate(self._ordered()):
+                if job.task_id == task_id:
+                    return index + 1
+        return None
+
+    def estimated_start_seconds(self, position: int) -> float:
+        """
+        Rough wait before the job at queue `position` starts.
+        """
+        with self.lock:
+            return self._estimate_slot_free(position)
+
+    def retry_after(self, slots: int = 1) -> int:
+        """
+        Seconds until a rejected client should retry: when enough running jobs
+        are expected to finish for `slots` more jobs to fit.
+        """
+        with self.lock:
+            missing = slots - ((self.max_running + self.max_queued) - (len(self.running) + len(self.queue)))
+            return max(1, math.ceil(self._estimate_slot_free(max(1, missing))))
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "running": len(self.running),
+                "queued": len(self.queue),
+                "queued_by_priority": {
+                    priority: sum(1 for job in self.queue if job.priority == priority) for priority in PRIORITIES
+                },
+                "max_running": self.max_running,
+                "max_queued": self.max_queued,
+                "avg_job_seconds": round(self.avg_job_seconds, 1),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "paused": self.paused,
+                "first_job_seconds": round(self.first_job_seconds, 1) if self.first_job_seconds is not None else None,
+                "warm_avg_job_seconds": round(self.warm_avg_job_seconds, 1) if self.warm_avg_job_seconds is not None else None,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- Internals (called with self.lock held) ---
+
+    def _job(self, task_id, fn, args, kwargs, priority, cost) -> _Job:
+        return _Job(task_id, fn, args, kwargs, priority, self.default_job_seconds if cost is None else cost, next(self.seq))
+
+    def _sort_key(self, job: _Job, now: float) -> tuple:
+        """
+        (effective priority class, aged cost, arrival): lower starts first.
+        """
+        waited = now - job.enqueued_at
+        rank = PRIORITIES.index(job.priority)
+        if self.priority_aging_seconds > 0:
+            rank = max(0, rank - int(waited // self.priority_aging_seconds))
+        return rank, job.cost - waited, job.seq
+
+    def _ordered(self) -> list:
+        now = time.monotonic()
+        return sorted(self.queue, key=lambda job: self._sort_key(job, now))
+
+    def _dispatch(self):
+        while self.queue and not self.paused and len(self.running) < self.max_running:
+            now = time.monotonic()
+            job = min(self.queue, key=lambda job: self._sort_key(job, now))
+            self.queue.remove(job)
+            self.running[job.task_id] = now
+            self.executor.submit(self._run, job.task_id, job.fn, job.args, job.kwargs)
+
+    def _run(self, task_id, fn, args, kwargs):
+        try:
+            fn(*args, **kwargs)
+        finally:
+            with self.lock:
+                started_at = self.running.pop(task_id, None)
+                if started_at is not None:
+                    duration = time.monotonic() - started_at
+                    self.avg_job_seconds = 0.8 * self.avg_job_seconds + 0.2 * duration
+                    if self.first_job_seconds is None:
+                        self.first_job_seconds = duration
+                    elif self.warm_avg_job_seconds is None:
+                        self.warm_avg_job_seconds = duration
+                    else:
+                        self.warm_avg_job_seconds = 0.8 * self.warm_avg_job_seconds + 0.2 * duration
+                    self.completed += 1
+                self._dispatch()
+
+    def _estimate_slot_free(self, position: int) -> float:
+        """
+        When the job at queue `position` can start: running jobs finish in
+        order of their expected remaining time, then every later slot takes
+        one average job duration per max_running jobs ahead of it.
+        """
+        now = time.monotonic()
+        remaining = sorted(max(0.0, self.avg_job_seconds - (now - started)) for started in self.running.values())
+        if len(remaining) < self.max_running:
+            return 0.0
+        rounds, index = divmod(position - 1, self.max_running)
+        return remaining[index] + rounds * self.avg_job_seconds
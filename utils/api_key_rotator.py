@@ -1,24 +1,204 @@
 # utils/api_key_rotator.py
+import hashlib
+import json
+import os
 import threading
+import time
+from collections import deque
 
 class APIKeyRotator:
     """
     A thread-safe class to rotate through a list of API keys.
     This allows us to distribute requests across multiple free-tier keys
     to avoid rate-limiting.
+
+    The rotator is health-aware: callers report each key's outcome
+    (success, 429, other error) and the rotator skips keys that are
+    cooling down after a 429, preferring the least-recently-limited
+    healthy key. Per-key stats can be read for monitoring and optionally
+    persisted so cooldowns survive a restart.
     """
-    def __init__(self, api_keys: list[str]):
+    def __init__(
+        self,
+        api_keys: list[str],
+        default_cooldown: float = 60.0,
+        error_window: int = 50,
+        max_error_rate: float = 0.5,
+        state_path: str = None,
+    ):
         if not api_keys:
             raise ValueError("API keys list cannot be empty.")
         self.api_keys = api_keys
         self.current_index = 0
         self.lock = threading.Lock()
+        self.default_cooldown = default_cooldown
+        self.max_error_rate = max_error_rate
+        self.state_path = state_path
+        self.key_state = {
+            key: {
+                "requests": 0,
+                "successes": 0,
+                "errors": 0,
+                "rate_limited": 0,
+                "last_rate_limited_at": None,
+                "cooldown_until": 0.0,
+                "recent": deque(maxlen=error_window),  # True = error, False = success
+            }
+            for key in api_keys
+        }
+        self._load_state()
 
     def get_key(self) -> str:
         """
-        Atomically gets the next API key from the list.
+        Atomically gets the next API key to use.
+
+        Keys in cooldown (after a 429 or a run of errors) are skipped. Among
+        the healthy keys the least-recently-limited one wins, ties are broken
+        in round-robin order. If every key is cooling down, the one that
+        becomes available soonest is returned.
+        """
+        with self.lock:
+            now = time.time()
+            num_keys = len(self.api_keys)
+            ordered = [(self.current_index + offset) % num_keys for offset in range(num_keys)]
+
+            healthy = [i for i in ordered if self._is_healthy(self.api_keys[i], now)]
+            if healthy:
+                # min() keeps the first of equal candidates, i.e. round-robin order
+                index = min(healthy, key=lambda i: self.key_state[self.api_keys[i]]["last_rate_limited_at"] or 0.0)
+            else:
+                index = min(ordered, key=lambda i: self.key_state[self.api_keys[i]]["cooldown_until"])
+
+            self.current_index = (index + 1) % num_keys
+            key = self.api_keys[index]
+            self.key_state[key]["requests"] += 1
+            return key
+
+    def report_success(self, key: str):
+        """
+        Records a successful request made with `key`.
+        """
+        with self.lock:
+            state = self.key_state.get(key)
+            if state is None:
+                return
+            state["successes"] += 1
+            state["recent"].append(False)
+
+    def report_error(self, key: str):
+        """
+        Records a failed request (other than a rate limit) made with `key`.
+        """
+        with self.lock:
+            state = self.key_state.get(key)
+            if state is None:
+                return
+            state["errors"] += 1
+            state["recent"].append(True)
+            # A key that keeps failing gets benched like a rate-limited one, then starts afresh
+            if len(state["recent"]) >= 5 and self._error_rate(state) >= self.max_error_rate:
+                state["cooldown_until"] = max(state["cooldown_until"], time.time() + self.default_cooldown)
+                state["recent"].clear()
+
+    def report_rate_limited(self, key: str, retry_after: float = None):
+        """
+        Records a 429 for `key` and puts it into cooldown for Retry-After
+        seconds (or the default cooldown if the upstream didn't say).
+        """
+        with self.lock:
+            state = self.key_state.get(key)
+            if state is None:
+                return
+            now = time.time()
+            cooldown = retry_after if retry_after is not None else self.default_cooldown
+            state["rate_limited"] += 1
+            state["last_rate_limited_at"] = now
+            state["cooldown_until"] = max(state["cooldown_until"], now + cooldown)
+            state["recent"].append(True)
+            self._save_state()
+
+    def seconds_until_available(self) -> float:
+        """
+        How long until at least one key is out of cooldown (0 if one is available now).
         """
         with self.lock:
-            key = self.api_keys[self.current_index]
-            self.current_index = (self.current_index + 1) % len(self.api_keys)
-            return key
\ No newline at end of file
+            now = time.time()
+            return max(0.0, min(state["cooldown_until"] for state in self.key_state.values()) - now)
+
+    def get_stats(self) -> list[dict]:
+        """
+        Returns per-key usage and health stats for monitoring.
+        Keys are masked to their last 4 characters for display; `key_id`
+        is a stable hash that tells keys apart without revealing them.
+        """
+        with self.lock:
+            now = time.time()
+            stats = []
+            for key in self.api_keys:
+                state = self.key_state[key]
+                stats.append({
+                    "key": f"...{key[-4:]}",
+                    "key_id": self._key_id(key),
+                    "requests": state["requests"],
+                    "successes": state["successes"],
+                    "errors": state["errors"],
+                    "rate_limited": state["rate_limited"],
+                    "error_rate": round(self._error_rate(state), 3),
+                    "cooldown_remaining": round(max(0.0, state["cooldown_until"] - now), 1),
+                    "healthy": self._is_healthy(key, now),
+                })
+            return stats
+
+    # --- Helpers (callers must hold self.lock) ---
+
+    def _error_rate(self, state: dict) -> float:
+        if not state["recent"]:
+            return 0.0
+        return sum(state["recent"]) / len(state["recent"])
+
+    def _is_healthy(self, key: str, now: float) -> bool:
+        return self.key_state[key]["cooldown_until"] <= now
+
+    def _key_id(self, key: str) -> str:
+        # Never write raw keys to disk
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        data = {
+            self._key_id(key): {
+                "requests": state["requests"],
+                "successes": state["successes"],
+                "errors": state["errors"],
+                "rate_limited": state["rate_limited"],
+                "last_rate_limited_at": state["last_rate_limited_at"],
+                "cooldown_until": state["cooldown_until"],
+            }
+            for key, state in self.key_state.items()
+        }
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"⚠️  Could not persist API key state to {self.state_path}: {e}")
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not load API key state from {self.state_path}: {e}")
+            return
+        for key, state in self.key_state.items():
+            saved = data.get(self._key_id(key))
+            if not saved:
+                continue
+            for field in ("requests", "successes", "errors", "rate_limited", "last_rate_limited_at", "cooldown_until"):
+                if field in saved:
+                    state[field] = saved[field]
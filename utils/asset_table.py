@@ -0,0 +1,94 @@
+# utils/asset_table.py
+import asyncio
+
+
+class AssetTable:
+    """
+    Per-task table of assets that are being fetched ahead of time.
+
+    Every fetch is started as soon as it is added, so all of a task's
+    downloads run while earlier scenes are still being rendered. The
+    consumer awaits get(name) and only blocks on assets that haven't
+    arrived yet. A failed fetch is raised when (and only when) its
+    asset is consumed.
+
+    Must be used from a single event loop.
+    """
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.fetches = {}
+
+    def add(self, name: str, coro) -> asyncio.Task:
+        """
+        Starts fetching an asset in the background under `name`.
+        Adding a name twice keeps the first fetch.
+        """
+        if name in self.fetches:
+            coro.close()
+            return self.fetches[name]
+        fetch = asyncio.ensure_future(coro)
+        # Mark failures as retrieved; they are re-raised by get()
+        fetch.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.fetches[name] = fetch
+        return fetch
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.fetches
+
+    async def get(self, name: str):
+        """
+        Waits for the asset `name` and returns its result.
+        """
+        fetch = self.fetches.get(name)
+        if fetch is None:
+            raise KeyError(f"Asset '{name}' was never prefetched for task {self.task_id}")
+        if not fetch.done():
+            print(f"  ⏳ Waiting for prefetched asset '{name}'...")
+        # shield() so a cancelled consumer doesn't cancel a fetch others may share
+        return await asyncio.shield(fetch)
+
+    def cancel(self):
+        """
+        Cancels every fetch that is still running (e.g. when the task fails).
+        """
+        for fetch in self.fetches.values():
+            if not fetch.done():
+                fetch.cancel()
+
+    def status(self) -> dict:
+        """
+        Counts of ready, pending and failed assets.
+        """
+        ready = pending = failed = 0
+        for fetch in self.fetches.values():
+            if not fetch.done():
+                pending += 1
+            elif fetch.cancelled() or fetch.exception() is not None:
+                failed += 1
+            else:
+                ready += 1
+        return {"ready": ready, "pending": pending, "failed": failed}
+
+
+class AssetView:
+    """
+    One task's view of an AssetTable shared by several tasks (a batch).
+    Maps the task's own asset names ("media:1", "voiceover:1", ...) to the
+    shared entries, so identical assets are fetched once for all tasks.
+    """
+    def __init__(self, table: AssetTable, names: dict):
+        self.table = table
+        self.names = names
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    async def get(self, name: str):
+        return await self.table.get(self.names[name])
+
+    def cancel(self):
+        # Shared fetches belong to the whole batch; one failed task must not cancel them
+        pass
+
+    def status(self) -> dict:
+        return self.table.status()
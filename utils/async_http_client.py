@@ -0,0 +1,131 @@
+# utils/async_http_client.py
+import asyncio
+import threading
+import weakref
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
+import httpx
+
+from utils.http_client import RetryPolicy
+
+# Transport errors raised before any of the request was sent
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class AsyncProviderHTTPClient:
+    """
+    The asyncio counterpart of ProviderHTTPClient.
+    Keeps one pooled keep-alive httpx.AsyncClient per upstream host (and per
+    event loop, since httpx pools are bound to the loop that created them),
+    and applies the same RetryPolicy so sync and async calls back off alike.
+    """
+    def __init__(self, pool_size: int = 10, retry_policy: RetryPolicy = None):
+        self.pool_size = pool_size
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.clients = weakref.WeakKeyDictionary()  # loop -> {host: AsyncClient}
+        self.lock = threading.Lock()
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """
+        Returns the shared AsyncClient for the scheme+host of `url` on the running loop.
+        """
+        loop = asyncio.get_running_loop()
+        parts = urlsplit(url)
+        host_key = f"{parts.scheme}://{parts.netloc}"
+        with self.lock:
+            loop_clients = self.clients.setdefault(loop, {})
+            client = loop_clients.get(host_key)
+            if client is None:
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                    follow_redirects=True,
+                )
+                loop_clients[host_key] = client
+            return client
+
+    async def request(self, method: str, url: str, retry_statuses: tuple = None, limiter=None, stream: bool = False, **kwargs) -> httpx.Response:
+        """
+        Sends a request through the pooled client for the host, retrying
+        connection errors and retryable statuses according to the RetryPolicy.
+        Non-idempotent requests (POST) are only retried after connect-phase
+        errors (see ProviderHTTPClient.request).
+
+        Args:
+            method: HTTP method
+            url: Full request URL
+            retry_statuses: Statuses to retry (defaults depend on the method)
+            limiter: Optional AIMDLimiter for the provider (see ProviderHTTPClient.request)
+            stream: If True the body is not read; the caller must `await response.aclose()`
+            **kwargs: Passed through to httpx.AsyncClient.build_request
+
+        Returns:
+            The final httpx.Response (which may still be an error status).
+        """
+        if retry_statuses is None:
+            retry_statuses = self.retry_policy.default_statuses(method)
+        client = self.client_for(url)
+        max_retries = self.retry_policy.max_retries
+
+        for attempt in range(max_retries + 1):
+            try:
+                async with (limiter.slot_async() if limiter else nullcontext()) as permit:
+                    request = client.build_request(method, url, **kwargs)
+                    response = await client.send(request, stream=stream)
+                    if permit is not None:
+                        permit.record(response)
+            except httpx.TransportError as e:
+                if attempt >= max_retries or not (self.retry_policy.is_idempotent(method) or isinstance(e, CONNECT_ERRORS)):
+                    raise
+                wait = self.retry_policy.delay(attempt)
+                print(f"  ↻ {method} {urlsplit(url).netloc} failed ({e.__class__.__name__}), retrying in {wait:.1f}s...")
+                await asyncio.sleep(wait)
+                continue
+
+            if response.status_code in retry_statuses and attempt < max_retries:
+                wait = self.retry_policy.delay(attempt, response)
+                print(f"  ↻ {method} {urlsplit(url).netloc} returned {response.status_code}, retrying in {wait:.1f}s...")
+                await response.aclose()
+                await asyncio.sleep(wait)
+                continue
+
+            return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def head(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("HEAD", url, **kwargs)
+
+    async def warm(self, urls: list, timeout: float = 5.0) -> dict:
+        """
+        Opens a pooled keep-alive connection to each URL's host on the running
+        loop (DNS, TCP and TLS done ahead of the first real request).
+        Failures are ignored; the first real request simply connects itself.
+
+        Returns:
+            {host: True/False} - whether a connection was established.
+        """
+        async def connect(url):
+            try:
+                # Any response (even 404/405) means the connection is open and pooled
+                await self.client_for(url).head(url, timeout=timeout)
+                return True
+            except httpx.HTTPError:
+                return False
+
+        results = await asyncio.gather(*(connect(url) for url in urls))
+        return {urlsplit(url).netloc: ok for url, ok in zip(urls, results)}
+
+    async def aclose(self):
+        """
+        Closes the pooled clients that belong to the running loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            loop_clients = self.clients.pop(loop, {})
+        for client in loop_clients.values():
+            await client.aclose()
@@ -0,0 +1,50 @@
+# utils/async_runtime.py
+import asyncio
+import threading
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the process-wide background event loop, starting it on first use.
+
+    All async provider calls made on behalf of sync code run on this one loop,
+    so their pooled HTTP connections are reused across calls and tasks.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="provider-event-loop", daemon=True)
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine on the background loop and blocks until it finishes.
+    This is what the sync service functions use to wrap their async versions.
+    Must not be called from a coroutine running on that same loop.
+    """
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() called from the provider event loop; await the coroutine instead.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def submit(coro):
+    """
+    Schedules a coroutine on the background loop without waiting for it.
+
+    Returns:
+        A concurrent.futures.Future for the coroutine's result.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
@@ -0,0 +1,118 @@
+# utils/cancellation.py
+import contextvars
+import threading
+
+# The token of the task the current code is working for. Set by the render worker;
+# inherited by coroutines, asyncio tasks and asyncio.to_thread calls it starts.
+current_token = contextvars.ContextVar("cancellation_token", default=None)
+
+
+class TaskCancelled(Exception):
+    """
+    Raised inside a task's pipeline once the task has been cancelled.
+    """
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation flag for one task.
+
+    The pipeline calls check_cancelled() at safe points (between scenes, per
+    downloaded chunk, per Veo poll, per encoded frame). Callbacks registered
+    with add_callback() run once on cancel(), e.g. to stop a subprocess.
+    """
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.event = threading.Event()
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def cancel(self):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️  Cancellation callback for task {self.task_id} failed: {e}")
+
+    def add_callback(self, callback):
+        """
+        Runs callback() when the task is cancelled (right away if it already is).
+        """
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self.event.is_set():
+            raise TaskCancelled(f"Task {self.task_id} was cancelled")
+
+
+def check_cancelled():
+    """
+    Raises TaskCancelled if the task the caller is working for was cancelled.
+    A no-op outside of a task (e.g. batch-wide shared fetches).
+    """
+    token = current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def is_cancelled() -> bool:
+    token = current_token.get()
+    return token is not None and token.cancelled
+
+
+class CancellationRegistry:
+    """
+    Process-wide map of task_id -> CancellationToken for tasks that are
+    queued or running in this process.
+    """
+    def __init__(self):
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def token_for(self, task_id: str) -> CancellationToken:
+        with self.lock:
+            token = self.tokens.get(task_id)
+            if token is None:
+                token = self.tokens[task_id] = CancellationToken(task_id)
+            return token
+
+    def cancel(self, task_id: str, before=None) -> bool:
+        """
+        Cancels a task running in this process. Returns False if it isn't running
+        here, or if `before` returned False.
+
+        Args:
+            before: Optional callable run just before the token is cancelled (only
+                if it exists), e.g. to publish a status the task's own final
+                status must come after. Returning False leaves the task alone.
+        """
+        with self.lock:
+            token = self.tokens.get(task_id)
+        if token is None:
+            return False
+        if before is not None and before() is False:
+            return False
+        token.cancel()
+        return True
+
+    def discard(self, task_id: str):
+        with self.lock:
+            self.tokens.pop(task_id, None)
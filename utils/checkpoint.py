@@ -0,0 +1,222 @@
+# utils/checkpoint.py
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+from datetime import datetime, timezone
+
+MANIFEST_FILE = "manifest.json"
+
+# Manifest states
+RUNNING = "running"
+FAILED = "error"
+COMPLETE = "complete"
+
+# Identifies this process incarnation (a restarted container often reuses the same pid)
+PROCESS_TOKEN = f"{os.getpid()}-{time.time_ns()}"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def signed_url_expiry(url: str) -> float | None:
+    """
+    Expiry (epoch seconds) of a V4 signed GCS URL, or None if it isn't one.
+    """
+    query = parse_qs(urlparse(url).query)
+    try:
+        signed_at = datetime.strptime(query["X-Goog-Date"][0], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        return signed_at.timestamp() + int(query["X-Goog-Expires"][0])
+    except (KeyError, ValueError):
+        return None
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class TaskManifest:
+    """
+    Checkpoint of one task, kept as manifest.json in its task directory.
+
+    Records the original request, the validated script and every finished
+    artifact (voiceover, media, music) with its size and sha256, so a task
+    that crashed or failed can be resumed without redoing TTS, downloads or
+    Veo generations whose output is still on disk and intact.
+
+    Writes are atomic (temp file + rename), so a crash never leaves a
+    half-written manifest.
+    """
+    def __init__(self, task_dir: str, data: dict = None):
+        self.task_dir = task_dir
+        self.path = os.path.join(task_dir, MANIFEST_FILE)
+        self.data = data or {"artifacts": {}}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, task_dir: str) -> "TaskManifest | None":
+        """
+        Reads a task's manifest, or returns None if it has none (or it is unreadable).
+        """
+        try:
+            with open(os.path.join(task_dir, MANIFEST_FILE)) as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        data.setdefault("artifacts", {})
+        return cls(task_dir, data)
+
+    @classmethod
+    def open(cls, task_dir: str) -> "TaskManifest":
+        """
+        Loads a task's manifest, or starts a new one.
+        """
+        os.makedirs(task_dir, exist_ok=True)
+        return cls.load(task_dir) or cls(task_dir)
+
+    # --- Task-level state ---
+
+    @property
+    def state(self) -> str | None:
+        return self.data.get("state")
+
+    @property
+    def request(self) -> dict | None:
+        return self.data.get("request")
+
+    @property
+    def script(self) -> dict | None:
+        return self.data.get("script")
+
+    def start(self, **request):
+        """
+        Marks the task as running in this process and records the request it was given.
+        """
+        with self.lock:
+            self.data.setdefault("request", request)
+            self.data["state"] = RUNNING
+            self.data["pid"] = os.getpid()
+            self.data["owner"] = PROCESS_TOKEN
+            self.data.setdefault("attempts", 0)
+            self.data["attempts"] += 1
+            self._save()
+
+    def set_script(self, script: dict):
+        with self.lock:
+            self.data["script"] = script
+            self._save()
+
+    def finish(self, state: str, error: str = None):
+        with self.lock:
+            self.data["state"] = state
+            self.data["error"] = error
+            self.data.pop("pid", None)
+            self.data.pop("owner", None)
+            self._save()
+
+    def is_orphaned(self) -> bool:
+        """
+        True if the task was running in a process that no longer exists
+        (i.e. it was interrupted by a crash or restart).
+        """
+        if self.state != RUNNING or self.data.get("owner") == PROCESS_TOKEN:
+            return False
+        pid = self.data.get("pid")
+        return pid is None or pid == os.getpid() or not pid_alive(pid)
+
+    def claim_resume(self) -> bool:
+        """
+        Claims the right to resume this task's current attempt. Exactly one
+        caller (across worker processes sharing the directory) gets True.
+        """
+        marker = os.path.join(self.task_dir, f"resume-{self.data.get('attempts', 0)}.claim")
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        return True
+
+    def release_resume(self):
+        """
+        Gives up a claim_resume() that could not be acted on (e.g. the queue was full).
+        """
+        try:
+            os.remove(os.path.join(self.task_dir, f"resume-{self.data.get('attempts', 0)}.claim"))
+        except FileNotFoundError:
+            pass
+
+    # --- Artifacts ---
+
+    def record(self, name: str, location: str):
+        """
+        Checkpoints a finished artifact. Blocking (hashes the file); run it in a thread.
+
+        Args:
+            name: Asset name, e.g. "media:3" or "voiceover:3"
+            location: The local file path, or a signed URL (kept until it expires)
+        """
+        if location is None:
+            return
+        if location.startswith(("http://", "https://")):
+            expires_at = signed_url_expiry(location)
+            if expires_at is None:
+                return
+            entry = {"url": location, "expires_at": expires_at}
+        else:
+            entry = {"path": os.path.abspath(location), "size": os.path.getsize(location), "sha256": file_sha256(location)}
+        with self.lock:
+            self.data["artifacts"][name] = entry
+            self._save()
+
+    def valid_artifact(self, name: str, min_url_lifetime: float = 300) -> str | None:
+        """
+        The checkpointed artifact's path (or URL) if it is still usable:
+        the file exists with the recorded size and checksum, or the URL is
+        valid for at least `min_url_lifetime` more seconds. Blocking.
+        """
+        with self.lock:
+            entry = self.data["artifacts"].get(name)
+        if entry is None:
+            return None
+        if "url" in entry:
+            return entry["url"] if entry["expires_at"] - time.time() > min_url_lifetime else None
+        try:
+            if os.path.getsize(entry["path"]) != entry["size"] or file_sha256(entry["path"]) != entry["sha256"]:
+                return None
+        except OSError:
+            return None
+        return entry["path"]
+
+    def _save(self):
+        self.data["updated_at"] = time.time()
+        partial_path = f"{self.path}.partial"
+        with open(partial_path, "w") as f:
+            json.dump(self.data, f)
+        os.replace(partial_path, self.path)
+
+
+def find_interrupted(base_dir: str) -> list[TaskManifest]:
+    """
+    Manifests under base_dir of tasks whose process died while they were running.
+    """
+    interrupted = []
+    for entry in os.scandir(base_dir):
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        manifest = TaskManifest.load(entry.path)
+        if manifest is not None and manifest.request and manifest.is_orphaned():
+            interrupted.append(manifest)
+    return interrupted
@@ -0,0 +1,242 @@
+# utils/concurrency_limiter.py
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """
+    True if an exception from a provider SDK looks like a rate limit.
+    Matches the "429"/"quota" check the services already use for key rotation.
+    """
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "resource exhausted" in message
+
+
+class _Permit:
+    """
+    Handed out by AIMDLimiter.slot(). Lets the caller report what happened
+    to the request made while holding the slot.
+    """
+    def __init__(self):
+        self.throttled = False
+
+    def record(self, response):
+        """
+        Marks the slot as throttled if the HTTP response is a 429 or a 5xx
+        (an overloaded upstream should get fewer concurrent requests too).
+        """
+        if response is not None and (response.status_code == 429 or response.status_code >= 500):
+            self.throttled = True
+
+    def mark_throttled(self):
+        self.throttled = True
+
+
+class AIMDLimiter:
+    """
+    Adaptive concurrency limit for one upstream provider.
+
+    Additive increase: every successful call grows the limit by
+    `increase / limit`, i.e. roughly +increase per full window of calls.
+    Multiplicative decrease: a 429, a 5xx or a latency spike multiplies the limit
+    by `decrease_factor` (at most once per backoff window, so one burst
+    of 429s only counts once).
+
+    Thread-safe; one instance is shared by every task in the worker process.
+    """
+    def __init__(
+        self,
+        name: str,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 32,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        latency_threshold: float = None,
+        latency_spike_factor: float = 3.0,
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_threshold = latency_threshold
+        self.latency_spike_factor = latency_spike_factor
+
+        self.in_flight = 0
+        self.latency_ewma = None
+        self.samples = 0
+        self.last_decrease_at = 0.0
+        self.successes = 0
+        self.throttles = 0
+        self.condition = threading.Condition()
+
+    # --- Acquire / release ---
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        Blocks until an in-flight slot is free. Returns False on timeout.
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.in_flight < int(self.limit), timeout=timeout) and self._take()
+
+    def try_acquire(self) -> bool:
+        """
+        Takes a slot if one is free right now, without blocking.
+        """
+        with self.condition:
+            if self.in_flight < int(self.limit):
+                return self._take()
+            return False
+
+    async def acquire_async(self):
+        """
+        Waits for an in-flight slot without blocking the event loop.
+        The limiter is shared with threaded callers, so this polls try_acquire
+        with a short, growing sleep instead of using a loop-bound primitive.
+        """
+        delay = 0.005
+        while not self.try_acquire():
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def release(self):
+        with self.condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.condition.notify()
+
+    def _take(self) -> bool:
+        self.in_flight += 1
+        return True
+
+    @contextmanager
+    def slot(self):
+        """
+        Holds one in-flight slot for the duration of the block and feeds
+        the outcome back into the limit:
+
+            with limiter.slot() as permit:
+                response = http_client.get(...)
+                permit.record(response)
+        """
+        self.acquire()
+        permit = _Permit()
+        start = time.monotonic()
+        try:
+            yield permit
+        except Exception as e:
+            if is_throttle_error(e):
+                permit.mark_throttled()
+            raise
+        else:
+            if not permit.throttled:
+                self.on_success(time.monotonic() - start)
+        finally:
+            self.release()
+            if permit.throttled:
+                self.on_throttle()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        """
+        The asyncio version of slot():
+
+            async with limiter.slot_async() as permit:
+                response = await async_http_client.get(...)
+                permit.record(response)
+        """
+        await self.acquire_async()
+        permit = _Permit()
+        start = time.monotonic()
+        try:
+            yield permit
+        except Exception as e:
+            if is_throttle_error(e):
+                permit.mark_throttled()
+            raise
+        else:
+            if not permit.throttled:
+                self.on_success(time.monotonic() - start)
+        finally:
+            self.release()
+            if permit.throttled:
+                self.on_throttle()
+
+    # --- Feedback ---
+
+    def on_success(self, latency: float):
+        with self.condition:
+            self.successes += 1
+            if self._is_latency_spike(latency):
+                self._decrease(f"latency spike ({latency:.1f}s)")
+            else:
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._update_latency(latency)
+            self.condition.notify_all()
+
+    def on_throttle(self):
+        with self.condition:
+            self.throttles += 1
+            self._decrease("rate limited")
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        backoff_window = max(1.0, self.latency_ewma or 0.0)
+        if now - self.last_decrease_at < backoff_window:
+            return
+        self.last_decrease_at = now
+        old_limit = self.limit
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        print(f"  🔻 {self.name} concurrency {old_limit:.1f} → {self.limit:.1f} ({reason})")
+
+    def _is_latency_spike(self, latency: float) -> bool:
+        if self.latency_threshold is not None:
+            return latency > self.latency_threshold
+        # Without an explicit threshold, compare against our own baseline once we have one
+        return self.samples >= 10 and latency > self.latency_ewma * self.latency_spike_factor
+
+    def _update_latency(self, latency: float):
+        self.samples += 1
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma = 0.9 * self.latency_ewma + 0.1 * latency
+
+    # --- Monitoring ---
+
+    def snapshot(self) -> dict:
+        with self.condition:
+            return {
+                "provider": self.name,
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                "successes": self.successes,
+                "throttles": self.throttles,
+            }
+
+
+class LimiterRegistry:
+    """
+    Process-wide set of AIMDLimiters, one per upstream provider.
+    """
+    def __init__(self, **defaults):
+        self.defaults = defaults
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def get(self, name: str) -> AIMDLimiter:
+        with self.lock:
+            limiter = self.limiters.get(name)
+            if limiter is None:
+                limiter = AIMDLimiter(name, **self.defaults)
+                self.limiters[name] = limiter
+            return limiter
+
+    def snapshot(self) -> list[dict]:
+        with self.lock:
+            limiters = list(self.limiters.values())
+        return [limiter.snapshot() for limiter in limiters]
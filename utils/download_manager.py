@@ -0,0 +1,440 @@
+# utils/download_manager.py
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+
+from utils.cancellation import check_cancelled
+from utils.http_client import ProviderHTTPClient
+
+
+class DownloadManager:
+    """
+    Downloads large media files (stock clips, Veo outputs, music previews).
+
+    - Probes the server for Accept-Ranges / Content-Length.
+    - Fetches the file in parallel byte-range parts with large buffers,
+      writing each part straight into a preallocated file with os.pwrite.
+    - Keeps a small progress file next to the partial download so a
+      dropped connection (or a retry of the whole task) resumes instead
+      of starting again from zero.
+    - Verifies the final size before moving the file into place.
+
+    download() uses the pooled requests sessions and a thread per part;
+    download_async() does the same on the asyncio client.
+    """
+    def __init__(
+        self,
+        http_client: ProviderHTTPClient,
+        async_http_client=None,
+        connections: int = 4,
+        part_size: int = 8 * 1024 * 1024,
+        buffer_size: int = 1024 * 1024,
+        min_parallel_size: int = 4 * 1024 * 1024,
+        max_attempts: int = 3,
+    ):
+        self.http_client = http_client
+        self.async_http_client = async_http_client
+        self.connections = max(1, connections)
+        self.part_size = part_size
+        self.buffer_size = buffer_size
+        self.min_parallel_size = min_parallel_size
+        self.max_attempts = max_attempts
+        self.write_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.bytes_downloaded = 0
+        self.files_downloaded = 0
+
+    # --- Public API ---
+
+    def download(self, url: str, output_path: str, headers: dict = None, timeout: int = 60) -> str:
+        """
+        Downloads `url` to `output_path`, resuming any earlier partial download.
+
+        Returns:
+            output_path once the file is complete and verified.
+        """
+        headers = dict(headers or {})
+        partial_path = f"{output_path}.part"
+        state_path = f"{output_path}.part.json"
+
+        total_size, accepts_ranges, validator = self._probe(url, headers, timeout)
+
+        if accepts_ranges and total_size and total_size >= self.min_parallel_size:
+            self._download_ranged(url, partial_path, state_path, headers, timeout, total_size, validator)
+        else:
+            self._download_single(url, partial_path, headers, timeout, total_size, accepts_ranges, validator)
+
+        return self._finalize(partial_path, state_path, output_path, total_size)
+
+    async def download_async(self, url: str, output_path: str, headers: dict = None, timeout: int = 60) -> str:
+        """
+        The asyncio version of download(): parts are fetched concurrently
+        on the shared async client instead of a thread pool. Disk writes
+        run in worker threads so they never stall the provider loop.
+
+        Returns:
+            output_path once the file is complete and verified.
+        """
+        if self.async_http_client is None:
+            return await asyncio.to_thread(self.download, url, output_path, headers, timeout)
+
+        headers = dict(headers or {})
+        partial_path = f"{output_path}.part"
+        state_path = f"{output_path}.part.json"
+
+        total_size, accepts_ranges, validator = await self._probe_async(url, headers, timeout)
+
+        if accepts_ranges and total_size and total_size >= self.min_parallel_size:
+            await self._download_ranged_async(url, partial_path, state_path, headers, timeout, total_size, validator)
+        else:
+            await self._download_single_async(url, partial_path, headers, timeout, total_size, accepts_ranges, validator)
+
+        return await asyncio.to_thread(self._finalize, partial_path, state_path, output_path, total_size)
+
+    def _finalize(self, partial_path: str, state_path: str, output_path: str, total_size: int) -> str:
+        """
+        Verifies the size of the finished partial file and moves it into place.
+        """
+        actual_size = os.path.getsize(partial_path)
+        if total_size and actual_size != total_size:
+            raise IOError(f"Downloaded size mismatch for {output_path}: expected {total_size} bytes, got {actual_size}")
+
+        os.replace(partial_path, output_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        with self.stats_lock:
+            self.bytes_downloaded += actual_size
+            self.files_downloaded += 1
+        return output_path
+
+    # --- Probing ---
+
+    def _probe(self, url: str, headers: dict, timeout: int):
+        """
+        Returns (total_size, accepts_ranges, validator) for the resource.
+        The validator (ETag or Last-Modified) is used to detect a changed
+        file before resuming a partial download.
+        """
+        try:
+            response = self.http_client.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+            if response.status_code == 200:
+                size = int(response.headers.get("Content-Length") or 0)
+                accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+                validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                if size and accepts_ranges:
+                    return size, True, validator
+        except requests.exceptions.RequestException:
+            pass
+
+        # Some CDNs do not answer HEAD properly - ask for the first byte instead
+        try:
+            range_headers = dict(headers, Range="bytes=0-0")
+            with self.http_client.get(url, headers=range_headers, timeout=timeout, stream=True) as response:
+                validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                if response.status_code == 206:
+                    content_range = response.headers.get("Content-Range", "")
+                    total = content_range.rsplit("/", 1)[-1]
+                    if total.isdigit():
+                        return int(total), True, validator
+                    return 0, True, validator
+                if response.status_code == 200:
+                    return int(response.headers.get("Content-Length") or 0), False, validator
+        except requests.exceptions.RequestException:
+            pass
+        return 0, False, None
+
+    async def _probe_async(self, url: str, headers: dict, timeout: int):
+        """
+        The asyncio version of _probe().
+        """
+        client = self.async_http_client
+        try:
+            response = await client.head(url, headers=headers, timeout=timeout)
+            if response.status_code == 200:
+                size = int(response.headers.get("Content-Length") or 0)
+                accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+                validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                if size and accepts_ranges:
+                    return size, True, validator
+        except httpx.HTTPError:
+            pass
+
+        try:
+            response = await client.get(url, headers=dict(headers, Range="bytes=0-0"), timeout=timeout, stream=True)
+            try:
+                validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                if response.status_code == 206:
+                    total = response.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+                    return (int(total) if total.isdigit() else 0), True, validator
+                if response.status_code == 200:
+                    return int(response.headers.get("Content-Length") or 0), False, validator
+            finally:
+                await response.aclose()
+        except httpx.HTTPError:
+            pass
+        return 0, False, None
+
+    # --- Ranged (parallel) download ---
+
+    def _prepare_ranged(self, partial_path, state_path, total_size, validator) -> dict:
+        """
+        Loads the progress of an earlier partial download, or preallocates a new one.
+        """
+        state = self._load_state(state_path, total_size, validator)
+        if state is None or not os.path.exists(partial_path):
+            state = {
+                "size": total_size,
+                "validator": validator,
+                "parts": [
+                    {"start": start, "end": min(start + self.part_size, total_size) - 1, "received": 0}
+                    for start in range(0, total_size, self.part_size)
+                ],
+            }
+            self._preallocate(partial_path, total_size)
+        else:
+            done = sum(part["received"] for part in state["parts"])
+            print(f"  ↻ Resuming download at {done / total_size:.0%} ({done} of {total_size} bytes)")
+        return state
+
+    def _download_ranged(self, url, partial_path, state_path, headers, timeout, total_size, validator):
+        state = self._prepare_ranged(partial_path, state_path, total_size, validator)
+        state_lock = threading.Lock()
+        fd = os.open(partial_path, os.O_RDWR)
+        try:
+            for attempt in range(self.max_attempts):
+                pending = [part for part in state["parts"] if part["start"] + part["received"] <= part["end"]]
+                if not pending:
+                    break
+
+                errors = []
+                with ThreadPoolExecutor(max_workers=min(self.connections, len(pending))) as pool:
+                    # Each part runs in the caller's context so it sees the task's cancellation token
+                    futures = [
+                        pool.submit(contextvars.copy_context().run, self._fetch_part, url, headers, timeout, fd, part, state, state_path, state_lock)
+                        for part in pending
+                    ]
+                    for future in futures:
+                        try:
+                            future.result()
+                        except (requests.exceptions.RequestException, IOError) as e:
+                            errors.append(e)
+
+                self._save_state(state_path, state, state_lock)
+                if not errors:
+                    break
+                if attempt == self.max_attempts - 1:
+                    raise errors[0]
+                wait = self.http_client.retry_policy.delay(attempt)
+                print(f"  ⚠️  {len(errors)} download part(s) failed ({errors[0]}). Resuming in {wait:.1f}s...")
+                time.sleep(wait)
+        finally:
+            os.close(fd)
+
+    def _fetch_part(self, url, headers, timeout, fd, part, state, state_path, state_lock):
+        """
+        Downloads the remaining bytes of one part and writes them in place.
+        """
+        offset = part["start"] + part["received"]
+        range_headers = dict(headers, Range=f"bytes={offset}-{part['end']}")
+        with self.http_client.get(url, headers=range_headers, timeout=timeout, stream=True) as response:
+            if response.status_code != 206:
+                raise IOError(f"Expected 206 Partial Content for range request, got {response.status_code}")
+            for chunk in response.iter_content(chunk_size=self.buffer_size):
+                check_cancelled()
+                if not chunk:
+                    continue
+                self._pwrite(fd, chunk, offset)
+                offset += len(chunk)
+                part["received"] = offset - part["start"]
+
+        if offset != part["end"] + 1:
+            raise IOError(f"Range {part['start']}-{part['end']} ended early at byte {offset}")
+        self._save_state(state_path, state, state_lock)
+
+    async def _download_ranged_async(self, url, partial_path, state_path, headers, timeout, total_size, validator):
+        state = await asyncio.to_thread(self._prepare_ranged, partial_path, state_path, total_size, validator)
+        state_lock = threading.Lock()
+        semaphore = asyncio.Semaphore(self.connections)
+
+        async def fetch(part):
+            async with semaphore:
+                await self._fetch_part_async(url, headers, timeout, fd, part, state, state_path, state_lock)
+
+        fd = os.open(partial_path, os.O_RDWR)
+        try:
+            for attempt in range(self.max_attempts):
+                pending = [part for part in state["parts"] if part["start"] + part["received"] <= part["end"]]
+                if not pending:
+                    break
+
+                results = await asyncio.gather(*(fetch(part) for part in pending), return_exceptions=True)
+                errors = []
+                for result in results:
+                    if isinstance(result, (httpx.HTTPError, IOError)):
+                        errors.append(result)
+                    elif isinstance(result, BaseException):
+                        raise result
+
+                await asyncio.to_thread(self._save_state, state_path, state, state_lock)
+                if not errors:
+                    break
+                if attempt == self.max_attempts - 1:
+                    raise errors[0]
+                wait = self.async_http_client.retry_policy.delay(attempt)
+                print(f"  ⚠️  {len(errors)} download part(s) failed ({errors[0]}). Resuming in {wait:.1f}s...")
+                await asyncio.sleep(wait)
+        finally:
+            os.close(fd)
+
+    async def _fetch_part_async(self, url, headers, timeout, fd, part, state, state_path, state_lock):
+        offset = part["start"] + part["received"]
+        range_headers = dict(headers, Range=f"bytes={offset}-{part['end']}")
+        response = await self.async_http_client.get(url, headers=range_headers, timeout=timeout, stream=True)
+        try:
+            if response.status_code != 206:
+                raise IOError(f"Expected 206 Partial Content for range request, got {response.status_code}")
+            async for chunk in response.aiter_bytes(chunk_size=self.buffer_size):
+                check_cancelled()
+                if not chunk:
+                    continue
+                await asyncio.to_thread(self._pwrite, fd, chunk, offset)
+                offset += len(chunk)
+                part["received"] = offset - part["start"]
+        finally:
+            await response.aclose()
+
+        if offset != part["end"] + 1:
+            raise IOError(f"Range {part['start']}-{part['end']} ended early at byte {offset}")
+        await asyncio.to_thread(self._save_state, state_path, state, state_lock)
+
+    # --- Single-stream download ---
+
+    def _download_single(self, url, partial_path, headers, timeout, total_size, accepts_ranges, validator):
+        for attempt in range(self.max_attempts):
+            offset = self._resume_offset(partial_path, accepts_ranges, validator)
+            if total_size and offset >= total_size:
+                return
+            request_headers = self._resume_headers(headers, offset, validator)
+            try:
+                with self.http_client.get(url, headers=request_headers, timeout=timeout, stream=True) as response:
+                    response.raise_for_status()
+                    if offset and response.status_code != 206:
+                        offset = 0  # Server ignored the range, or the file changed (If-Range); start over
+                    with open(partial_path, "ab" if offset else "wb") as f:
+                        for chunk in response.iter_content(chunk_size=self.buffer_size):
+                            check_cancelled()
+                            f.write(chunk)
+                return
+            except requests.exceptions.HTTPError:
+                raise  # 4xx/5xx already went through the retry policy
+            except requests.exceptions.RequestException as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                wait = self.http_client.retry_policy.delay(attempt)
+                print(f"  ⚠️  Download interrupted ({e}). Resuming in {wait:.1f}s...")
+                time.sleep(wait)
+
+    async def _download_single_async(self, url, partial_path, headers, timeout, total_size, accepts_ranges, validator):
+        for attempt in range(self.max_attempts):
+            offset = self._resume_offset(partial_path, accepts_ranges, validator)
+            if total_size and offset >= total_size:
+                return
+            request_headers = self._resume_headers(headers, offset, validator)
+            try:
+                response = await self.async_http_client.get(url, headers=request_headers, timeout=timeout, stream=True)
+                try:
+                    response.raise_for_status()
+                    if offset and response.status_code != 206:
+                        offset = 0  # Server ignored the range, or the file changed (If-Range); start over
+                    f = await asyncio.to_thread(open, partial_path, "ab" if offset else "wb")
+                    try:
+                        async for chunk in response.aiter_bytes(chunk_size=self.buffer_size):
+                            check_cancelled()
+                            await asyncio.to_thread(f.write, chunk)
+                    finally:
+                        await asyncio.to_thread(f.close)
+                finally:
+                    await response.aclose()
+                return
+            except httpx.HTTPStatusError:
+                raise  # 4xx/5xx already went through the retry policy
+            except httpx.HTTPError as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                wait = self.async_http_client.retry_policy.delay(attempt)
+                print(f"  ⚠️  Download interrupted ({e}). Resuming in {wait:.1f}s...")
+                await asyncio.sleep(wait)
+
+    # --- Helpers ---
+
+    def _resume_offset(self, partial_path: str, accepts_ranges: bool, validator: str) -> int:
+        """
+        Size of the partial file to resume from, or 0 to start over. A partial
+        single-stream download is only resumed if the server can serve the
+        missing tail and has a strong validator to send as If-Range, so a
+        changed file is never appended to the old one.
+        """
+        if not accepts_ranges or not validator or validator.startswith("W/"):
+            return 0
+        return os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+
+    def _resume_headers(self, headers: dict, offset: int, validator: str) -> dict:
+        request_headers = dict(headers)
+        if offset:
+            # If-Range: the server answers 200 with the whole file if it changed
+            request_headers["Range"] = f"bytes={offset}-"
+            request_headers["If-Range"] = validator
+            print(f"  ↻ Resuming download from byte {offset}")
+        return request_headers
+
+    def _preallocate(self, path: str, size: int):
+        with open(path, "wb") as f:
+            if hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                    return
+                except OSError:
+                    pass
+            f.truncate(size)
+
+    def _pwrite(self, fd: int, data: bytes, offset: int):
+        if hasattr(os, "pwrite"):
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(fd, view, offset)
+                view = view[written:]
+                offset += written
+        else:
+            # Windows has no pwrite; serialise seek+write on the shared descriptor
+            with self.write_lock:
+                os.lseek(fd, offset, os.SEEK_SET)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+
+    def _load_state(self, state_path: str, total_size: int, validator: str):
+        if not os.path.exists(state_path):
+            return None
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("size") != total_size or state.get("validator") != validator:
+            # The remote file changed since the partial download started
+            return None
+        return state
+
+    def _save_state(self, state_path: str, state: dict, state_lock: threading.Lock):
+        with state_lock:
+            tmp_path = f"{state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, state_path)
@@ -0,0 +1,74 @@
+# utils/file_delivery.py
+import hashlib
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+
+
+class ETagCache:
+    """
+    Strong ETags for finished output files, derived from their content.
+
+    Hashing a video is not free, so the tag is computed once per
+    (path, mtime, size) and reused for every later request, including
+    conditional revalidations from browsers and CDNs.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, path: str, stat_result: os.stat_result) -> str:
+        """
+        Returns the quoted strong ETag for the file (blocking; run it in a thread).
+        """
+        cache_key = (path, stat_result.st_mtime_ns, stat_result.st_size)
+        with self.lock:
+            etag = self.entries.get(cache_key)
+        if etag is not None:
+            return etag
+
+        with open(path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        etag = f'"{digest[:32]}"'
+
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                # Files are rarely re-requested long after they're made; forget the oldest entry
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[cache_key] = etag
+        return etag
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def is_not_modified(request_headers, etag: str, last_modified: float) -> bool:
+    """
+    Evaluates If-None-Match / If-Modified-Since for a GET or HEAD (RFC 9110 13.1).
+    If-None-Match takes precedence; If-Modified-Since is only used without it.
+
+    Returns:
+        True if the client's cached copy is current and a 304 should be sent.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # If-None-Match uses weak comparison: W/"x" matches "x"
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag.removeprefix("W/") in tags
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since is None:
+            return False
+        # HTTP dates have one-second resolution
+        return int(last_modified) <= since.timestamp()
+
+    return False
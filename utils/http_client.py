@@ -0,0 +1,188 @@
+# utils/http_client.py
+import random
+import threading
+import time
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# Transient upstream failures that are always worth another attempt
+TRANSIENT_STATUSES = (500, 502, 503, 504)
+# Default statuses retried for idempotent requests (GET/HEAD)
+RETRY_STATUSES = (429,) + TRANSIENT_STATUSES
+# POST is not idempotent: only retry when the server told us it did not process the request
+POST_RETRY_STATUSES = (429, 503)
+# Methods that may be re-sent after the request possibly reached the server
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+def is_connect_error(error: Exception) -> bool:
+    """
+    True if a requests transport error happened while connecting, i.e. before
+    any of the request was sent (so even a POST can safely be retried).
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], "reason", error.args[0]) if error.args else None
+        # NewConnectionError covers refused connections and DNS failures
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def parse_retry_after(response) -> float | None:
+    """
+    Parses the Retry-After header of a response into a number of seconds.
+    Supports both the delta-seconds and the HTTP-date forms.
+
+    Returns:
+        Seconds to wait, or None if the header is missing or malformed.
+    """
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """
+    The single retry/backoff policy shared by every provider call.
+    Uses capped exponential backoff with full jitter, and honours
+    Retry-After when the upstream sends one.
+    """
+    def __init__(self, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def delay(self, attempt: int, response=None) -> float:
+        """
+        Returns how long to wait before retry number `attempt` (0-based).
+        """
+        retry_after = parse_retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def default_statuses(self, method: str) -> tuple:
+        """
+        Returns the statuses that are safe to retry for the given HTTP method.
+        """
+        if method.upper() in ("GET", "HEAD", "OPTIONS"):
+            return RETRY_STATUSES
+        return POST_RETRY_STATUSES
+
+    def is_idempotent(self, method: str) -> bool:
+        return method.upper() in IDEMPOTENT_METHODS
+
+
+class ProviderHTTPClient:
+    """
+    A thread-safe HTTP layer for all upstream providers (Pexels, Freesound, Vertex AI...).
+    Keeps one pooled, keep-alive requests.Session per upstream host so that
+    repeated calls reuse TCP+TLS connections instead of handshaking every time.
+    """
+    def __init__(self, pool_size: int = 10, retry_policy: RetryPolicy = None):
+        self.pool_size = pool_size
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def session_for(self, url: str) -> requests.Session:
+        """
+        Returns the shared Session for the scheme+host of `url`, creating it on first use.
+        """
+        parts = urlsplit(url)
+        host_key = f"{parts.scheme}://{parts.netloc}"
+        with self.lock:
+            session = self.sessions.get(host_key)
+            if session is None:
+                session = requests.Session()
+                # Retries are handled by RetryPolicy, not urllib3, so callers can see 429s
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self.sessions[host_key] = session
+            return session
+
+    def request(self, method: str, url: str, retry_statuses: tuple = None, limiter=None, **kwargs) -> requests.Response:
+        """
+        Sends a request through the pooled session for the host, retrying
+        connection errors and retryable statuses according to the RetryPolicy.
+        Non-idempotent requests (POST) are only retried after connect-phase
+        errors: a read timeout may mean the server is already processing it.
+
+        Args:
+            method: HTTP method
+            url: Full request URL
+            retry_statuses: Statuses to retry (defaults depend on the method).
+                Pass () to return every response to the caller untouched.
+            limiter: Optional AIMDLimiter for the provider. Each attempt holds
+                one of its slots (backoff sleeps don't) and reports 429s and 5xx to it.
+            **kwargs: Passed through to requests.Session.request
+
+        Returns:
+            The final requests.Response (which may still be an error status).
+        """
+        if retry_statuses is None:
+            retry_statuses = self.retry_policy.default_statuses(method)
+        session = self.session_for(url)
+        max_retries = self.retry_policy.max_retries
+
+        for attempt in range(max_retries + 1):
+            try:
+                with (limiter.slot() if limiter else nullcontext()) as permit:
+                    response = session.request(method, url, **kwargs)
+                    if permit is not None:
+                        permit.record(response)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= max_retries or not (self.retry_policy.is_idempotent(method) or is_connect_error(e)):
+                    raise
+                wait = self.retry_policy.delay(attempt)
+                print(f"  ↻ {method} {urlsplit(url).netloc} failed ({e.__class__.__name__}), retrying in {wait:.1f}s...")
+                time.sleep(wait)
+                continue
+
+            if response.status_code in retry_statuses and attempt < max_retries:
+                wait = self.retry_policy.delay(attempt, response)
+                print(f"  ↻ {method} {urlsplit(url).netloc} returned {response.status_code}, retrying in {wait:.1f}s...")
+                response.close()
+                time.sleep(wait)
+                continue
+
+            return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self):
+        """
+        Closes every pooled session.
+        """
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
@@ -0,0 +1,100 @@
+# utils/idempotency.py
+import hashlib
+import json
+import threading
+import time
+
+from utils.single_flight import normalize_key
+
+
+def request_fingerprint(request) -> str:
+    """
+    Content hash of a request model. Prompts are case-folded and
+    whitespace-collapsed, so trivially different resubmissions match.
+    """
+    payload = {
+        name: normalize_key(value) if isinstance(value, str) else value
+        for name, value in sorted(request.model_dump().items())
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class IdempotencyConflict(Exception):
+    """
+    Raised when an Idempotency-Key is reused with a different request body.
+    """
+
+
+class IdempotencyIndex:
+    """
+    Maps Idempotency-Key headers and request fingerprints to the task that
+    was started for them, so a retried or double-clicked submission gets
+    the existing task instead of a new render.
+
+    - An explicit key is remembered for `key_ttl_seconds`.
+    - A fingerprint (same request content, no key) only within `window_seconds`.
+    - A task that failed or expired is never reused; the next submission claims the slot.
+
+    Process-local; claim() is atomic, so concurrent duplicates resolve to one task.
+    """
+    def __init__(self, window_seconds: float = 600, key_ttl_seconds: float = 24 * 3600):
+        self.window_seconds = window_seconds
+        self.key_ttl_seconds = key_ttl_seconds
+        self.entries = {}  # index key -> (task_id, fingerprint, expires_at)
+        self.lock = threading.Lock()
+
+    def claim(self, task_id: str, fingerprint: str, idempotency_key: str = None, is_reusable=None) -> str | None:
+        """
+        Registers task_id for this submission unless an earlier task already covers it.
+
+        Args:
+            task_id: The id a new task would get
+            fingerprint: request_fingerprint() of the submission
+            idempotency_key: The client's Idempotency-Key header, if any
+            is_reusable: Callable(task_id) -> bool; False for failed or unknown tasks
+
+        Returns:
+            The existing task_id to return instead, or None if task_id was claimed.
+
+        Raises:
+            IdempotencyConflict: the key was already used for a different request.
+        """
+        now = time.time()
+        slots = [(f"fp:{fingerprint}", self.window_seconds)] if self.window_seconds > 0 else []
+        if idempotency_key:
+            # An explicit key takes precedence over content matching
+            slots.insert(0, (f"key:{idempotency_key}", self.key_ttl_seconds))
+
+        with self.lock:
+            for index_key, _ in slots:
+                entry = self.entries.get(index_key)
+                if entry is None or entry[2] <= now:
+                    continue
+                existing_task_id, existing_fingerprint, _ = entry
+                if is_reusable is not None and not is_reusable(existing_task_id):
+                    continue
+                if index_key.startswith("key:") and existing_fingerprint != fingerprint:
+                    raise IdempotencyConflict("Idempotency-Key was already used with a different request.")
+                # Remember a new key for the task it matched by content
+                for other_key, ttl in slots:
+                    if other_key != index_key:
+                        self.entries[other_key] = (existing_task_id, fingerprint, now + ttl)
+                return existing_task_id
+
+            for index_key, ttl in slots:
+                self.entries[index_key] = (task_id, fingerprint, now + ttl)
+            if len(self.entries) > 10_000:
+                self._purge(now)
+        return None
+
+    def release(self, task_id: str):
+        """
+        Drops every entry pointing at task_id (e.g. the task was never admitted).
+        """
+        with self.lock:
+            for index_key in [k for k, entry in self.entries.items() if entry[0] == task_id]:
+                del self.entries[index_key]
+
+    def _purge(self, now: float):
+        for index_key in [k for k, entry in self.entries.items() if entry[2] <= now]:
+            del self.entries[index_key]
@@ -0,0 +1,220 @@
+# utils/metrics.py
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Stage latencies range from sub-second searches to multi-minute Veo generations
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # label values tuple -> value
+        self.lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        with self.lock:
+            items = list(self.values.items())
+        lines = self._header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count, e.g. tasks finished or bytes downloaded.
+    """
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down.
+    """
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    Cumulative-bucket histogram of observed values (Prometheus semantics).
+    Observing costs one bisect and a few additions under a lock.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, the +Inf bucket last, then sum
+                series = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes the duration of the block (also usable inside coroutines).
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def timed(self, **labels):
+        """
+        Decorator that observes the duration of every call of a function or coroutine function.
+        """
+        def decorator(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.time(**labels):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self) -> list[str]:
+        with self.lock:
+            items = [(key, list(series)) for key, series in self.values.items()]
+        lines = self._header()
+        for key, series in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(float(bound))})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class _Callback(_Metric):
+    """
+    A metric whose samples are read from the component that owns them at
+    scrape time (queue depth, key stats, disk usage), so the hot path never
+    has to update it.
+    """
+    def __init__(self, name: str, help_text: str, kind: str, fn):
+        super().__init__(name, help_text)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> list[str]:
+        samples = self.fn()
+        if not isinstance(samples, list):
+            samples = [({}, samples)]
+        lines = self._header()
+        for labels, value in samples:
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of metrics, rendered in the Prometheus text exposition
+    format by render(). Service modules update counters and histograms as
+    they work; state that other components already track is registered as
+    a callback and read only when /metrics is scraped.
+    """
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name: str, help_text: str, fn, kind: str = "gauge"):
+        """
+        Registers a scrape-time metric. `fn` returns a number, or a list of
+        (labels dict, value) samples.
+        """
+        return self._register(_Callback(name, help_text, kind, fn))
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text format. Blocking (callbacks may scan
+        disk or take locks); run it in a thread.
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                print(f"⚠️  Metric {metric.name} failed to render: {e}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self.metrics[metric.name] = metric
+        return metric
@@ -0,0 +1,144 @@
+# utils/progress.py
+import asyncio
+import threading
+import time
+
+import proglog
+
+from utils.cancellation import check_cancelled
+
+# Stages after which no more events are published for a task
+TERMINAL_STAGES = ("complete", "error", "cancelled")
+
+
+class ProgressBroker:
+    """
+    Fan-out of structured progress events from the pipeline to API clients.
+
+    publish() can be called from any thread (the worker running the task,
+    the provider event loop, moviepy's encoder). Subscribers are asyncio
+    queues on the API server's loop; events are handed over with
+    call_soon_threadsafe so publishing never blocks the pipeline.
+    The latest event per task is kept so a client that connects late
+    immediately gets the current state.
+    """
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.latest_events = {}
+        self.subscribers = {}  # task_id -> set of (loop, queue)
+        self.lock = threading.Lock()
+
+    def publish(self, task_id: str, stage: str, message: str = None, **fields) -> dict:
+        """
+        Records and pushes one progress event.
+
+        Args:
+            task_id: The task the event belongs to
+            stage: Pipeline stage ("generating_script", "rendering_scene", "encoding", "complete", ...)
+            message: Optional human-readable message
+            **fields: Stage details such as scene, total_scenes, percent, eta_seconds
+
+        Returns:
+            The event dict that was published.
+        """
+        event = {"task_id": task_id, "stage": stage, "message": message, "timestamp": time.time()}
+        event.update({k: v for k, v in fields.items() if v is not None})
+        with self.lock:
+            self.latest_events[task_id] = event
+            subscribers = list(self.subscribers.get(task_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                pass
+        return event
+
+    def latest(self, task_id: str) -> dict | None:
+        with self.lock:
+            return self.latest_events.get(task_id)
+
+    def forget(self, task_id: str):
+        """
+        Drops the stored state of a task that is no longer tracked.
+        """
+        with self.lock:
+            self.latest_events.pop(task_id, None)
+
+    async def stream(self, task_id: str, heartbeat_seconds: float = 15.0):
+        """
+        Async generator of a task's events, starting with its latest one.
+        Yields None every heartbeat_seconds without events (so the caller can
+        keep the connection alive) and stops after a terminal stage.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        subscriber = (loop, queue)
+        with self.lock:
+            self.subscribers.setdefault(task_id, set()).add(subscriber)
+            latest = self.latest_events.get(task_id)
+        try:
+            if latest is not None:
+                yield latest
+                if latest["stage"] in TERMINAL_STAGES:
+                    return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                # Skip anything already sent as the initial snapshot
+                if latest is not None and event["timestamp"] <= latest["timestamp"]:
+                    continue
+                yield event
+                if event["stage"] in TERMINAL_STAGES:
+                    return
+        finally:
+            with self.lock:
+                task_subscribers = self.subscribers.get(task_id)
+                if task_subscribers is not None:
+                    task_subscribers.discard(subscriber)
+                    if not task_subscribers:
+                        del self.subscribers[task_id]
+
+    def subscriber_count(self) -> int:
+        with self.lock:
+            return sum(len(s) for s in self.subscribers.values())
+
+    def _offer(self, queue: asyncio.Queue, event: dict):
+        if queue.full():
+            # A slow client only needs the most recent progress, drop the oldest event
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+
+class EncodeProgressLogger(proglog.ProgressBarLogger):
+    """
+    proglog logger for moviepy's write_videofile that reports the percentage
+    of frames encoded (and an ETA) to on_progress, at most once per percent.
+    Also stops the encode (by raising TaskCancelled) once the task is cancelled.
+    """
+    def __init__(self, on_progress):
+        super().__init__()
+        self.on_progress = on_progress
+        self.started_at = None
+        self.last_percent = -1
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        # Called for every encoded frame (and audio chunk)
+        check_cancelled()
+        if bar != "frame_index" or attr != "index":
+            return
+        total = self.bars[bar].get("total")
+        if not total:
+            return
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        percent = min(100, int((value + 1) * 100 / total))
+        if percent == self.last_percent:
+            return
+        self.last_percent = percent
+        elapsed = time.monotonic() - self.started_at
+        eta = elapsed * (100 - percent) / percent if percent else None
+        self.on_progress(percent, eta)
@@ -0,0 +1,134 @@
+# utils/single_flight.py
+import asyncio
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import Future
+
+from utils.cancellation import TaskCancelled, is_cancelled
+
+
+def normalize_key(*parts) -> str:
+    """
+    Builds a coalescing key from the given parts.
+    Strings are case-folded and whitespace-collapsed so that
+    "Sunset  Beach" and "sunset beach" share one upstream request.
+    """
+    normalized = []
+    for part in parts:
+        if isinstance(part, str):
+            part = re.sub(r"\s+", " ", part).strip().casefold()
+        elif isinstance(part, (list, tuple)):
+            part = normalize_key(*part)
+        normalized.append(str(part))
+    return "|".join(normalized)
+
+
+def share_file(source_path: str, output_path: str) -> str:
+    """
+    Makes the file produced by another caller available at output_path.
+    Uses a hard link when possible (no copy, survives the source being deleted)
+    and falls back to a plain copy across filesystems.
+    """
+    if os.path.abspath(source_path) == os.path.abspath(output_path):
+        return output_path
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    try:
+        os.link(source_path, output_path)
+    except OSError:
+        shutil.copyfile(source_path, output_path)
+    return output_path
+
+
+class SingleFlight:
+    """
+    A process-wide, thread-safe single-flight group.
+    Concurrent callers with the same key wait for one in-flight call
+    and all receive its result (or its exception).
+    """
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key: str, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) unless a call with the same key is already in flight.
+
+        Returns:
+            (result, shared) - shared is True when the result came from another caller.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.calls[key] = future
+
+        if not leader:
+            try:
+                return future.result(), True
+            except TaskCancelled:
+                if is_cancelled():
+                    raise
+                # The leader's task was cancelled, not ours; fetch it ourselves
+                return self.do(key, fn, *args, **kwargs)
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+
+    async def do_async(self, key: str, fn, *args, **kwargs):
+        """
+        The asyncio version of do(); fn must be a coroutine function.
+        In-flight calls are shared with sync callers of do() and with
+        coroutines on other event loops, since the shared result is a
+        concurrent.futures.Future.
+
+        Returns:
+            (result, shared) - shared is True when the result came from another caller.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.calls[key] = future
+
+        if not leader:
+            try:
+                return await asyncio.wrap_future(future), True
+            except TaskCancelled:
+                if is_cancelled():
+                    raise
+                # The leader's task was cancelled, not ours; fetch it ourselves
+                return await self.do_async(key, fn, *args, **kwargs)
+
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        """
+        Number of distinct keys currently being fetched.
+        """
+        with self.lock:
+            return len(self.calls)
@@ -0,0 +1,237 @@
+# utils/storage_manager.py
+import glob
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+# The rendered video of a task (the only file /download serves)
+FINAL_VIDEO = "final_video.mp4"
+# Files in a task directory that are kept once the final video exists
+FINAL_FILES = (FINAL_VIDEO, "manifest.json")
+
+
+class StorageManager:
+    """
+    Owns the lifecycle of everything under BASE_TEMP_DIR.
+
+    - Deletes a task's intermediates (scene audio/video, final_audio.mp3,
+      partial downloads) as soon as its final video is written.
+    - Keeps final videos for `final_retention_seconds` after their last use
+      (creation or download).
+    - When usage exceeds `quota_bytes`, evicts least-recently-used task
+      directories and cached music tracks until it is back under quota.
+    - Never touches tasks that are rendering in this process, nor anything
+      used within the last `grace_seconds` (covers other worker processes).
+    """
+    def __init__(
+        self,
+        base_dir: str,
+        music_cache_dir: str,
+        final_retention_seconds: float = 24 * 3600,
+        quota_bytes: int = 0,
+        grace_seconds: float = 600,
+    ):
+        self.base_dir = base_dir
+        self.music_cache_dir = music_cache_dir
+        self.final_retention_seconds = final_retention_seconds
+        self.quota_bytes = quota_bytes
+        self.grace_seconds = grace_seconds
+        self.active_tasks = set()
+        self.evicted_bytes = 0
+        self.evictions = 0
+        self.swept_usage = None  # bytes left by kind after the last sweep (see sweep)
+        self.lock = threading.Lock()
+        os.makedirs(self.music_cache_dir, exist_ok=True)
+
+    # --- Task lifecycle ---
+
+    def pin(self, name: str):
+        """
+        Marks a directory under base_dir as in use so it is never evicted, until unpin().
+        """
+        with self.lock:
+            self.active_tasks.add(name)
+
+    def unpin(self, name: str):
+        with self.lock:
+            self.active_tasks.discard(name)
+
+    @contextmanager
+    def protect(self, task_id: str):
+        """
+        Marks a task as in use for the duration of the block so it is never evicted.
+        """
+        self.pin(task_id)
+        try:
+            yield
+        finally:
+            self.unpin(task_id)
+
+    def cleanup_intermediates(self, task_dir: str) -> int:
+        """
+        Deletes everything in a finished task directory except the final video.
+
+        Returns:
+            Number of bytes freed.
+        """
+        freed = 0
+        for entry in os.scandir(task_dir):
+            if entry.name in FINAL_FILES:
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    freed += self._tree_size(entry.path)
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    freed += entry.stat(follow_symlinks=False).st_size
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        if freed:
+            print(f"🧹 Removed {freed / 1024 / 1024:.1f} MB of intermediates from {task_dir}")
+        return freed
+
+    def touch(self, path: str):
+        """
+        Records a use of a task directory or cached file (for retention and LRU).
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    # --- Sweeping ---
+
+    def sweep(self) -> list[str]:
+        """
+        Applies retention, then the disk quota. Blocking; run it in a thread.
+        Also records what is left in `swept_usage`, so monitoring can report
+        usage without walking the tree again.
+
+        Returns:
+            Paths that were deleted.
+        """
+        now = time.time()
+        entries = self._scan()
+        removed = []
+
+        # 1. Retention: finished task directories not used for final_retention_seconds
+        if self.final_retention_seconds:
+            for entry in list(entries):
+                if entry["kind"] == "task" and now - entry["last_used"] > self.final_retention_seconds and self._evictable(entry, now):
+                    self._remove(entry)
+                    removed.append(entry["path"])
+                    entries.remove(entry)
+
+        # 2. Quota: least recently used first, across task directories and cached music
+        if self.quota_bytes:
+            total = sum(entry["size"] for entry in entries)
+            for entry in sorted(entries, key=lambda e: e["last_used"]):
+                if total <= self.quota_bytes:
+                    break
+                if not self._evictable(entry, now):
+                    continue
+                self._remove(entry)
+                removed.append(entry["path"])
+                total -= entry["size"]
+            if total > self.quota_bytes:
+                print(f"⚠️  Storage still over quota ({total / 1024 ** 3:.2f} GB > {self.quota_bytes / 1024 ** 3:.2f} GB); everything left is in use")
+
+        removed_paths = set(removed)
+        left = [entry for entry in entries if entry["path"] not in removed_paths]
+        with self.lock:
+            self.swept_usage = {
+                "task_bytes": sum(e["size"] for e in left if e["kind"] == "task"),
+                "music_cache_bytes": sum(e["size"] for e in left if e["kind"] == "music"),
+                "swept_at": now,
+            }
+
+        if removed:
+            print(f"🧹 Storage sweep removed {len(removed)} entries")
+        return removed
+
+    def usage(self) -> dict:
+        """
+        Disk usage under base_dir, for monitoring.
+        """
+        entries = self._scan()
+        task_bytes = sum(e["size"] for e in entries if e["kind"] == "task")
+        music_bytes = sum(e["size"] for e in entries if e["kind"] == "music")
+        disk = shutil.disk_usage(self.base_dir)
+        with self.lock:
+            active = len(self.active_tasks)
+            evictions, evicted_bytes = self.evictions, self.evicted_bytes
+        return {
+            "used_bytes": task_bytes + music_bytes,
+            "task_bytes": task_bytes,
+            "music_cache_bytes": music_bytes,
+            "task_dirs": sum(1 for e in entries if e["kind"] == "task"),
+            "active_tasks": active,
+            "quota_bytes": self.quota_bytes,
+            "disk_free_bytes": disk.free,
+            "evictions": evictions,
+            "evicted_bytes": evicted_bytes,
+        }
+
+    # --- Internals ---
+
+    def _scan(self) -> list[dict]:
+        entries = []
+        music_cache = os.path.abspath(self.music_cache_dir)
+        for entry in os.scandir(self.base_dir):
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.abspath(entry.path) == music_cache:
+                        continue
+                    size, last_used = self._tree_stats(entry.path)
+                    entries.append({"kind": "task", "name": entry.name, "path": entry.path, "size": size, "last_used": last_used})
+            except FileNotFoundError:
+                continue
+
+        # Cached music tracks, plus any left in the root by older versions
+        music_files = glob.glob(os.path.join(self.music_cache_dir, "*")) + glob.glob(os.path.join(self.base_dir, "freesound_*.mp3"))
+        for path in music_files:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append({"kind": "music", "name": os.path.basename(path), "path": path, "size": st.st_size, "last_used": st.st_mtime})
+        return entries
+
+    def _tree_stats(self, path: str) -> tuple:
+        size = 0
+        last_used = os.stat(path).st_mtime
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                size += st.st_size
+                last_used = max(last_used, st.st_mtime)
+        return size, last_used
+
+    def _tree_size(self, path: str) -> int:
+        return self._tree_stats(path)[0]
+
+    def _evictable(self, entry: dict, now: float) -> bool:
+        if now - entry["last_used"] < self.grace_seconds:
+            return False
+        if entry["kind"] == "task":
+            with self.lock:
+                return entry["name"] not in self.active_tasks
+        return True
+
+    def _remove(self, entry: dict):
+        if entry["kind"] == "task":
+            shutil.rmtree(entry["path"], ignore_errors=True)
+        else:
+            try:
+                os.remove(entry["path"])
+            except FileNotFoundError:
+                pass
+        with self.lock:
+            self.evictions += 1
+            self.evicted_bytes += entry["size"]
@@ -0,0 +1,292 @@
+# utils/task_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+# Statuses after which a task never changes again and becomes eligible for TTL expiry
+FINISHED_STATUSES = ("complete", "error", "cancelled")
+
+
+class TaskStore(ABC):
+    """
+    Where task statuses live. Every backend stores, per task:
+    status, message, arbitrary extra fields, created_at and updated_at.
+
+    Reads always return a fresh dict, so callers can decorate a status
+    for a response without changing what is stored.
+    """
+    def __init__(self, ttl_seconds: float = 24 * 3600):
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def create(self, task_id: str, status: str, message: str, **fields) -> dict:
+        ...
+
+    @abstractmethod
+    def get(self, task_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def update(self, task_id: str, status: str, message: str, **fields) -> dict | None:
+        """
+        Replaces a task's status and message, and merges `fields` into its
+        extra fields (fields not passed, like priority or batch_id, are kept).
+        Returns the new status, or None if the task does not exist.
+        """
+
+    @abstractmethod
+    def transition(self, task_id: str, from_statuses: tuple, status: str, message: str, **fields) -> bool:
+        """
+        Atomically moves a task to `status` only if it is currently in one of
+        `from_statuses` (compare-and-set), merging `fields` like update().
+        Returns False if it was not (or does not exist).
+        """
+
+    @abstractmethod
+    def list_by_status(self, status: str, limit: int = 100) -> list[dict]:
+        """
+        Tasks in `status`, oldest first, each with its "task_id".
+        """
+
+    @abstractmethod
+    def count_by_status(self) -> dict:
+        ...
+
+    @abstractmethod
+    def delete(self, task_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def purge_expired(self) -> list[str]:
+        """
+        Deletes finished tasks older than the TTL. Returns their ids.
+        """
+
+    def _expires_at(self, status: str, now: float) -> float | None:
+        if status in FINISHED_STATUSES and self.ttl_seconds:
+            return now + self.ttl_seconds
+        return None
+
+
+class InMemoryTaskStore(TaskStore):
+    """
+    Process-local dict backend. The default; fine for a single worker and tests.
+    """
+    def __init__(self, ttl_seconds: float = 24 * 3600):
+        super().__init__(ttl_seconds)
+        self.tasks = {}
+        self.lock = threading.Lock()
+
+    def create(self, task_id, status, message, **fields):
+        now = time.time()
+        record = {
+            "status": status, "message": message, "fields": fields,
+            "created_at": now, "updated_at": now, "expires_at": self._expires_at(status, now),
+        }
+        with self.lock:
+            self.tasks[task_id] = record
+            return self._to_status(record)
+
+    def get(self, task_id):
+        with self.lock:
+            record = self.tasks.get(task_id)
+            if record is None or self._is_expired(record, time.time()):
+                return None
+            return self._to_status(record)
+
+    def update(self, task_id, status, message, **fields):
+        with self.lock:
+            record = self.tasks.get(task_id)
+            if record is None:
+                return None
+            self._apply(record, status, message, fields)
+            return self._to_status(record)
+
+    def transition(self, task_id, from_statuses, status, message, **fields):
+        with self.lock:
+            record = self.tasks.get(task_id)
+            if record is None or record["status"] not in from_statuses:
+                return False
+            self._apply(record, status, message, fields)
+            return True
+
+    def list_by_status(self, status, limit=100):
+        now = time.time()
+        with self.lock:
+            matches = [(tid, r) for tid, r in self.tasks.items() if r["status"] == status and not self._is_expired(r, now)]
+            matches.sort(key=lambda item: item[1]["created_at"])
+            return [{"task_id": tid, **self._to_status(r)} for tid, r in matches[:limit]]
+
+    def count_by_status(self):
+        counts = {}
+        with self.lock:
+            for record in self.tasks.values():
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+        return counts
+
+    def delete(self, task_id):
+        with self.lock:
+            return self.tasks.pop(task_id, None) is not None
+
+    def purge_expired(self):
+        now = time.time()
+        with self.lock:
+            expired = [tid for tid, r in self.tasks.items() if self._is_expired(r, now)]
+            for task_id in expired:
+                del self.tasks[task_id]
+        return expired
+
+    def _apply(self, record, status, message, fields):
+        now = time.time()
+        record.update(status=status, message=message, fields={**record["fields"], **fields}, updated_at=now, expires_at=self._expires_at(status, now))
+
+    def _is_expired(self, record, now):
+        return record["expires_at"] is not None and record["expires_at"] <= now
+
+    def _to_status(self, record):
+        return {
+            "status": record["status"], "message": record["message"], **record["fields"],
+            "created_at": record["created_at"], "updated_at": record["updated_at"],
+        }
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    SQLite backend in WAL mode: survives restarts and can be shared by every
+    uvicorn worker on the host. Readers never block the writer (and vice versa),
+    so status polling from many processes stays cheap.
+
+    Each thread gets its own connection. Writes are single statements, except
+    update()'s and transition()'s read-merge-write, which runs in a
+    BEGIN IMMEDIATE transaction. list_by_status() is served by the
+    (status, created_at) index.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            message TEXT,
+            fields TEXT NOT NULL DEFAULT '{}',
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            expires_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks (status, created_at);
+        CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks (created_at);
+        CREATE INDEX IF NOT EXISTS idx_tasks_expires ON tasks (expires_at) WHERE expires_at IS NOT NULL;
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 24 * 3600, busy_timeout_ms: int = 5000):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            # autocommit mode: every statement is its own transaction
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=self.busy_timeout_ms / 1000)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self.local.conn = conn
+        return conn
+
+    def create(self, task_id, status, message, **fields):
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO tasks (task_id, status, message, fields, created_at, updated_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (task_id, status, message, json.dumps(fields), now, now, self._expires_at(status, now)),
+        )
+        return {"status": status, "message": message, **fields, "created_at": now, "updated_at": now}
+
+    def get(self, task_id):
+        row = self._connection().execute(
+            "SELECT * FROM tasks WHERE task_id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (task_id, time.time()),
+        ).fetchone()
+        return self._to_status(row) if row is not None else None
+
+    def update(self, task_id, status, message, **fields):
+        if not self._write(task_id, None, status, message, fields):
+            return None
+        return self.get(task_id)
+
+    def transition(self, task_id, from_statuses, status, message, **fields):
+        return self._write(task_id, from_statuses, status, message, fields)
+
+    def list_by_status(self, status, limit=100):
+        rows = self._connection().execute(
+            "SELECT * FROM tasks WHERE status = ? AND (expires_at IS NULL OR expires_at > ?) ORDER BY created_at LIMIT ?",
+            (status, time.time(), limit),
+        ).fetchall()
+        return [{"task_id": row["task_id"], **self._to_status(row)} for row in rows]
+
+    def count_by_status(self):
+        rows = self._connection().execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def delete(self, task_id):
+        return self._connection().execute("DELETE FROM tasks WHERE task_id = ?", (task_id,)).rowcount == 1
+
+    def purge_expired(self):
+        conn = self._connection()
+        now = time.time()
+        expired = [row["task_id"] for row in conn.execute(
+            "SELECT task_id FROM tasks WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        )]
+        if expired:
+            conn.execute("DELETE FROM tasks WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        return expired
+
+    def _write(self, task_id, from_statuses, status, message, fields) -> bool:
+        """
+        Sets a task's status and merges its fields, if it exists and (unless
+        from_statuses is None) is in one of from_statuses.
+        """
+        conn = self._connection()
+        # Check-and-merge under the write lock, so concurrent writers neither lose fields nor race the check
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status, fields FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            if row is None or (from_statuses is not None and row["status"] not in from_statuses):
+                conn.execute("ROLLBACK")
+                return False
+            now = time.time()
+            conn.execute(
+                "UPDATE tasks SET status = ?, message = ?, fields = ?, updated_at = ?, expires_at = ? WHERE task_id = ?",
+                (status, message, json.dumps({**json.loads(row["fields"]), **fields}), now, self._expires_at(status, now), task_id),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def _to_status(self, row):
+        return {
+            "status": row["status"], "message": row["message"], **json.loads(row["fields"]),
+            "created_at": row["created_at"], "updated_at": row["updated_at"],
+        }
+
+
+def create_task_store(backend: str = "memory", path: str = None, ttl_seconds: float = 24 * 3600) -> TaskStore:
+    """
+    Builds the task store selected in config ("memory" or "sqlite").
+    """
+    backend = (backend or "memory").lower()
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("TASK_STORE_PATH must be set for the sqlite task store")
+        return SQLiteTaskStore(path, ttl_seconds=ttl_seconds)
+    if backend == "memory":
+        return InMemoryTaskStore(ttl_seconds=ttl_seconds)
+    raise ValueError(f"Unknown task store backend: {backend}. Must be 'memory' or 'sqlite'.")